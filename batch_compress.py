@@ -0,0 +1,227 @@
+# Compresses a batch of images with one of the image codecs, reusing the
+# cached result for inputs that were compressed before with the same settings.
+# The work runs as a pipeline: a reader thread decodes the next images while a
+# process pool encodes and a writer thread saves the finished outputs, so the
+# throughput is bounded by the slowest stage instead of the sum of the stages.
+#   python batch_compress.py images/ -o compressed/ --mode colored --option diff
+#   python batch_compress.py a.bmp b.png -o out/ --param color_transform=rct
+import os
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from result_cache import ResultCache
+from codec_registry import IMAGE_OPTIONS, load_codec, parse_param
+
+# The files written for an output path by the gray and the colored codecs
+OUTPUT_SUFFIXES = {
+    'gray': [''],
+    'colored': ['_R.bin', '_G.bin', '_B.bin', '_P.bin'],
+}
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff')
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.lzw_cache')
+
+
+def find_images(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+# Returns the output path handed to the codec for an input image
+def output_path_for(image_path, output_dir, mode):
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    # The colored codecs add '_R.bin', '_G.bin' and '_B.bin' themselves
+    return os.path.join(output_dir, name if mode == 'colored' else name + '.bin')
+
+
+def parse_params(items):
+    params = {}
+    for item in items:
+        key, _, value = item.partition('=')
+        params[key] = parse_param(value)
+    return params
+
+
+# Runs in the encoder processes: compresses a decoded image in memory and
+# returns the output bytes by suffix and the statistics
+def encode_image(mode, option, params, image_path, output_path, image):
+    filename = os.path.splitext(os.path.basename(image_path))[0]
+    codec = load_codec(IMAGE_OPTIONS[(mode, option)][1])
+    return codec(filename, 'image', image_path, output_path, **params).compress_image(image)
+
+
+# The read -> encode -> write pipeline. The queue between the reader and the
+# pool holds at most queue_size decoded images and at most workers +
+# queue_size images are encoding or waiting to be written, so memory use stays
+# bounded however many inputs there are. The sampled queue depths show which
+# stage limits the throughput: a full read queue means the encoders are the
+# bottleneck, an empty one means reading is.
+class BatchPipeline:
+    def __init__(self, output_dir, mode, option, params=None, cache=None, workers=None, queue_size=4):
+        self.output_dir = output_dir
+        self.mode = mode
+        self.option = option
+        self.params = params or {}
+        self.cache = cache
+        self.workers = workers or os.cpu_count()
+        self.codec_name, codec_mode = IMAGE_OPTIONS[(mode, option)]
+        self.codec = load_codec(codec_mode)
+        self.read_queue = queue.Queue(queue_size)
+        self.write_queue = queue.Queue()
+        self.slots = threading.Semaphore(self.workers + queue_size)
+        self.depths = {'read': [], 'encode': [], 'write': []}
+        self.busy = {'read': 0.0, 'write': 0.0}
+        self.errors = []
+        self.results = {}
+
+    def run(self, paths):
+        os.makedirs(self.output_dir, exist_ok=True)
+        start = time.perf_counter()
+        reader = threading.Thread(target=self.read_images, args=(paths,), daemon=True)
+        writer = threading.Thread(target=self.write_outputs, daemon=True)
+        with ProcessPoolExecutor(self.workers) as executor:
+            reader.start()
+            writer.start()
+            while True:
+                job = self.read_queue.get()
+                if job is None:
+                    break
+                self.slots.acquire()
+                if 'outputs' in job:
+                    # Cache hit, nothing to encode
+                    self.write_queue.put((job, None))
+                else:
+                    future = executor.submit(encode_image, self.mode, self.option, self.params,
+                                             job['image_path'], job['output_path'], job.pop('image'))
+                    self.write_queue.put((job, future))
+                self.sample_depths()
+            self.write_queue.put(None)
+            reader.join()
+            writer.join()
+        self.elapsed = time.perf_counter() - start
+
+        if self.errors:
+            raise self.errors[0]
+        return [self.results[index] for index in sorted(self.results)]
+
+    # Reader thread: looks the inputs up in the cache and decodes the others
+    def read_images(self, paths):
+        try:
+            for index, image_path in enumerate(find_images(paths)):
+                started = time.perf_counter()
+                job = {'index': index, 'image_path': image_path,
+                       'output_path': output_path_for(image_path, self.output_dir, self.mode), 'key': None}
+                if self.cache is not None:
+                    codec = {'name': self.codec_name, 'source': self.cache.codec_hash(self.codec)}
+                    job['key'] = self.cache.make_key(image_path, codec, self.option, self.params)
+                    entry = self.cache.get(job['key'])
+                    if entry is not None:
+                        job['outputs'], job['info'] = entry
+                if 'outputs' not in job:
+                    from PIL import Image
+                    image = Image.open(image_path)
+                    image.load()
+                    job['image'] = image
+                self.busy['read'] += time.perf_counter() - started
+                self.read_queue.put(job)
+        except Exception as error:
+            self.errors.append(error)
+        finally:
+            self.read_queue.put(None)
+
+    # Writer thread: saves the outputs in input order as the encoders finish
+    def write_outputs(self):
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            job, future = item
+            try:
+                if future is None:
+                    outputs, info = job['outputs'], job['info'] + ["Cache: hit"]
+                else:
+                    outputs, info = future.result()
+                    if self.cache is not None:
+                        self.cache.put(job['key'], outputs, info)
+                        info = info + ["Cache: miss"]
+                started = time.perf_counter()
+                self.save_outputs(job['output_path'], outputs)
+                self.busy['write'] += time.perf_counter() - started
+                self.results[job['index']] = (job['image_path'], info)
+            except Exception as error:
+                self.errors.append(error)
+            finally:
+                self.slots.release()
+            self.sample_depths()
+
+    def save_outputs(self, output_path, outputs):
+        for suffix, data in outputs.items():
+            with open(output_path + suffix, 'wb') as out_file:
+                out_file.write(data)
+        # Files of another layout left by an earlier run would be read instead
+        for suffix in OUTPUT_SUFFIXES[self.mode]:
+            if suffix not in outputs and os.path.exists(output_path + suffix):
+                os.remove(output_path + suffix)
+
+    # Records how many images wait to be encoded (read), are being encoded and
+    # wait to be written
+    def sample_depths(self):
+        pending = [item[1] for item in list(self.write_queue.queue) if item is not None]
+        finished = sum(1 for future in pending if future is None or future.done())
+        self.depths['read'].append(self.read_queue.qsize())
+        self.depths['encode'].append(len(pending) - finished)
+        self.depths['write'].append(finished)
+
+    def report(self):
+        lines = [f"Pipeline: {len(self.results)} images in {self.elapsed:.2f} s with {self.workers} encoder processes "
+                 f"(reading {self.busy['read']:.2f} s, writing {self.busy['write']:.2f} s)"]
+        for stage, depths in self.depths.items():
+            if depths:
+                lines.append(f"Queue depth {stage:<6}: average {sum(depths) / len(depths):.1f}, max {max(depths)}")
+        return lines
+
+
+def compress_images(paths, output_dir, mode, option, params=None, cache=None, workers=None, queue_size=4):
+    pipeline = BatchPipeline(output_dir, mode, option, params, cache, workers, queue_size)
+    return pipeline.run(paths), pipeline.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compress a batch of images with LZW.')
+    parser.add_argument('inputs', nargs='+', help='image files or directories')
+    parser.add_argument('-o', '--output-dir', required=True)
+    parser.add_argument('--mode', choices=['gray', 'colored'], default='gray')
+    parser.add_argument('--option', choices=['gray_level', 'diff'], default='gray_level')
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUE',
+                        help='extra codec parameter, e.g. color_transform=rct')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--cache-size', type=int, default=256, help='cache size limit in MB')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--workers', type=int, help='number of encoder processes (default: all CPUs)')
+    parser.add_argument('--queue-size', type=int, default=4, help='number of images read ahead')
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    results, report = compress_images(args.inputs, args.output_dir, args.mode, args.option,
+                                      parse_params(args.param), cache, args.workers, args.queue_size)
+
+    for image_path, info in results:
+        print(image_path)
+        for line in info:
+            print('    ' + line)
+    for line in report:
+        print(line)
+    if cache is not None:
+        print(f"Cache hits: {cache.hits}, misses: {cache.misses} (all processes: {cache.stats()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Compares the colored codecs with and without a reversible color transform,
+# each with a dictionary per channel and with one chained across the channels.
+# Run from the repository root:
+#   python -m benchmarks.color_transform [image]
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from PIL import Image
+from project4.LZW import LZWCoding as LZWCoding4
+from project5.LZW import LZWCoding as LZWCoding5
+
+image_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('project4', 'sample_img.bmp')
+original = np.array(Image.open(image_path).convert('RGB'))
+
+print(f"{'codec':<10}{'transform':<11}{'dictionary':<12}{'R/Y':>10}{'G/C1':>10}{'B/C2':>10}{'total':>11}{'encode s':>10}{'decode s':>10}  round trip")
+with tempfile.TemporaryDirectory() as tmp:
+    for codec_name, codec in (('project4', LZWCoding4), ('project5', LZWCoding5)):
+        for transform, chained in [(transform, chained) for transform in ('none', 'rct', 'ycocg')
+                                   for chained in (False, True)]:
+            dictionary = 'chained' if chained else 'separate'
+            output_path = os.path.join(tmp, f"{codec_name}_{transform}_{dictionary}")
+            lzw = codec('benchmark', 'colored_image', image_path, output_path, color_transform=transform,
+                        chained_dictionary=chained)
+
+            start = time.perf_counter()
+            lzw.compress_image_file()
+            encode_time = time.perf_counter() - start
+
+            sizes = [os.path.getsize(output_path + suffix) for suffix in ['_R.bin', '_G.bin', '_B.bin']]
+
+            lzw.filepath = output_path
+            start = time.perf_counter()
+            decompressed_path = lzw.decompress_image_file()
+            decode_time = time.perf_counter() - start
+
+            identical = np.array_equal(np.array(Image.open(decompressed_path).convert('RGB')), original)
+            print(f"{codec_name:<10}{transform:<11}{dictionary:<12}{sizes[0]:>10,}{sizes[1]:>10,}{sizes[2]:>10,}{sum(sizes):>11,}"
+                  f"{encode_time:>10.2f}{decode_time:>10.2f}  {'IDENTICAL' if identical else 'DIFFERENT'}")
@@ -0,0 +1,203 @@
+# Load generator for lzw_server.py. Sends compress requests (and decompress
+# requests for the results, to check the round trip) from several concurrent
+# keep-alive connections and reports latency, throughput, rejections and the
+# server's own metrics. Run from the repository root:
+#   python -m benchmarks.load_generator --spawn --concurrency 8 --requests 200
+#   python -m benchmarks.load_generator --port 8765 --kind image --mode gray_diff
+import io
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+from PIL import Image
+
+
+class Connection:
+    def __init__(self, host, port, unix_path):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.reader = self.writer = None
+
+    async def open(self):
+        if self.unix_path:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.unix_path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, target, body=b''):
+        if self.writer is None:
+            await self.open()
+        self.writer.write(f'{method} {target} HTTP/1.1\r\nHost: {self.host}\r\n'
+                          f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            body = b''.join(chunks)
+        else:
+            body = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection') == 'close':
+            self.writer.close()
+            self.writer = None
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def make_payloads(kind, count, size, seed=0):
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for n in range(count):
+        if kind == 'image':
+            # Smooth images with some noise, like photographs
+            side = int(size ** 0.5)
+            rows, cols = np.mgrid[0:side, 0:side]
+            pixels = ((rows * (n % 5 + 1) + cols) // 3 + rng.integers(0, 6, (side, side))) % 256
+            output = io.BytesIO()
+            Image.fromarray(pixels.astype(np.uint8)).save(output, format='PNG')
+            payloads.append((output.getvalue(), pixels.astype(np.uint8)))
+        else:
+            words = [b'lzw', b'compression', b'service', b'queue', b'worker', b'latency', b'stream']
+            text = b' '.join(words[i] for i in rng.integers(0, len(words), size // 6))[:size]
+            payloads.append((text, text))
+    return payloads
+
+
+def percentile(ordered, fraction):
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] * 1000
+
+
+async def run(args):
+    payloads = make_payloads(args.kind, min(args.requests, 16), args.size)
+    query = '&'.join(f'{key}={value}' for key, value in [('mode', args.mode)] if args.kind == 'image')
+    compress_target = f'/compress/{args.kind}' + (f'?{query}' if query else '')
+    decompress_target = f'/decompress/{args.kind}'
+
+    latencies = []
+    counts = {'ok': 0, 'rejected': 0, 'failed': 0, 'mismatch': 0}
+    sent_bytes = 0
+    next_request = iter(range(args.requests))
+
+    async def client():
+        nonlocal sent_bytes
+        connection = Connection(args.host, args.port, args.unix)
+        try:
+            for n in next_request:
+                payload, expected = payloads[n % len(payloads)]
+                start = time.perf_counter()
+                status, compressed = await connection.request('POST', compress_target, payload)
+                if status == 503:
+                    counts['rejected'] += 1
+                    await asyncio.sleep(0.05)
+                    continue
+                if status != 200:
+                    counts['failed'] += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+                sent_bytes += len(payload)
+                counts['ok'] += 1
+
+                if args.verify:
+                    status, restored = await connection.request('POST', decompress_target, compressed)
+                    if args.kind == 'image' and status == 200:
+                        restored = np.array(Image.open(io.BytesIO(restored)))
+                        same = np.array_equal(restored, expected)
+                    else:
+                        same = status == 200 and restored == expected
+                    if not same:
+                        counts['mismatch'] += 1
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.requests} {args.kind} requests, {args.concurrency} connections, {elapsed:.2f} s")
+    print(f"  ok {counts['ok']}, rejected (503) {counts['rejected']}, failed {counts['failed']}, "
+          f"round-trip mismatches {counts['mismatch']}")
+    if latencies:
+        ordered = sorted(latencies)
+        print(f"  compress latency: p50 {percentile(ordered, 0.5):.1f} ms, p95 {percentile(ordered, 0.95):.1f} ms, "
+              f"max {ordered[-1] * 1000:.1f} ms")
+        print(f"  throughput: {counts['ok'] / elapsed:.1f} requests/s, {sent_bytes / elapsed / 1e6:.2f} MB/s in")
+
+    connection = Connection(args.host, args.port, args.unix)
+    _, metrics = await connection.request('GET', '/metrics')
+    connection.close()
+    print("  server metrics:", json.dumps(json.loads(metrics), indent=2).replace('\n', '\n  '))
+
+
+async def wait_for_server(args, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connection = Connection(args.host, args.port, args.unix)
+            status, _ = await connection.request('GET', '/health')
+            connection.close()
+            if status == 200:
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for the LZW compression service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='connect to this Unix socket instead of TCP')
+    parser.add_argument('--spawn', action='store_true', help='start a server for the duration of the run')
+    parser.add_argument('--workers', type=int, help='worker processes of the spawned server')
+    parser.add_argument('--queue-size', type=int, default=32, help='job queue size of the spawned server')
+    parser.add_argument('--kind', choices=['bytes', 'image'], default='bytes')
+    parser.add_argument('--mode', default='gray_diff', help='image mode (gray, gray_diff)')
+    parser.add_argument('--size', type=int, default=64 * 1024, help='payload size in bytes (pixels for images)')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--no-verify', dest='verify', action='store_false',
+                        help='do not decompress the results to check the round trip')
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        command = [sys.executable, 'lzw_server.py', '--host', args.host, '--port', str(args.port),
+                   '--queue-size', str(args.queue_size)]
+        if args.unix:
+            command += ['--unix', args.unix]
+        if args.workers:
+            command += ['--workers', str(args.workers)]
+        server = subprocess.Popen(command)
+    try:
+        asyncio.run(wait_for_server(args))
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
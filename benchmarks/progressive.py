@@ -0,0 +1,35 @@
+# Progressive mode of the gray codec: the size against the default layout and
+# the time to decode a preview from the first passes against the full image.
+# Run from the repository root:
+#   python -m benchmarks.progressive [image]
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+from project2.LZW import LZWCoding, PROGRESSIVE_LEVELS
+
+image_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('project2', 'sample_gray_scaled.bmp')
+image = Image.open(image_path)
+original = np.array(image.convert('L'))
+
+plain = LZWCoding('benchmark', 'image', None, None).compress_image(image)[0]['']
+data = LZWCoding('benchmark', 'image', None, None, progressive=True).compress_image(image)[0]['']
+print(f"default layout {len(plain):,} bytes, progressive {len(data):,} bytes ({len(data) / len(plain) - 1:+.1%})")
+
+decoder = LZWCoding('benchmark', 'image', None, None)
+start = time.perf_counter()
+decoder.decompress_image(plain)
+print(f"full decode of the default layout: {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+print(f"{'passes':<8}{'preview':>12}{'decode ms':>11}  pixels")
+for passes in range(1, PROGRESSIVE_LEVELS + 2):
+    step = 2 ** (PROGRESSIVE_LEVELS + 1 - passes)
+    # The size that needs exactly this many passes
+    size = -(-max(original.shape) // step)
+    start = time.perf_counter()
+    preview = decoder.decode_preview(data, size)
+    decode_time = (time.perf_counter() - start) * 1000
+    identical = np.array_equal(preview, original[::step, ::step])
+    print(f"{passes:<8}{preview.shape[1]:>6}x{preview.shape[0]:<5}{decode_time:>11.1f}  "
+          f"{'IDENTICAL' if identical else 'DIFFERENT'}")
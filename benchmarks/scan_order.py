@@ -0,0 +1,58 @@
+# Compares the pixel scan orders of the gray codecs on a photograph and on
+# synthetic images with vertical structure, flat regions and fine texture.
+# Run from the repository root:
+#   python -m benchmarks.scan_order [image]
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from PIL import Image
+from project2.LZW import LZWCoding as LZWCoding2, SCAN_ORDERS
+from project3.LZW import LZWCoding as LZWCoding3
+
+photo_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('project2', 'sample_gray_scaled.bmp')
+
+
+def synthetic_images(width=512, height=512):
+    rng = np.random.default_rng(0)
+    rows, cols = np.mgrid[0:height, 0:width]
+    # Vertical stripes: every column is constant
+    stripes = np.repeat(rng.integers(0, 256, (1, width), dtype=np.uint8), height, axis=0)
+    # Flat regions, as in screenshots and diagrams
+    flat = np.full((height, width), 230, dtype=np.uint8)
+    flat[height // 8:height // 2, width // 8:width // 2] = 40
+    flat[height // 2:, width // 3:] = 120
+    # Noisy texture over a smooth gradient
+    texture = ((rows + cols) // 4 + rng.integers(0, 8, (height, width))).astype(np.uint8)
+    return {'stripes': stripes, 'flat': flat, 'texture': texture}
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    images = {'photo': photo_path}
+    for name, array in synthetic_images().items():
+        images[name] = os.path.join(tmp, name + '.bmp')
+        Image.fromarray(array).save(images[name])
+
+    print(f"{'image':<10}{'codec':<10}{'scan order':<12}{'size':>10}{'encode s':>10}{'decode s':>10}  round trip")
+    for image_name, image_path in images.items():
+        original = np.array(Image.open(image_path).convert('L'))
+        for codec_name, codec in (('project2', LZWCoding2), ('project3', LZWCoding3)):
+            for order in SCAN_ORDERS:
+                output_path = os.path.join(tmp, f"{image_name}_{codec_name}_{order}.bin")
+                decompressed_path = os.path.join(tmp, 'decompressed.bmp')
+                lzw = codec('benchmark', 'image', image_path, output_path, scan_order=order)
+
+                start = time.perf_counter()
+                lzw.compress_image_file()
+                encode_time = time.perf_counter() - start
+
+                lzw.filepath = output_path
+                lzw.outputpath = decompressed_path
+                start = time.perf_counter()
+                lzw.decompress_image_file()
+                decode_time = time.perf_counter() - start
+
+                identical = np.array_equal(np.array(Image.open(decompressed_path).convert('L')), original)
+                print(f"{image_name:<10}{codec_name:<10}{order:<12}{os.path.getsize(output_path):>10,}"
+                      f"{encode_time:>10.2f}{decode_time:>10.2f}  {'IDENTICAL' if identical else 'DIFFERENT'}")
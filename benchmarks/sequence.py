@@ -0,0 +1,58 @@
+# Compares sequence mode of the gray difference codec with compressing every
+# frame on its own, on synthetic sequences made from a photograph: a still
+# scene, a small moving object, sensor noise and a camera pan.
+# Run from the repository root:
+#   python -m benchmarks.sequence [image] [--frames 10] [--keyframe-interval 30]
+import os
+import time
+import argparse
+import numpy as np
+from PIL import Image
+from project3.LZW import LZWCoding
+
+
+def scenes(photo, count):
+    rng = np.random.default_rng(0)
+    height, width = photo.shape
+    moving, noisy, pan = [], [], []
+    for t in range(count):
+        frame = photo.copy()
+        top, left = height // 3, (width // 8 + 6 * t) % (width - 24)
+        frame[top:top + 24, left:left + 24] = 250
+        moving.append(frame)
+        noise = rng.integers(-2, 3, photo.shape)
+        noisy.append(np.clip(photo.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+        pan.append(np.roll(photo, 3 * t, axis=1))
+    return {'static': [photo] * count, 'moving': moving, 'noisy': noisy, 'pan': pan}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sequence mode against single images.')
+    parser.add_argument('image', nargs='?', default=os.path.join('project2', 'sample_gray_scaled.bmp'))
+    parser.add_argument('--frames', type=int, default=10)
+    parser.add_argument('--keyframe-interval', type=int, default=30)
+    args = parser.parse_args()
+
+    photo = np.array(Image.open(args.image).convert('L'))[:256, :256]
+    print(f"{'scene':<8}{'single':>10}{'ms/frame':>10}{'sequence':>10}{'ms/frame':>10}  frames")
+    for name, frames in scenes(photo, args.frames).items():
+        images = [Image.fromarray(frame) for frame in frames]
+
+        start = time.perf_counter()
+        single = sum(len(LZWCoding(name, 'image', None, None).compress_image(image)[0]['']) for image in images)
+        single_time = (time.perf_counter() - start) * 1000 / len(images)
+
+        coder = LZWCoding(name, 'image', None, None)
+        start = time.perf_counter()
+        data, info = coder.compress_sequence(images, args.keyframe_interval)
+        sequence_time = (time.perf_counter() - start) * 1000 / len(images)
+        restored = LZWCoding(name, 'image', None, None).decompress_sequence(data)
+        assert all(np.array_equal(a, b) for a, b in zip(restored, frames))
+
+        frame_types = next(line for line in info if line.startswith('Frames:'))
+        print(f"{name:<8}{single:>10,}{single_time:>10.1f}{len(data):>10,}{sequence_time:>10.1f}  "
+              f"{frame_types[len('Frames: '):]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Size and speed of the coding modes of the text and gray codecs: 'fast'
+# (codelength bits per code), 'max_ratio' (Huffman coded code widths) and
+# 'speed' (byte-aligned uint16/uint32 codes, memory-mapped for decoding).
+# Run from the repository root:
+#   python -m benchmarks.speed_mode [text file] [image]
+import os
+import sys
+import time
+import tempfile
+import contextlib
+import numpy as np
+from PIL import Image
+from project.LZW import LZWCoding as TextCoding, CODING_MODES
+from project2.LZW import LZWCoding as GrayCoding
+
+text_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('project', 'sample.txt')
+image_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join('project2', 'sample_gray_scaled.bmp')
+
+
+def timed(function):
+    start = time.perf_counter()
+    # The codecs print their statistics
+    with contextlib.redirect_stdout(None):
+        function()
+    return time.perf_counter() - start
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    # A smooth texture besides the photograph: the photograph needs codes of
+    # more than 16 bits, as uint32 they outgrow the raw pixels and the speed
+    # mode falls back to storing them
+    rows, cols = np.mgrid[0:512, 0:512]
+    texture_path = os.path.join(tmp, 'texture.bmp')
+    Image.fromarray(((rows + cols) // 4 % 256).astype(np.uint8)).save(texture_path)
+
+    inputs = [('text', TextCoding, text_path), ('photo', GrayCoding, image_path), ('texture', GrayCoding, texture_path)]
+    print(f"{'input':<9}{'mode':<11}{'size':>11}{'encode s':>10}{'decode s':>10}  round trip")
+    for name, codec, input_path in inputs:
+        with open(input_path, 'rb') as in_file:
+            original = in_file.read()
+        for mode in CODING_MODES:
+            compressed_path = os.path.join(tmp, f'{name}_{mode}.bin')
+            restored_path = os.path.join(tmp, f'{name}_{mode}_restored' + os.path.splitext(input_path)[1])
+            coder = codec(name, 'text' if codec is TextCoding else 'image', input_path, compressed_path,
+                          coding_mode=mode)
+            decoder = codec(name, 'text' if codec is TextCoding else 'image', compressed_path, restored_path)
+            if codec is TextCoding:
+                encode_time = timed(coder.compress_text_file)
+                decode_time = timed(decoder.decompress_text_file)
+                with open(restored_path, 'rb') as restored_file:
+                    identical = restored_file.read() == original
+            else:
+                encode_time = timed(coder.compress_image_file)
+                decode_time = timed(decoder.decompress_image_file)
+                identical = np.array_equal(np.array(Image.open(restored_path).convert('L')),
+                                           np.array(Image.open(input_path).convert('L')))
+            print(f"{name:<9}{mode:<11}{os.path.getsize(compressed_path):>11,}{encode_time:>10.2f}"
+                  f"{decode_time:>10.2f}  {'IDENTICAL' if identical else 'DIFFERENT'}")
@@ -0,0 +1,70 @@
+# Startup cost of the tools: the import time of each entry module (measured
+# with python -X importtime in a fresh interpreter), whether NumPy and Pillow
+# got loaded, and the time from the first import to the first compressed
+# bytes of a small text job, which should stay under 100 ms.
+# Run from the repository root:
+#   python -m benchmarks.startup [--runs 5]
+import sys
+import argparse
+import subprocess
+
+TARGET_MS = 100
+
+MODULES = ['cli', 'lzw_api', 'codec_registry', 'batch_compress', 'gui', 'project.LZW', 'project2.LZW']
+HEAVY_MODULES = ('numpy', 'PIL')
+
+# Imports the text codec and compresses a short text, printing the elapsed
+# milliseconds
+TEXT_JOB = """
+import time
+start = time.perf_counter()
+import lzw_api
+data = lzw_api.compress_bytes(b'startup benchmark ' * 64)
+assert lzw_api.decompress_bytes(data) == b'startup benchmark ' * 64
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def import_profile(module):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, total, name = line.split('|')
+        cumulative[name.strip()] = int(total)
+    return cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time and text startup benchmark.')
+    parser.add_argument('--runs', type=int, default=5, help='runs per measurement (the best one is reported)')
+    args = parser.parse_args()
+
+    print(f"{'module':<18}{'import ms':>10}  heavy dependencies loaded")
+    for module in MODULES:
+        profiles = [import_profile(module) for _ in range(args.runs)]
+        profiles = [profile for profile in profiles if profile]
+        if not profiles:
+            print(f"{module:<18}{'-':>10}  (cannot be imported here)")
+            continue
+        best = min(profiles, key=lambda profile: profile[module])
+        heavy = [name for name in HEAVY_MODULES if name in best]
+        print(f"{module:<18}{best[module] / 1000:>10.1f}  {', '.join(heavy) or 'none'}")
+
+    times = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', TEXT_JOB], capture_output=True, text=True, check=True)
+        times.append(float(output.stdout))
+    best = min(times)
+    verdict = 'OK' if best < TARGET_MS else 'OVER TARGET'
+    print(f"\nText job, first import to first compressed bytes: {best:.1f} ms "
+          f"(target {TARGET_MS} ms, {verdict})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Compares our TIFF LZW writer with Pillow's (libtiff) tiff_lzw encoder, and
+# decoding the TIFF with Pillow with decoding the private .bin format.
+# Run from the repository root:
+#   python -m benchmarks.tiff_lzw [image]
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from PIL import Image
+from project2.LZW import LZWCoding
+
+image_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('project2', 'sample_gray_scaled.bmp')
+original = np.array(Image.open(image_path).convert('L'))
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def pillow_decode(path):
+    with Image.open(path) as image:
+        return np.array(image)
+
+
+print(f"{'encoder':<28}{'size':>10}{'encode s':>10}{'decode s':>10}  decoded by   round trip")
+with tempfile.TemporaryDirectory() as tmp:
+    for predictor in (False, True):
+        output_path = os.path.join(tmp, f"ours_{predictor}.tif")
+        lzw = LZWCoding('benchmark', 'image', image_path, output_path)
+        _, encode_time = timed(lambda: lzw.compress_tiff_file(predictor=predictor))
+        decoded, decode_time = timed(lambda: pillow_decode(output_path))
+        print(f"{'ours' + (' + predictor 2' if predictor else ''):<28}{os.path.getsize(output_path):>10,}"
+              f"{encode_time:>10.2f}{decode_time:>10.3f}  Pillow       "
+              f"{'IDENTICAL' if np.array_equal(decoded, original) else 'DIFFERENT'}")
+
+    for predictor in (False, True):
+        output_path = os.path.join(tmp, f"pillow_{predictor}.tif")
+        extra = {'tiffinfo': {317: 2}} if predictor else {}
+        _, encode_time = timed(lambda: Image.fromarray(original).save(output_path, compression='tiff_lzw', **extra))
+        decoded, decode_time = timed(lambda: pillow_decode(output_path))
+        print(f"{'Pillow' + (' + predictor 2' if predictor else ''):<28}{os.path.getsize(output_path):>10,}"
+              f"{encode_time:>10.2f}{decode_time:>10.3f}  Pillow       "
+              f"{'IDENTICAL' if np.array_equal(decoded, original) else 'DIFFERENT'}")
+
+    # The private format for reference
+    output_path = os.path.join(tmp, 'ours.bin')
+    decompressed_path = os.path.join(tmp, 'decompressed.bmp')
+    lzw = LZWCoding('benchmark', 'image', image_path, output_path)
+    _, encode_time = timed(lzw.compress_image_file)
+    lzw.filepath = output_path
+    lzw.outputpath = decompressed_path
+    _, decode_time = timed(lzw.decompress_image_file)
+    identical = np.array_equal(np.array(Image.open(decompressed_path)), original)
+    print(f"{'ours (.bin)':<28}{os.path.getsize(output_path):>10,}{encode_time:>10.2f}{decode_time:>10.3f}"
+          f"  LZWCoding    {'IDENTICAL' if identical else 'DIFFERENT'}")
@@ -0,0 +1,76 @@
+# Command line interface of the byte/text codec.
+#   python cli.py compress big.log big.bin --block-size 4M --checkpoint
+#   python cli.py compress big.log big.bin --block-size 4M --resume
+#   python cli.py decompress big.bin big.log
+#   python cli.py train-dictionary samples.lzwd samples/*.json
+import os
+import argparse
+from memory_meter import parse_size
+from project.LZW import LZWCoding, train_dictionary, CODING_MODES
+
+
+def compress(args):
+    lzw = LZWCoding(os.path.basename(args.input), 'text', args.input, args.output,
+                    coding_mode=args.coding_mode, dictionary_path=args.dictionary)
+    _, info = lzw.compress_text_file(append=args.append, block_size=args.block_size, workers=args.workers,
+                                     checkpoint=args.checkpoint, resume=args.resume)
+    for line in info:
+        print(line)
+
+
+def decompress(args):
+    lzw = LZWCoding(os.path.basename(args.input), 'text', args.input, args.output,
+                    dictionary_path=args.dictionary)
+    lzw.decompress_text_file(workers=args.workers, first_block=args.first_block)
+
+
+def train(args):
+    samples = []
+    for path in args.samples:
+        with open(path, 'rb') as sample_file:
+            samples.append(sample_file.read())
+    dictionary_id = train_dictionary(samples, args.output, args.max_entries)
+    print(f"Saved dictionary {dictionary_id:08x} to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LZW compression of text and binary files.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_compress = commands.add_parser('compress')
+    parser_compress.add_argument('input')
+    parser_compress.add_argument('output')
+    parser_compress.add_argument('--coding-mode', choices=CODING_MODES, default='fast')
+    parser_compress.add_argument('--dictionary', help='trained dictionary to start from')
+    parser_compress.add_argument('--block-size', type=parse_size,
+                                 help='code the input in independent blocks (e.g. 4M)')
+    parser_compress.add_argument('--workers', type=int, help='number of worker processes')
+    parser_compress.add_argument('--append', action='store_true',
+                                 help='append to an existing segmented archive')
+    parser_compress.add_argument('--checkpoint', action='store_true',
+                                 help='save a checkpoint after every block')
+    parser_compress.add_argument('--resume', action='store_true',
+                                 help='continue from the last checkpoint')
+    parser_compress.set_defaults(func=compress)
+
+    parser_decompress = commands.add_parser('decompress')
+    parser_decompress.add_argument('input')
+    parser_decompress.add_argument('output')
+    parser_decompress.add_argument('--dictionary', help='dictionary the input was compressed with')
+    parser_decompress.add_argument('--workers', type=int, help='number of worker processes')
+    parser_decompress.add_argument('--first-block', type=int, default=0,
+                                   help='start at this block of a segmented archive')
+    parser_decompress.set_defaults(func=decompress)
+
+    parser_train = commands.add_parser('train-dictionary')
+    parser_train.add_argument('output')
+    parser_train.add_argument('samples', nargs='+')
+    parser_train.add_argument('--max-entries', type=int, default=4096)
+    parser_train.set_defaults(func=train)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Registry of the codecs by mode. A codec module is imported the first time
+# its mode is used, and with it NumPy and Pillow, which only the image codecs
+# need; the tools import this registry instead of the codec modules so that
+# text-only jobs start without loading them.
+#   LZWCoding = load_codec('gray_diff')
+#   coder = LZWCoding(filename, 'image', input_path, output_path)
+import importlib
+
+CODEC_MODULES = {
+    'text': 'project.LZW',
+    'gray': 'project2.LZW',
+    'gray_diff': 'project3.LZW',
+    'colored': 'project4.LZW',
+    'colored_diff': 'project5.LZW',
+}
+
+# The image modes for each (mode, option) pair offered by the GUI and the
+# batch tool, with the codec name the result cache knows them by
+IMAGE_OPTIONS = {
+    ('gray', 'gray_level'): ('project2', 'gray'),
+    ('gray', 'diff'): ('project3', 'gray_diff'),
+    ('colored', 'gray_level'): ('project4', 'colored'),
+    ('colored', 'diff'): ('project5', 'colored_diff'),
+}
+
+
+def codec_module(mode):
+    if mode not in CODEC_MODULES:
+        raise ValueError(f"Unknown mode: {mode}")
+    return importlib.import_module(CODEC_MODULES[mode])
+
+
+def load_codec(mode):
+    return codec_module(mode).LZWCoding
+
+
+# Converts a codec parameter given as text (a query value or a --param of the
+# batch tool) to the type the codecs expect: 'true'/'false' to a bool, '2' to
+# an int, a size such as '256M' or '1.5K' to bytes, anything else (including
+# sizes out of range such as 'infK') stays text
+def parse_param(value):
+    from memory_meter import parse_size
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    try:
+        return parse_size(value)
+    except (ValueError, OverflowError):
+        return value
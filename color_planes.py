@@ -0,0 +1,80 @@
+# Plane handling shared by the colored codecs (project4 and project5).
+#   palette_data = extract_palette(image)   # (indices, palette) or None
+#   outputs = compress_planes(coder, planes, width, height, suffixes, workers)
+#   planes = decode_planes(coder, outputs, suffixes)
+import numpy as np
+
+
+# Returns the index plane and the palette (RGB triplets as bytes) of an image
+# with at most 256 colors, or None when the image has more colors. 'P' and '1'
+# images are used as they are, other images are counted with a vectorized
+# unique over the packed RGB values.
+def extract_palette(image):
+    if image.mode == 'P':
+        indices = np.array(image, dtype=np.uint8)
+        size = 3 * (int(indices.max(initial=0)) + 1)
+        # Pillow may return a shorter palette (or none at all) and shows the
+        # missing entries as black, so they are padded with zeros
+        palette = (image.getpalette() or [])[:size]
+        return indices, bytes(palette) + bytes(size - len(palette))
+    if image.mode == '1':
+        return np.array(image, dtype=np.uint8), bytes([0, 0, 0, 255, 255, 255])
+
+    rgb = np.array(image.convert('RGB'), dtype=np.uint32)
+    packed = (rgb[:, :, 0] << 16) | (rgb[:, :, 1] << 8) | rgb[:, :, 2]
+    colors, indices = np.unique(packed, return_inverse=True)
+    if len(colors) > 256:
+        return None
+    palette = np.stack(((colors >> 16) & 0xFF, (colors >> 8) & 0xFF, colors & 0xFF), axis=-1)
+    return indices.reshape(packed.shape).astype(np.uint8), palette.astype(np.uint8).tobytes()
+
+
+# Encodes one plane in a worker process of a SharedWorkerPool: the plane is
+# read from and the payload written to shared memory, only the payload length
+# travels back
+def encode_channel_worker(coder, plane, output):
+    from shared_pool import attach
+    with attach(plane) as channel_data, attach(output) as payload_buffer:
+        payload = coder.encode_channel(channel_data)
+        payload_buffer[:len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+        del channel_data, payload_buffer
+    return len(payload)
+
+
+# Compresses the planes with a colored codec and returns the channel file
+# contents by suffix. With a chained dictionary every plane continues with the
+# dictionary the plane before it left, so they are coded one after the other;
+# otherwise, with more than one worker, the planes are encoded in parallel
+# processes that read them from shared memory and write the payloads back the
+# same way.
+def compress_planes(coder, planes, width, height, suffixes, workers):
+    if coder.chained_dictionary:
+        # One dictionary, updated by every plane in turn
+        dictionary = {}
+        return {suffix: coder.compress_channel(plane, width, height, dictionary)
+                for plane, suffix in zip(planes, suffixes)}
+    if workers <= 1 or len(planes) == 1:
+        return {suffix: coder.compress_channel(plane, width, height) for plane, suffix in zip(planes, suffixes)}
+
+    from shared_pool import SharedWorkerPool
+    with SharedWorkerPool(min(workers, len(planes))) as pool:
+        jobs = []
+        for plane in planes:
+            output = pool.allocate(coder.max_payload_size(plane.size), np.uint8)
+            jobs.append((output, pool.submit(encode_channel_worker, coder, pool.share(plane), output)))
+        header = coder.add_header_info(width, height)
+        return {suffix: header + pool.view(output)[:job.result()].tobytes()
+                for (output, job), suffix in zip(jobs, suffixes)}
+
+
+# Decodes the channel files (by suffix) with a colored codec and returns the
+# planes. The chained flag is read from the first header, chained planes are
+# decoded with the dictionary the plane before them left.
+def decode_planes(coder, outputs, suffixes):
+    planes = []
+    dictionary = {}
+    for suffix in suffixes:
+        planes.append(coder.decode_channel(outputs[suffix], dictionary))
+        if not coder.chained_dictionary:
+            dictionary = {}
+    return planes
@@ -0,0 +1,58 @@
+# Reversible color transforms of the colored codecs (project4 and project5),
+# applied to the RGB channels before they are compressed.
+#   c0, c1, c2 = forward_color_transform(rgb, 'rct')
+#   rgb = inverse_color_transform(c0, c1, c2, 'rct')
+import numpy as np
+
+# The numbers are stored in the channel file headers
+COLOR_TRANSFORMS = {'none': 0, 'rct': 1, 'ycocg': 2}
+
+
+# Interprets 8-bit values as two's complement numbers (-128..127)
+def to_signed(plane):
+    return (plane ^ 0x80) - 0x80
+
+
+# Applies the given color transform to an RGB array and returns three
+# 8-bit planes. The transforms are written as lifting steps in modulo 256
+# arithmetic, so every plane still fits the 256-entry dictionary and the
+# inverse is exact for all inputs.
+def forward_color_transform(rgb, transform):
+    r, g, b = (rgb[:, :, i].astype(np.int16) for i in range(3))
+
+    if transform == 'rct':
+        # JPEG 2000 RCT: Y = floor((R + 2G + B) / 4), Cb = B - G, Cr = R - G
+        cb = (b - g) & 0xFF
+        cr = (r - g) & 0xFF
+        y = (g + ((to_signed(cb) + to_signed(cr)) >> 2)) & 0xFF
+        planes = (y, cb, cr)
+    elif transform == 'ycocg':
+        # YCoCg-R
+        co = (r - b) & 0xFF
+        t = (b + (to_signed(co) >> 1)) & 0xFF
+        cg = (g - t) & 0xFF
+        y = (t + (to_signed(cg) >> 1)) & 0xFF
+        planes = (y, co, cg)
+    else:
+        planes = (r, g, b)
+
+    return tuple(plane.astype(np.uint8) for plane in planes)
+
+
+# Undoes forward_color_transform and returns the RGB array
+def inverse_color_transform(c0, c1, c2, transform):
+    c0, c1, c2 = (c.astype(np.int16) for c in (c0, c1, c2))
+
+    if transform == 'rct':
+        g = (c0 - ((to_signed(c1) + to_signed(c2)) >> 2)) & 0xFF
+        b = (c1 + g) & 0xFF
+        r = (c2 + g) & 0xFF
+    elif transform == 'ycocg':
+        t = (c0 - (to_signed(c2) >> 1)) & 0xFF
+        g = (c2 + t) & 0xFF
+        b = (t - (to_signed(c1) >> 1)) & 0xFF
+        r = (c1 + b) & 0xFF
+    else:
+        r, g, b = c0, c1, c2
+
+    return np.stack((r, g, b), axis=-1).astype(np.uint8)
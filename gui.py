@@ -1,18 +1,22 @@
 import tkinter as tk
 import os
 from tkinter import filedialog, messagebox, scrolledtext
-from PIL import Image, ImageTk
-from project.LZW import LZWCoding
-from project2.LZW import LZWCoding as LZWCoding2
-from project3.LZW import LZWCoding as LZWCoding3
-from project4.LZW import LZWCoding as LZWCoding4
-from project5.LZW import LZWCoding as LZWCoding5
+# The codecs (and Pillow and NumPy with the image codecs) are imported when a
+# mode is first used, so the window opens without loading them
+from codec_registry import load_codec
+from result_cache import ResultCache
+from batch_compress import DEFAULT_CACHE_DIR, OUTPUT_SUFFIXES
+
+# Side of the images shown in the comparison
+PREVIEW_SIZE = 300
 
 class CompressionApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Compression Tool")
         self.root.geometry("800x600")
+        # compressed images are reused when the same file is compressed again
+        self.cache = ResultCache(DEFAULT_CACHE_DIR)
         self.create_main_menu()
 
     def create_main_menu(self):
@@ -45,7 +49,7 @@ class CompressionApp:
         btn_back.pack(pady=30)
 
     def select_txt_file(self):
-        file_path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt")])
+        file_path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
         if file_path:
             try:
                 output_path = filedialog.asksaveasfilename(
@@ -56,10 +60,10 @@ class CompressionApp:
 
                 if output_path:
                     filename = os.path.splitext(os.path.basename(file_path))[0]
-                    lzw = LZWCoding(filename, 'text', file_path, output_path)
+                    lzw = load_codec('text')(filename, 'text', file_path, output_path)
                     compressed_path, compression_info = lzw.compress_text_file()
 
-                    decompressed_path = os.path.splitext(output_path)[0] + "_decompressed.txt"
+                    decompressed_path = os.path.splitext(output_path)[0] + "_decompressed" + os.path.splitext(file_path)[1]
                     lzw.filepath = output_path
                     lzw.outputpath = decompressed_path
                     decompressed_file_path = lzw.decompress_text_file()
@@ -100,14 +104,15 @@ class CompressionApp:
         decompressed_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         try:
-            with open(original_path, 'r') as f:
+            # the files are compared byte by byte and shown as UTF-8 text
+            with open(original_path, 'rb') as f:
                 original_content = f.read()
-                original_text.insert(tk.END, original_content)
+                original_text.insert(tk.END, original_content.decode('utf-8', errors='replace'))
                 original_text.config(state=tk.DISABLED)
 
-            with open(decompressed_path, 'r') as f:
+            with open(decompressed_path, 'rb') as f:
                 decompressed_content = f.read()
-                decompressed_text.insert(tk.END, decompressed_content)
+                decompressed_text.insert(tk.END, decompressed_content.decode('utf-8', errors='replace'))
                 decompressed_text.config(state=tk.DISABLED)
 
             if original_content == decompressed_content:
@@ -132,13 +137,13 @@ class CompressionApp:
             try:
                 output_path = filedialog.asksaveasfilename(
                     defaultextension=".txt",
-                    filetypes=[("Text files", "*.txt")],
+                    filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
                     title="Save Decompressed File As"
                 )
 
                 if output_path:
                     filename = os.path.splitext(os.path.basename(file_path))[0]
-                    lzw = LZWCoding(filename, 'text', file_path, output_path)
+                    lzw = load_codec('text')(filename, 'text', file_path, output_path)
                     lzw.decompress_text_file()
 
                     messagebox.showinfo("Success", f"File successfully decompressed to {output_path}")
@@ -175,11 +180,19 @@ class CompressionApp:
             btn_gray_level = tk.Button(self.root, text="Gray Level", command=lambda: self.select_image(mode, "gray_level"), width=20, height=2)
             btn_gray_level.pack(pady=10)
 
+            # Progressive files are larger, but a preview is shown before the
+            # full image is decoded
+            self.progressive = tk.BooleanVar(value=False)
+            if mode == "gray":
+                check_progressive = tk.Checkbutton(self.root, text="Progressive (Gray Level, preview first)",
+                                                   variable=self.progressive)
+                check_progressive.pack(pady=10)
+
             btn_back = tk.Button(self.root, text="Back", command=self.image_compression_menu, width=15)
             btn_back.pack(pady=30)
 
     def select_image(self, mode, option):
-        file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.bmp")])
+        file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.bmp;*.gif")])
         if file_path:
             output_path = filedialog.asksaveasfilename(
                 defaultextension=".bin",
@@ -193,8 +206,16 @@ class CompressionApp:
                 try:
                     if mode == "gray":
                         if option == "gray_level":
-                            lzw = LZWCoding2(filename, 'image', file_path, output_path)
-                            compressed_path, compression_info = lzw.compress_image_file()
+                            params = {'progressive': True} if self.progressive.get() else {}
+                            lzw = load_codec('gray')(filename, 'image', file_path, output_path, **params)
+                            compression_info = self.cache.compress_image(lzw, 'project2', option, params, OUTPUT_SUFFIXES[mode])
+
+                            if params:
+                                # Show the first passes while the full image is decoded
+                                with open(output_path, 'rb') as compressed_file:
+                                    preview = lzw.decode_preview(compressed_file.read(), PREVIEW_SIZE)
+                                self.show_image_comparison(file_path, None, compression_info, mode, preview)
+                                self.root.update()
 
                             decompressed_path = os.path.splitext(output_path)[0] + "_decompressed.bmp"
                             lzw.filepath = output_path
@@ -203,8 +224,8 @@ class CompressionApp:
 
                             self.show_image_comparison(file_path, decompressed_file_path, compression_info, mode)
                         elif option == "diff":
-                            lzw = LZWCoding3(filename, 'image', file_path, output_path)
-                            compressed_path, compression_info = lzw.compress_image_file()
+                            lzw = load_codec('gray_diff')(filename, 'image', file_path, output_path)
+                            compression_info = self.cache.compress_image(lzw, 'project3', option, {}, OUTPUT_SUFFIXES[mode])
 
                             decompressed_path = os.path.splitext(output_path)[0] + "_decompressed.bmp"
                             lzw.filepath = output_path
@@ -215,8 +236,8 @@ class CompressionApp:
 
                     elif mode == "colored":
                         if option == "gray_level":
-                            lzw = LZWCoding4(filename, 'colored_image', file_path, output_path)
-                            compressed_path, compression_info = lzw.compress_image_file()
+                            lzw = load_codec('colored')(filename, 'colored_image', file_path, output_path)
+                            compression_info = self.cache.compress_image(lzw, 'project4', option, {}, OUTPUT_SUFFIXES[mode])
 
                             decompressed_path = os.path.splitext(output_path)[0] + "_decompressed.bmp"
                             lzw.filepath = output_path
@@ -225,8 +246,8 @@ class CompressionApp:
 
                             self.show_image_comparison(file_path, decompressed_file_path, compression_info, mode)
                         elif option == "diff":
-                            lzw = LZWCoding5(filename, 'colored_image', file_path, output_path)
-                            compressed_path, compression_info = lzw.compress_image_file()
+                            lzw = load_codec('colored_diff')(filename, 'colored_image', file_path, output_path)
+                            compression_info = self.cache.compress_image(lzw, 'project5', option, {}, OUTPUT_SUFFIXES[mode])
 
                             decompressed_path = os.path.splitext(output_path)[0] + "_decompressed.bmp"
                             lzw.filepath = output_path
@@ -240,7 +261,9 @@ class CompressionApp:
                     messagebox.showerror("Error", f"An error occurred: {str(e)}")
                     print(f"Error: {str(e)}")
 
-    def show_image_comparison(self, original_path, decompressed_path, compression_info, mode):
+    # With preview (the pixels of a progressive preview) the preview is shown
+    # in place of the decompressed image, which is still being decoded
+    def show_image_comparison(self, original_path, decompressed_path, compression_info, mode, preview=None):
         for widget in self.root.winfo_children():
             widget.destroy()
 
@@ -260,32 +283,37 @@ class CompressionApp:
         original_frame = tk.LabelFrame(files_frame, text="Original Image", font=("Arial", 12))
         original_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
 
-        decompressed_frame = tk.LabelFrame(files_frame, text="Decompressed Image", font=("Arial", 12))
+        decompressed_title = "Decompressed Image" if preview is None else "Decompressed Image (progressive preview)"
+        decompressed_frame = tk.LabelFrame(files_frame, text=decompressed_title, font=("Arial", 12))
         decompressed_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5)
 
         try:
+            from PIL import Image, ImageTk
             if mode == "gray":
                 original_image = Image.open(original_path).convert('L')
-                decompressed_image = Image.open(decompressed_path).convert('L')
+                decompressed_image = Image.open(decompressed_path).convert('L') if preview is None else Image.fromarray(preview)
             else:
                 original_image = Image.open(original_path).convert('RGB')
                 decompressed_image = Image.open(decompressed_path).convert('RGB')
 
-            original_image = original_image.resize((300, 300), Image.LANCZOS)
+            original_image = original_image.resize((PREVIEW_SIZE, PREVIEW_SIZE), Image.LANCZOS)
             original_image_tk = ImageTk.PhotoImage(original_image)
 
             original_image_label = tk.Label(original_frame, image=original_image_tk)
             original_image_label.image = original_image_tk
             original_image_label.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-            decompressed_image = decompressed_image.resize((300, 300), Image.LANCZOS)
+            decompressed_image = decompressed_image.resize((PREVIEW_SIZE, PREVIEW_SIZE), Image.LANCZOS)
             decompressed_image_tk = ImageTk.PhotoImage(decompressed_image)
 
             decompressed_image_label = tk.Label(decompressed_frame, image=decompressed_image_tk)
             decompressed_image_label.image = decompressed_image_tk
             decompressed_image_label.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-            if list(original_image.getdata()) == list(decompressed_image.getdata()):
+            if preview is not None:
+                status = "Decoding the full image..."
+                status_color = "gray"
+            elif list(original_image.getdata()) == list(decompressed_image.getdata()):
                 status = "✓ Images match perfectly! Compression and decompression successful."
                 status_color = "green"
             else:
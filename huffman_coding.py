@@ -0,0 +1,89 @@
+# Entropy coding stage of the 'max_ratio' coding mode, shared by the text
+# codec (project) and the gray codec (project2). Each LZW code is put into the
+# bucket given by its bit length, the bucket is written with a canonical
+# Huffman code and the bits below the leading 1 are written as they are. The
+# code lengths of the buckets (5 bits each) are stored in front.
+#   bitstring = huffman_encode_codes(codes, codelength)
+#   codes = huffman_decode_codes(bitstring, codelength)
+import heapq
+
+
+# Returns the binary string of the codes (every code has at most codelength
+# bits)
+def huffman_encode_codes(int_list, codelength):
+    # Count how many codes fall into each bucket
+    counts = [0] * (codelength + 1)
+    for num in int_list:
+        counts[num.bit_length()] += 1
+    lengths = huffman_code_lengths(counts)
+    codes = canonical_huffman_codes(lengths)
+
+    bits = [''.join(format(length, '05b') for length in lengths)]
+    for num in int_list:
+        n = num.bit_length()
+        bits.append(codes[n])
+        # The leading 1 is implied by the bucket
+        if n > 1:
+            bits.append(bin(num)[3:])
+    return ''.join(bits)
+
+
+# Reverses huffman_encode_codes and returns the integer codes
+def huffman_decode_codes(bitstring, codelength):
+    table_size = 5 * (codelength + 1)
+    lengths = [int(bitstring[i:i + 5], 2) for i in range(0, table_size, 5)]
+    # Map each Huffman code back to its bucket
+    buckets = {code: n for n, code in canonical_huffman_codes(lengths).items()}
+    max_length = max(lengths)
+
+    int_codes = []
+    position = table_size
+    while position < len(bitstring):
+        end = position + 1
+        while bitstring[position:end] not in buckets:
+            end += 1
+            if end - position > max_length:
+                raise ValueError(f"Bad Huffman code at bit {position}")
+        n = buckets[bitstring[position:end]]
+        position = end
+        if n > 1:
+            int_codes.append(int('1' + bitstring[position:position + n - 1], 2))
+            position += n - 1
+        else:
+            int_codes.append(n)
+    return int_codes
+
+
+# Computes the Huffman code length of each symbol from the symbol counts
+# (unused symbols get the length 0)
+def huffman_code_lengths(counts):
+    lengths = [0] * len(counts)
+    heap = [(count, symbol, [symbol]) for symbol, count in enumerate(counts) if count > 0]
+    if len(heap) == 1:
+        lengths[heap[0][1]] = 1
+        return lengths
+    heapq.heapify(heap)
+    order = len(counts)  # Tie breaker for merged nodes
+    while len(heap) > 1:
+        count1, _, symbols1 = heapq.heappop(heap)
+        count2, _, symbols2 = heapq.heappop(heap)
+        # Every symbol below the merged node gets one bit longer
+        for symbol in symbols1 + symbols2:
+            lengths[symbol] += 1
+        heapq.heappush(heap, (count1 + count2, order, symbols1 + symbols2))
+        order += 1
+    return lengths
+
+
+# Assigns canonical Huffman codes (as binary strings) to the symbols with a
+# nonzero code length
+def canonical_huffman_codes(lengths):
+    codes = {}
+    code = 0
+    previous_length = 0
+    for symbol in sorted((s for s in range(len(lengths)) if lengths[s]), key=lambda s: (lengths[s], s)):
+        code <<= lengths[symbol] - previous_length
+        codes[symbol] = format(code, f'0{lengths[symbol]}b')
+        code += 1
+        previous_length = lengths[symbol]
+    return codes
@@ -0,0 +1,84 @@
+# Stateless in-memory interface to the codecs. Every call works on its own
+# LZWCoding instance, so no state (such as codelength) is shared between calls
+# and the functions can run concurrently from several threads.
+#   data = compress_array(pixels, mode='gray_diff')
+#   pixels = decompress_to_array(data)
+#   data = compress_bytes(b'...', coding_mode='max_ratio')
+#   original = decompress_bytes(data)
+from codec_registry import load_codec
+
+# Compressed arrays are a small container around the output files of the image
+# codecs: the magic, the codec number, the number of files and for each file
+# its suffix and contents (with one-byte and four-byte length prefixes)
+CONTAINER_MAGIC = b'LZWA'
+
+# The image codec (project number) for each mode
+ARRAY_MODES = {'gray': 2, 'gray_diff': 3, 'colored': 4, 'colored_diff': 5}
+ARRAY_MODE_NAMES = {number: mode for mode, number in ARRAY_MODES.items()}
+
+
+# Compresses a (height, width) uint8 array with a gray mode or a
+# (height, width, 3) one with a colored mode. Extra keyword arguments are
+# passed to the codec (e.g. scan_order='column' or color_transform='rct').
+def compress_array(array, mode='gray', **params):
+    # Only the image modes need NumPy and Pillow
+    import numpy as np
+    from PIL import Image
+    if mode not in ARRAY_MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    array = np.asarray(array)
+    if array.dtype != np.uint8:
+        raise ValueError(f"Expected a uint8 array, got {array.dtype}")
+    expected_dims = 2 if mode.startswith('gray') else 3
+    if array.ndim != expected_dims or (expected_dims == 3 and array.shape[2] != 3):
+        raise ValueError(f"Mode {mode} expects a {'(height, width)' if expected_dims == 2 else '(height, width, 3)'} "
+                         f"array, got shape {array.shape}")
+
+    number = ARRAY_MODES[mode]
+    coder = load_codec(mode)(None, 'image', None, None, **params)
+    outputs, _ = coder.compress_image(Image.fromarray(np.ascontiguousarray(array)))
+
+    container = bytearray(CONTAINER_MAGIC + bytes([number, len(outputs)]))
+    for suffix, data in outputs.items():
+        suffix = suffix.encode()
+        container += bytes([len(suffix)]) + suffix + len(data).to_bytes(4, byteorder='big') + data
+    return bytes(container)
+
+
+def decompress_to_array(data):
+    data = memoryview(data)
+    if bytes(data[:len(CONTAINER_MAGIC)]) != CONTAINER_MAGIC:
+        raise ValueError("Not a compressed array")
+    number, count = data[len(CONTAINER_MAGIC)], data[len(CONTAINER_MAGIC) + 1]
+    if number not in ARRAY_MODES.values():
+        raise ValueError(f"Unknown codec: {number}")
+
+    outputs = {}
+    position = len(CONTAINER_MAGIC) + 2
+    for _ in range(count):
+        suffix_length = data[position]
+        suffix = bytes(data[position + 1:position + 1 + suffix_length]).decode()
+        position += 1 + suffix_length
+        size = int.from_bytes(data[position:position + 4], byteorder='big')
+        outputs[suffix] = bytes(data[position + 4:position + 4 + size])
+        position += 4 + size
+
+    coder = load_codec(ARRAY_MODE_NAMES[number])(None, 'image', None, None)
+    # The gray codecs write a single file, the colored ones a file per plane
+    return coder.decompress_image(outputs[''] if number in (2, 3) else outputs)
+
+
+# The result is the contents of a compressed text file, so it can also be
+# decompressed with the text codec and the command line interface
+def compress_bytes(data, coding_mode='fast', dictionary_path=None):
+    coder = load_codec('text')(None, 'text', None, None, coding_mode=coding_mode, dictionary_path=dictionary_path)
+    compressed, _ = coder.compress_data(data)
+    return coder.add_header_info() + compressed
+
+
+def decompress_bytes(data, dictionary_path=None):
+    coder = load_codec('text')(None, 'text', None, None, dictionary_path=dictionary_path)
+    data = coder.extract_header_info(bytes(data))
+    if coder.segmented:
+        raise ValueError("Segmented archives must be decompressed from a file")
+    return coder.decompress_data(data)
@@ -0,0 +1,343 @@
+# Local compression service. A small asyncio HTTP/1.1 server (TCP or Unix
+# socket) that hands the encode and decode work to a process pool:
+#   POST /compress/bytes?coding_mode=max_ratio     body: any bytes
+#   POST /decompress/bytes                         body: compressed bytes
+#   POST /compress/image?mode=gray_diff&...        body: an image file (PNG, BMP, ...)
+#   POST /decompress/image                         body: compressed image, returns PNG
+#   GET  /metrics                                  latency, queue time and throughput
+#   GET  /health
+# Jobs wait in a bounded queue; when it is full the request is answered with
+# 503 and Retry-After right away (backpressure instead of unbounded memory).
+# Results are streamed back with chunked transfer encoding (with a
+# Content-Length to HTTP/1.0 clients).
+#   python lzw_server.py --port 8765 --workers 4 --queue-size 32
+#   python lzw_server.py --unix /tmp/lzw.sock
+import io
+import os
+import json
+import time
+import signal
+import asyncio
+import argparse
+import multiprocessing
+from collections import deque
+from urllib.parse import urlsplit, parse_qsl
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from codec_registry import parse_param
+
+MAX_BODY_SIZE = 256 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Number of recent requests the latency percentiles are computed over
+METRICS_WINDOW = 1000
+
+STATUS_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                  413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+OPERATIONS = ('compress/bytes', 'decompress/bytes', 'compress/image', 'decompress/image')
+
+# The query parameters each operation accepts. Anything else is answered with
+# 400, so a client cannot pass codec arguments such as dictionary_path that
+# would make the server open its own files.
+OPERATION_PARAMS = {
+    'compress/bytes': {'coding_mode'},
+    'decompress/bytes': set(),
+    'compress/image': {'mode', 'coding_mode', 'run_length', 'scan_order', 'progressive', 'near_lossless',
+                       'memory_budget', 'color_transform', 'palette_mode', 'chained_dictionary'},
+    'decompress/image': set(),
+}
+
+
+# Runs in the worker processes
+def run_job(operation, params, payload):
+    import numpy as np
+    from PIL import Image
+    import lzw_api
+
+    if operation == 'compress/bytes':
+        return lzw_api.compress_bytes(payload, **params)
+    if operation == 'decompress/bytes':
+        return lzw_api.decompress_bytes(payload, **params)
+    if operation == 'compress/image':
+        mode = params.pop('mode', 'gray')
+        image = Image.open(io.BytesIO(payload)).convert('L' if mode.startswith('gray') else 'RGB')
+        return lzw_api.compress_array(np.array(image), mode, **params)
+    # decompress/image
+    output = io.BytesIO()
+    Image.fromarray(lzw_api.decompress_to_array(payload)).save(output, format='PNG')
+    return output.getvalue()
+
+
+class ServerMetrics:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.pool_restarts = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = deque(maxlen=METRICS_WINDOW)
+        self.queue_time = deque(maxlen=METRICS_WINDOW)
+        self.service_time = deque(maxlen=METRICS_WINDOW)
+
+    def summary(self, samples):
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        pick = lambda fraction: round(ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] * 1000, 2)
+        return {'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+                'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'max_ms': pick(1.0)}
+
+    def snapshot(self, queue_depth, queue_size, workers):
+        uptime = time.monotonic() - self.started
+        return {
+            'uptime_s': round(uptime, 2),
+            'workers': workers,
+            'queue_depth': queue_depth,
+            'queue_size': queue_size,
+            'requests': self.requests,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'pool_restarts': self.pool_restarts,
+            'throughput': {'requests_per_s': round(self.completed / uptime, 2),
+                           'mb_in_per_s': round(self.bytes_in / uptime / 1e6, 3),
+                           'mb_out_per_s': round(self.bytes_out / uptime / 1e6, 3)},
+            'latency': self.summary(self.latency),
+            'queue_time': self.summary(self.queue_time),
+            'service_time': self.summary(self.service_time),
+        }
+
+
+class CompressionServer:
+    def __init__(self, workers=None, queue_size=32):
+        self.workers = workers or os.cpu_count()
+        self.queue_size = queue_size
+        self.metrics = ServerMetrics()
+        self.executor = None
+        self.queue = None
+        self.dispatchers = []
+
+    # The worker processes are spawned rather than forked: the pool starts
+    # them on demand, and forked ones would inherit the sockets of the open
+    # connections and keep them open after the server has closed them
+    def new_executor(self):
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        self.executor = self.new_executor()
+        self.queue = asyncio.Queue(self.queue_size)
+        # One dispatcher per worker process, so a job leaves the queue only
+        # when a worker is free and the queue time is measured correctly
+        self.dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            return await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            future, operation, params, payload, enqueued = await self.queue.get()
+            started = time.perf_counter()
+            self.metrics.queue_time.append(started - enqueued)
+            executor = self.executor
+            try:
+                result = await loop.run_in_executor(executor, run_job, operation, params, payload)
+                if not future.cancelled():
+                    future.set_result(result)
+            except BrokenProcessPool as error:
+                # A worker died (killed, out of memory), the pool takes no more
+                # jobs. The first dispatcher to notice replaces it; the jobs it
+                # held fail.
+                if self.executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.executor = self.new_executor()
+                    self.metrics.pool_restarts += 1
+                if not future.cancelled():
+                    future.set_exception(error)
+            except Exception as error:
+                if not future.cancelled():
+                    future.set_exception(error)
+            finally:
+                self.metrics.service_time.append(time.perf_counter() - started)
+                self.queue.task_done()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader, writer)
+                if request is None:
+                    break
+                keep_alive = await self.handle_request(writer, *request)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader, writer):
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            await self.send(writer, 400, {'error': 'malformed request line'}, keep_alive=False)
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        # Only plain decimal digits are accepted, int() would also take signs,
+        # underscores and surrounding blanks
+        length = headers.get('content-length', '0')
+        if not (length.isascii() and length.isdigit()):
+            await self.send(writer, 400, {'error': f'invalid Content-Length {length!r}'}, keep_alive=False)
+            return None
+        length = int(length)
+        if length > MAX_BODY_SIZE:
+            await self.send(writer, 413, {'error': f'body larger than {MAX_BODY_SIZE} bytes'}, keep_alive=False)
+            return None
+        body = await reader.readexactly(length) if length else b''
+        keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+        return method, target, version, body, keep_alive
+
+    async def handle_request(self, writer, method, target, version, body, keep_alive):
+        received = time.perf_counter()
+        url = urlsplit(target)
+        path = url.path.strip('/')
+
+        if path == 'health':
+            await self.send(writer, 200, {'status': 'ok'}, keep_alive)
+            return keep_alive
+        if path == 'metrics':
+            await self.send(writer, 200, self.metrics.snapshot(self.queue.qsize(), self.queue_size, self.workers),
+                            keep_alive)
+            return keep_alive
+        if path not in OPERATIONS:
+            await self.send(writer, 404, {'error': f'unknown path /{path}'}, keep_alive)
+            return keep_alive
+        if method != 'POST':
+            await self.send(writer, 405, {'error': 'use POST'}, keep_alive)
+            return keep_alive
+
+        self.metrics.requests += 1
+        try:
+            params = {key: parse_param(value) for key, value in parse_qsl(url.query, strict_parsing=True)}
+            unknown = sorted(set(params) - OPERATION_PARAMS[path])
+            if unknown:
+                raise ValueError(f"not accepted by /{path}: {', '.join(unknown)}")
+        except (ValueError, OverflowError) as error:
+            self.metrics.failed += 1
+            await self.send(writer, 400, {'error': f'bad parameters: {error}'}, keep_alive)
+            return keep_alive
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((future, path, params, body, received))
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            await self.send(writer, 503, {'error': 'job queue is full'}, keep_alive, retry_after=1)
+            return keep_alive
+
+        try:
+            result = await future
+        except Exception as error:
+            self.metrics.failed += 1
+            # Errors of the input (bad image, wrong parameters) are client errors
+            status = 400 if isinstance(error, (ValueError, TypeError, OSError, KeyError)) else 500
+            await self.send(writer, status, {'error': f'{type(error).__name__}: {error}'}, keep_alive)
+            return keep_alive
+
+        content_type = 'image/png' if path == 'decompress/image' else 'application/octet-stream'
+        await self.stream(writer, result, content_type, keep_alive, chunked=version == 'HTTP/1.1')
+        self.metrics.completed += 1
+        self.metrics.bytes_in += len(body)
+        self.metrics.bytes_out += len(result)
+        self.metrics.latency.append(time.perf_counter() - received)
+        return keep_alive
+
+    def head(self, status, content_type, keep_alive, extra=()):
+        lines = [f'HTTP/1.1 {status} {STATUS_REASONS[status]}', f'Content-Type: {content_type}',
+                 f'Connection: {"keep-alive" if keep_alive else "close"}', *extra]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    # Sends a small JSON response
+    async def send(self, writer, status, document, keep_alive, retry_after=None):
+        body = json.dumps(document).encode()
+        extra = [f'Content-Length: {len(body)}']
+        if retry_after is not None:
+            extra.append(f'Retry-After: {retry_after}')
+        writer.write(self.head(status, 'application/json', keep_alive, extra) + body)
+        await writer.drain()
+
+    # Streams a result in chunks, waiting for the client to take each one.
+    # HTTP/1.0 has no chunked transfer encoding, those clients get the body
+    # as it is after a Content-Length.
+    async def stream(self, writer, data, content_type, keep_alive, chunked=True):
+        view = memoryview(data)
+        framing = 'Transfer-Encoding: chunked' if chunked else f'Content-Length: {len(view)}'
+        writer.write(self.head(200, content_type, keep_alive, [framing]))
+        for start in range(0, len(view), CHUNK_SIZE):
+            chunk = view[start:start + CHUNK_SIZE]
+            writer.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n' if chunked else chunk)
+            await writer.drain()
+        if chunked:
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+
+
+async def serve(args):
+    server = CompressionServer(args.workers, args.queue_size)
+    listener = await server.start(args.host, args.port, args.unix)
+    where = args.unix or f'http://{args.host}:{args.port}'
+    print(f"Serving on {where} with {server.workers} workers (queue size {server.queue_size})", flush=True)
+
+    # Stop on SIGTERM/SIGINT so the worker processes are shut down with us
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for name in ('SIGTERM', 'SIGINT'):
+        try:
+            loop.add_signal_handler(getattr(signal, name), stop.set)
+        except (NotImplementedError, AttributeError):
+            pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+    try:
+        async with listener:
+            await stop.wait()
+    finally:
+        server.close()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local LZW compression service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: all CPUs)')
+    parser.add_argument('--queue-size', type=int, default=32, help='jobs waiting before requests are rejected')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# Per-stage peak memory accounting for the codecs. Two ways of measuring:
+#   'rss'         samples the resident set size of the process from a background
+#                 thread; cheap, and includes numpy buffers and the interpreter
+#   'tracemalloc' the exact peak of the Python allocations made in the stage;
+#                 slows the pure Python LZW loops down about ten times
+#
+#   meter = MemoryMeter('rss')
+#   with meter.stage('lzw'):
+#       ...
+#   meter.info()  ->  ['Peak Memory (rss): lzw 45.2 MB (+12.0 MB), ...']
+#
+# A stage that is entered several times (e.g. once per strip) keeps the
+# highest peak.
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+MEMORY_STATS = ('rss', 'tracemalloc')
+
+# Seconds between two RSS samples
+SAMPLE_INTERVAL = 0.002
+
+# Estimated peak working memory of encoding or decoding one pixel in the gray
+# codecs (the pixel list, the dictionary, the code list and the bit string;
+# measured with tracemalloc, decoding noise is the worst case at about 145
+# bytes, a little more with the 16-bit differences of project3). Images whose
+# estimate exceeds the memory budget are coded in strips. Only the gray codecs
+# (project2 and project3) take a memory budget; the colored codecs code whole
+# planes and the text codec is split with its block size instead.
+ESTIMATED_BYTES_PER_PIXEL = 180
+
+SIZE_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+# Parses a size such as 4096, 64K or 512M (numbers are returned unchanged)
+def parse_size(text):
+    if isinstance(text, int):
+        return text
+    unit = text[-1:].upper()
+    if unit in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[unit])
+    return int(text)
+
+
+# Number of rows of a width x height image that can be coded at once within
+# the budget (the height when there is no budget or it suffices). The pixels
+# of the whole image and of the output are kept besides the working memory of
+# a strip.
+def budget_strip_rows(budget, width, height):
+    if budget is None or height == 0:
+        return height
+    available = budget - 2 * width * height
+    rows = available // max(width * ESTIMATED_BYTES_PER_PIXEL, 1)
+    # 65535 is the largest strip height the headers can hold
+    return int(min(max(rows, 1), height, 65535))
+
+
+# The statistics line about the budget of an image coded in strips of the
+# given number of rows
+def budget_info(budget, strip_rows, width, height):
+    estimate = min(strip_rows, height) * width * ESTIMATED_BYTES_PER_PIXEL + 2 * width * height
+    line = f"Memory Budget: {format_size(budget)}, estimated peak {format_size(estimate)}"
+    if strip_rows < height:
+        strips = -(-height // strip_rows)
+        line += f", coded in {strips} strips of {strip_rows} rows"
+    if estimate > budget:
+        line += " (over budget even with single-row strips)"
+    return line
+
+
+def format_size(size):
+    if abs(size) < 1 << 20:
+        return f"{size / (1 << 10):.1f} KB"
+    return f"{size / (1 << 20):.1f} MB"
+
+
+# Current resident set size in bytes. Reads /proc on Linux and falls back to
+# the peak RSS of the process (which only grows) elsewhere, None if neither
+# is available.
+def current_rss():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    return None
+
+
+class MemoryMeter:
+    def __init__(self, method='rss'):
+        if method not in MEMORY_STATS:
+            raise ValueError(f"Unknown memory statistics method: {method}")
+        self.method = method
+        # Stage name -> (peak, growth over the memory at the start of the stage)
+        self.peaks = {}
+
+    @contextmanager
+    def stage(self, name):
+        measure = self.trace_stage if self.method == 'tracemalloc' else self.sample_stage
+        with measure() as result:
+            yield
+        peak, growth = result
+        previous = self.peaks.get(name)
+        if previous is None or peak > previous[0]:
+            self.peaks[name] = (peak, growth)
+
+    @contextmanager
+    def trace_stage(self):
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = [0, 0]
+        try:
+            yield result
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            if started:
+                tracemalloc.stop()
+            result[:] = [peak, peak - start]
+
+    @contextmanager
+    def sample_stage(self):
+        start = current_rss() or 0
+        samples = [start]
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(SAMPLE_INTERVAL):
+                samples.append(current_rss() or 0)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        result = [0, 0]
+        try:
+            yield result
+        finally:
+            stop.set()
+            sampler.join()
+            samples.append(current_rss() or 0)
+            peak = max(samples)
+            result[:] = [peak, peak - start]
+
+    # The highest peak of all stages
+    def peak(self):
+        return max((peak for peak, _ in self.peaks.values()), default=0)
+
+    def info(self):
+        if not self.peaks:
+            return []
+        stages = ', '.join(f"{name} {format_size(peak)} (+{format_size(growth)})"
+                           for name, (peak, growth) in self.peaks.items())
+        return [f"Peak Memory ({self.method}): {stages}"]
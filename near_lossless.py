@@ -0,0 +1,66 @@
+# Near-lossless difference images (JPEG-LS style), shared by the difference
+# codecs (project3 and project5). Every residual against the reconstructed
+# predictor is quantized with step 2k+1, so the decoder rebuilds exactly the
+# same pixels and no pixel is off by more than k. The predictor is the same
+# as in the lossless mode (left pixel, upper pixel in the first column).
+#   residuals, reconstruction = quantize_difference_image(pixels, k)
+#   reconstruction = dequantize_difference_image(residuals, k)
+#   db = psnr(squared_error, count)
+import math
+import numpy as np
+
+
+# Quantizes prediction errors (an integer array) with step 2k+1, rounding to
+# the nearest multiple of the step
+def quantize_residuals(error, k):
+    return np.sign(error) * ((np.abs(error) + k) // (2 * k + 1))
+
+
+# Returns the quantized residuals and the reconstructed image of a
+# (height, width) pixel array. The first column is predicted top-down, the
+# other columns are processed as vectors.
+def quantize_difference_image(img_array, k):
+    step = 2 * k + 1
+    img_array = img_array.astype(np.int16)
+    height, width = img_array.shape
+    residuals = np.zeros_like(img_array)
+    reconstruction = np.zeros_like(img_array)
+
+    previous = 0
+    for i in range(height):
+        error = int(img_array[i, 0]) - previous
+        q = (abs(error) + k) // step
+        residuals[i, 0] = q if error >= 0 else -q
+        previous = min(max(previous + int(residuals[i, 0]) * step, 0), 255)
+        reconstruction[i, 0] = previous
+
+    for j in range(1, width):
+        residuals[:, j] = quantize_residuals(img_array[:, j] - reconstruction[:, j - 1], k)
+        reconstruction[:, j] = np.clip(reconstruction[:, j - 1] + residuals[:, j] * step, 0, 255)
+
+    return residuals, reconstruction.astype(np.uint8)
+
+
+# Rebuilds the image from the residuals of quantize_difference_image
+def dequantize_difference_image(residuals, k):
+    step = 2 * k + 1
+    residuals = residuals.astype(np.int16)
+    height, width = residuals.shape
+    reconstruction = np.zeros_like(residuals)
+
+    previous = 0
+    for i in range(height):
+        previous = min(max(previous + int(residuals[i, 0]) * step, 0), 255)
+        reconstruction[i, 0] = previous
+
+    for j in range(1, width):
+        reconstruction[:, j] = np.clip(reconstruction[:, j - 1] + residuals[:, j] * step, 0, 255)
+
+    return reconstruction.astype(np.uint8)
+
+
+# Peak signal-to-noise ratio in dB from the sum of the squared pixel errors
+# over count values (inf for identical images)
+def psnr(squared_error, count):
+    mse = squared_error / max(count, 1)
+    return float('inf') if mse == 0 else 10 * math.log10(255 ** 2 / mse)
@@ -0,0 +1,56 @@
+# Pixel scan orders shared by the gray codecs (project2 and project3): the
+# order in which the pixels of an image are fed to the LZW stage.
+#   image_data = pixels.ravel()[scan_permutation('hilbert', width, height)]
+from functools import lru_cache
+import numpy as np
+
+# raster (row by row), serpentine (every other row reversed), column (column
+# by column) and hilbert (a Hilbert curve inside HILBERT_TILE x HILBERT_TILE
+# tiles that are visited row by row). The numbers are stored in the headers.
+SCAN_ORDERS = {'raster': 0, 'serpentine': 1, 'column': 2, 'hilbert': 3}
+HILBERT_TILE = 32
+
+
+# Returns the flat (row-major) pixel indices in scan order. The permutation is
+# cached for each (order, width, height), apply it with data[permutation].
+@lru_cache(maxsize=32)
+def scan_permutation(order, width, height):
+    indices = np.arange(width * height, dtype=np.int64).reshape(height, width)
+    if order == 'serpentine':
+        indices[1::2] = indices[1::2, ::-1]
+    elif order == 'column':
+        indices = indices.T
+    elif order == 'hilbert':
+        # Hilbert curve coordinates of one tile (vectorized d2xy)
+        d = np.arange(HILBERT_TILE * HILBERT_TILE)
+        x = np.zeros_like(d)
+        y = np.zeros_like(d)
+        t = d.copy()
+        s = 1
+        while s < HILBERT_TILE:
+            rx = (t // 2) & 1
+            ry = (t ^ rx) & 1
+            # Rotate the quadrant
+            flip = (ry == 0) & (rx == 1)
+            x = np.where(flip, s - 1 - x, x)
+            y = np.where(flip, s - 1 - y, y)
+            swap = ry == 0
+            x, y = np.where(swap, y, x), np.where(swap, x, y)
+            x += s * rx
+            y += s * ry
+            t //= 4
+            s *= 2
+        # The curve of every tile, with the pixels outside the image dropped
+        tile_rows = np.arange(0, height, HILBERT_TILE)
+        tile_cols = np.arange(0, width, HILBERT_TILE)
+        rows = (tile_rows[:, None, None] + y[None, None, :]).repeat(len(tile_cols), axis=1)
+        cols = (tile_cols[None, :, None] + x[None, None, :]).repeat(len(tile_rows), axis=0)
+        rows = rows.ravel()
+        cols = cols.ravel()
+        inside = (rows < height) & (cols < width)
+        indices = rows[inside] * width + cols[inside]
+    elif order != 'raster':
+        raise ValueError(f"Unknown scan order: {order}")
+    permutation = indices.ravel().copy()
+    permutation.flags.writeable = False
+    return permutation
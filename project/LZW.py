@@ -1,9 +1,146 @@
-import os
-os.environ["PATH"] += os.pathsep + "C:/Program Files/Graphviz/bin/"
 import os  # the os module is used for file and directory operations
 import math  # the math module provides access to mathematical functions
-from PIL import Image  # the Image class is used for image operations
-import numpy as np  # the numpy library is used for numerical
+import zlib  # the zlib module is used for the checksums of the dictionaries
+import json  # the json module is used for the checkpoint files
+import sys  # the sys module gives the byte order of the aligned codes
+from array import array  # the array module stores the aligned codes
+from huffman_coding import huffman_encode_codes, huffman_decode_codes  # the max_ratio stage
+# Pillow and NumPy are only needed by the image methods and are imported
+# there, so text compression starts without loading them
+
+# Compressed files that use optional features start with this magic and a
+# flags field, files without it are read as plain LZW code streams
+HEADER_MAGIC = b'LZW\x01'
+FLAG_MAX_RATIO = 0x0001
+FLAG_DICTIONARY = 0x0002
+FLAG_SEGMENTED = 0x0004
+FLAG_SPEED = 0x0008
+
+# Segmented archives end with a block index followed by this magic
+INDEX_MAGIC = b'LZWI'
+
+# The longest possible header (magic, flags and the dictionary id)
+MAX_HEADER_SIZE = len(HEADER_MAGIC) + 2 + 4
+
+# Trained dictionary files start with this magic, followed by the dictionary
+# id (a CRC-32 of the entries), the number of entries and the entries
+DICTIONARY_MAGIC = b'LZWD'
+
+# Incompressible data (noise, already compressed files) is stored as it is:
+# compressed data whose code length byte is STORED_CODELENGTH holds the raw
+# bytes. Inputs of at least PRECHECK_SIZE bytes are checked before the LZW
+# stage: if a slice of TRIAL_SIZE bytes from their middle has an entropy of
+# at least PRECHECK_ENTROPY bits per byte, it is encoded on trial and the
+# LZW stage is skipped when its compression ratio is below TRIAL_RATIO. (a
+# slice compresses worse than the whole input, noise gets about 0.65)
+STORED_CODELENGTH = 0
+PRECHECK_SIZE = 65536
+PRECHECK_ENTROPY = 7.0
+TRIAL_SIZE = 16384
+TRIAL_RATIO = 0.8
+
+# 'fast' stores every code with codelength bits, 'max_ratio' adds a canonical
+# Huffman stage over the code-width buckets of the LZW code stream and 'speed'
+# stores every code as a little-endian 16-bit (codelength up to 16) or 32-bit
+# integer, so no bit packing or unpacking is needed
+CODING_MODES = ('fast', 'max_ratio', 'speed')
+
+
+# A function that builds a primed initial dictionary from a list of sample
+# inputs (bytes-like objects), saves it to the given path and returns its id.
+# The samples are run through the LZW algorithm with one shared dictionary
+# and the sequences that saved the most bytes are kept (together with all
+# of their prefixes, so the result is a valid LZW dictionary).
+# ------------------------------------------------------------------------------
+def train_dictionary(samples, dictionary_path, max_entries=4096):
+   dictionary = {}   # (prefix code << 8) | byte -> code
+   entries = []   # entry i is the sequence with the code 256 + i
+   lengths = []   # the length of each sequence in bytes
+   uses = []   # how often each sequence was output
+   for sample in samples:
+      data = memoryview(sample).cast('B')
+      if len(data) == 0:
+         continue
+      w = data[0]
+      for k in data[1:]:
+         code = dictionary.get((w << 8) | k)
+         if code is not None:
+            w = code
+            continue
+         if w >= 256:
+            uses[w - 256] += 1
+         dictionary[(w << 8) | k] = 256 + len(entries)
+         entries.append((w, k))
+         lengths.append(lengths[w - 256] + 1 if w >= 256 else 2)
+         uses.append(0)
+         w = k
+      if w >= 256:
+         uses[w - 256] += 1
+
+   # pick the sequences by the number of bytes they covered and add the
+   # missing prefixes as long as the dictionary is not full
+   selected = set()
+   for index in sorted(range(len(entries)), key=lambda i: -uses[i] * lengths[i]):
+      if uses[index] == 0 or len(selected) >= max_entries:
+         break
+      chain = []
+      while index >= 0 and index not in selected:
+         chain.append(index)
+         index = entries[index][0] - 256
+      if len(selected) + len(chain) <= max_entries:
+         selected.update(chain)
+
+   # renumber the selected sequences so that every prefix comes first
+   order = sorted(selected, key=lambda i: (lengths[i], i))
+   new_codes = {index: 256 + n for n, index in enumerate(order)}
+   body = bytearray()
+   for index in order:
+      w, k = entries[index]
+      prefix = new_codes[w - 256] if w >= 256 else w
+      body += prefix.to_bytes(3, byteorder='big') + bytes([k])
+
+   dictionary_id = zlib.crc32(body)
+   with open(dictionary_path, 'wb') as out_file:
+      out_file.write(DICTIONARY_MAGIC + dictionary_id.to_bytes(4, byteorder='big'))
+      out_file.write(len(order).to_bytes(4, byteorder='big') + bytes(body))
+   return dictionary_id
+
+
+# A function that reads a dictionary saved by train_dictionary and returns its
+# id and the list of its (prefix code, byte) entries.
+# ------------------------------------------------------------------------------
+def load_dictionary(dictionary_path):
+   with open(dictionary_path, 'rb') as in_file:
+      data = in_file.read()
+   if data[:4] != DICTIONARY_MAGIC:
+      raise ValueError('%s is not an LZW dictionary file' % dictionary_path)
+   dictionary_id = int.from_bytes(data[4:8], byteorder='big')
+   count = int.from_bytes(data[8:12], byteorder='big')
+   body = data[12:12 + 4 * count]
+   if len(body) != 4 * count or zlib.crc32(body) != dictionary_id:
+      raise ValueError('%s is damaged' % dictionary_path)
+   entries = [(int.from_bytes(body[i:i + 3], byteorder='big'), body[i + 3])
+              for i in range(0, len(body), 4)]
+   return dictionary_id, entries
+
+# The LZWCoding object used by the worker processes of a block pool
+block_coder = None
+
+# Functions run by the worker processes that compress and decompress the blocks
+# of a segmented archive in parallel
+# ------------------------------------------------------------------------------
+def init_block_worker(coder):
+   global block_coder
+   block_coder = coder
+
+def compress_block(block):
+   byte_array, bits_per_code = block_coder.compress_data(block)
+   return byte_array, bits_per_code, block_coder.codelength
+
+def decompress_block_at(archive_path, offset):
+   with open(archive_path, 'rb') as in_file:
+      return block_coder.read_segment(in_file, offset)
+
 
 # A class that implements the LZW compression and decompression algorithms as
 # well as the necessary utility methods for text files.
@@ -11,7 +148,8 @@ import numpy as np  # the numpy library is used for numerical
 class LZWCoding:
    # A constructor with two input parameters
    # ---------------------------------------------------------------------------
-   def __init__(self, filename, data_type, filepath, outputpath):
+   def __init__(self, filename, data_type, filepath, outputpath, coding_mode='fast',
+                dictionary_path=None):
       # use the input parameters to set the instance variables
       self.filename = filename
       self.data_type = data_type   # e.g., 'text'
@@ -20,13 +158,43 @@ class LZWCoding:
       self.codelength = None
       self.filepath = filepath
       self.outputpath = outputpath
+      if coding_mode not in CODING_MODES:
+         raise ValueError('Unknown coding mode: %s' % coding_mode)
+      self.coding_mode = coding_mode
+      # a trained dictionary (see train_dictionary) to start the byte codec
+      # from, both for compression and decompression
+      self.dictionary_id = None
+      self.dictionary_entries = []
+      if dictionary_path is not None:
+         self.dictionary_id, self.dictionary_entries = load_dictionary(dictionary_path)
+      # the initial encoder and decoder dictionaries are built once and copied
+      # for every input
+      self.initial_codes = {(w << 8) | k: 256 + i for i, (w, k) in enumerate(self.dictionary_entries)}
+      self.initial_sequences = [bytes([i]) for i in range(256)]
+      for w, k in self.dictionary_entries:
+         self.initial_sequences.append(self.initial_sequences[w] + bytes([k]))
+      # a segmented archive stores the compressed data as a list of
+      # independently coded segments, so new data can be appended to it
+      self.segmented = False
 
 
 
    # A method that compresses the contents of a text file to a binary output file 
    # and returns the path of the output file.
+   # (the file is read as bytes, so any encoding or file type is supported and
+   # the decompressed file is identical to the original one)
+   # With block_size the output is a segmented archive: the input is cut into
+   # blocks that are coded independently (in parallel by a pool of worker
+   # processes) and a block index is stored at the end of the file.
+   # With append=True the file is added to the end of a segmented archive, so
+   # only the new data is compressed.
+   # With checkpoint=True the progress of a segmented compression is saved to
+   # outputpath + '.checkpoint' after every block, and resume=True continues
+   # an interrupted compression from its last checkpoint. (the output is the
+   # same as the output of an uninterrupted run)
    # ---------------------------------------------------------------------------
-   def compress_text_file(self):
+   def compress_text_file(self, append=False, block_size=None, workers=None,
+                          checkpoint=False, resume=False):
       # get the current directory where this program is placed
       #current_directory = os.path.dirname(os.path.realpath(__file__))
       # build the path of the input file
@@ -42,34 +210,87 @@ class LZWCoding:
       output_path = self.outputpath
       output_file = os.path.basename(output_path)
 
-      # read the contents of the input file
-      in_file = open(input_path, 'r')
-      text = in_file.read().rstrip()
-      in_file.close()
+      checkpoint_path = output_path + '.checkpoint'
+      checkpoint = checkpoint or resume
+      if checkpoint and append:
+         raise ValueError('Checkpoints are not supported while appending')
+      if checkpoint and block_size is None:
+         raise ValueError('Checkpoints need a block size')
+      state = self.load_checkpoint(checkpoint_path, block_size) if resume else None
 
-      # encode the text by using the LZW compression algorithm
-      encoded_text_as_integers = self.encode(text)
-      # get the binary string that corresponds to the compressed text
-      encoded_text = self.int_list_to_binary_string(encoded_text_as_integers)
-      # add the code length info to the beginning of the encoded text
-      encoded_text = self.add_code_length_info(encoded_text)
-      # perform padding if needed
-      padded_encoded_text = self.pad_encoded_data(encoded_text)
-      # convert the resulting string into a byte array
-      byte_array = self.get_byte_array(padded_encoded_text)
+      appending = append and os.path.exists(output_path)
+      if state is not None:
+         # continue after the last block that was completely written
+         self.segmented = True
+         out_file = open(output_path, 'r+b')
+         out_file.seek(state['output_offset'])
+         out_file.truncate()
+         index = [tuple(entry) for entry in state['index']]
+         start_size = 0
+      elif appending:
+         # continue with the settings recorded in the existing archive
+         out_file = open(output_path, 'r+b')
+         self.extract_header_info(out_file.read(MAX_HEADER_SIZE))
+         if not self.segmented:
+            out_file.close()
+            raise ValueError(output_file + ' is not an appendable (segmented) archive')
+         # the new segments overwrite the old block index
+         index, index_offset = self.read_block_index(out_file)
+         out_file.seek(index_offset)
+         out_file.truncate()
+         start_size = index_offset
+      else:
+         self.segmented = self.segmented or append or block_size is not None
+         out_file = open(output_path, 'wb')   # binary mode
+         out_file.write(self.add_header_info())
+         index = []
+         start_size = 0
 
-      # write the bytes in the byte array to the output file (compressed file)
-      out_file = open(output_path, 'wb')   # binary mode
-      out_file.write(bytes(byte_array))
+      in_file = open(input_path, 'rb')   # binary mode
+      if self.segmented:
+         uncompressed_size = 0
+         if state is not None:
+            in_file.seek(state['input_offset'])
+            uncompressed_size = state['input_offset']
+         # read and compress the input block by block
+         blocks = iter(lambda: in_file.read(block_size or -1), b'')
+         if workers is None:
+            workers = os.cpu_count() if block_size else 1
+         bits = []
+         codelengths = []
+         for byte_array, bits_per_code, codelength, size in self.compress_blocks(blocks, workers):
+            # a segment starts with the length of its compressed data
+            index.append((out_file.tell(), size))
+            out_file.write(len(byte_array).to_bytes(4, byteorder='big') + byte_array)
+            bits.append(bits_per_code)
+            codelengths.append(codelength)
+            uncompressed_size += size
+            if checkpoint:
+               self.save_checkpoint(checkpoint_path, out_file, block_size, uncompressed_size, index)
+         self.write_block_index(out_file, index)
+         stored_blocks = (codelengths.count(STORED_CODELENGTH), len(codelengths))
+         self.codelength = max(codelengths, default=self.codelength)
+         bits_per_code = sum(bits) / max(len(bits), 1)
+      else:
+         # read the contents of the input file and compress them at once
+         data = in_file.read()
+         byte_array, bits_per_code = self.compress_data(data)
+         # write the bytes in the byte array to the output file (compressed file)
+         out_file.write(byte_array)
+         uncompressed_size = len(data)
+         stored_blocks = (int(self.codelength == STORED_CODELENGTH), 1)
+      in_file.close()
+      compressed_size = out_file.tell() - start_size
       out_file.close()
+      if checkpoint and os.path.exists(checkpoint_path):
+         # the compression is complete
+         os.remove(checkpoint_path)
 
       # notify the user that the compression process is finished
       print(input_file + ' is compressed into ' + output_file + '.')
       # compute and print the details of the compression process
-      uncompressed_size = len(text)
       print('Uncompressed Size: ' + '{:,d}'.format(uncompressed_size) + ' bytes')
       print('Code Length: ' + str(self.codelength))
-      compressed_size = len(byte_array)
       print('Compressed Size: ' + '{:,d}'.format(compressed_size) + ' bytes')
       compression_ratio = uncompressed_size / compressed_size
       print('Compression Ratio: ' + '{:.2f}'.format(compression_ratio))
@@ -78,12 +299,240 @@ class LZWCoding:
             f"{input_file} is compressed into {output_file}.",
             f"Uncompressed Size: {uncompressed_size:,d} bytes",
             f"Code Length: {self.codelength}",
+            f"Coding Mode: {self.coding_mode} ({bits_per_code:.2f} bits per code)",
             f"Compressed Size: {compressed_size:,d} bytes",
             f"Compression Ratio: {compression_ratio:.2f}"
         ]
+      if stored_blocks[0]:
+         info.append(f"Stored Raw: {stored_blocks[0]:,d} of {stored_blocks[1]:,d} blocks (incompressible)")
+      if self.segmented:
+         info.append(f"Blocks: {len(index):,d} ({workers} worker processes)")
+      if appending:
+         info.append(f"Appended as new segments to {output_file}")
+      if state is not None:
+         info.append(f"Resumed after {len(state['index']):,d} blocks ({state['input_offset']:,d} bytes)")
 
       # return the path of the output file
       return output_path, info
+
+   # A method that saves the progress of a segmented compression: the input
+   # and output offsets after the last written block and the block index. The
+   # dictionary starts over at every block, so the dictionary state at the
+   # checkpoint is the initial one and only its id is stored. The settings are
+   # stored as well, so a resume with different settings is rejected.
+   # ---------------------------------------------------------------------------
+   def save_checkpoint(self, checkpoint_path, out_file, block_size, input_offset, index):
+      # the compressed data must be on the disk before the checkpoint is
+      out_file.flush()
+      os.fsync(out_file.fileno())
+      input_stat = os.stat(self.filepath)
+      state = {
+         'input_path': os.path.abspath(self.filepath),
+         'input_size': input_stat.st_size,
+         'input_mtime_ns': input_stat.st_mtime_ns,
+         'block_size': block_size,
+         'coding_mode': self.coding_mode,
+         'dictionary_id': self.dictionary_id,
+         'input_offset': input_offset,
+         'output_offset': out_file.tell(),
+         'index': index
+      }
+      temp_path = checkpoint_path + '.tmp'
+      with open(temp_path, 'w') as checkpoint_file:
+         json.dump(state, checkpoint_file)
+      os.replace(temp_path, checkpoint_path)
+
+   # A method that loads the checkpoint of an interrupted compression and
+   # returns it (or None when there is nothing to resume).
+   # ---------------------------------------------------------------------------
+   def load_checkpoint(self, checkpoint_path, block_size):
+      if not os.path.exists(checkpoint_path) or not os.path.exists(self.outputpath):
+         return None
+      with open(checkpoint_path) as checkpoint_file:
+         state = json.load(checkpoint_file)
+      input_stat = os.stat(self.filepath)
+      settings = (os.path.abspath(self.filepath), input_stat.st_size, input_stat.st_mtime_ns,
+                  block_size, self.coding_mode, self.dictionary_id)
+      saved = (state['input_path'], state['input_size'], state['input_mtime_ns'],
+               state['block_size'], state['coding_mode'], state['dictionary_id'])
+      if settings != saved:
+         raise ValueError('The checkpoint was made for a different input or settings')
+      return state
+
+   # A method that compresses the given blocks of bytes and yields the
+   # compressed data, the bits per code, the code length and the size of each
+   # block in order. (the blocks are shared out to worker processes)
+   # ---------------------------------------------------------------------------
+   def compress_blocks(self, blocks, workers):
+      if workers <= 1:
+         for block in blocks:
+            byte_array, bits_per_code = self.compress_data(block)
+            yield byte_array, bits_per_code, self.codelength, len(block)
+         return
+
+      from collections import deque
+      from concurrent.futures import ProcessPoolExecutor
+      with ProcessPoolExecutor(workers, initializer=init_block_worker, initargs=(self,)) as executor:
+         # keep a bounded number of blocks in flight to limit the memory use
+         pending = deque()
+         for block in blocks:
+            pending.append((executor.submit(compress_block, block), len(block)))
+            if len(pending) >= 2 * workers:
+               future, size = pending.popleft()
+               yield future.result() + (size,)
+         while pending:
+            future, size = pending.popleft()
+            yield future.result() + (size,)
+
+   # A method that writes the block index of a segmented archive: the offset
+   # and the uncompressed size of every segment, the number of segments and
+   # the index magic.
+   # ---------------------------------------------------------------------------
+   def write_block_index(self, out_file, index):
+      for offset, size in index:
+         out_file.write(offset.to_bytes(8, byteorder='big') + size.to_bytes(8, byteorder='big'))
+      out_file.write(len(index).to_bytes(4, byteorder='big') + INDEX_MAGIC)
+
+   # A method that reads the block index at the end of a segmented archive and
+   # returns the list of (offset, size) entries and the offset of the index.
+   # ---------------------------------------------------------------------------
+   def read_block_index(self, in_file):
+      file_size = in_file.seek(0, os.SEEK_END)
+      in_file.seek(file_size - 8)
+      trailer = in_file.read(8)
+      if trailer[4:] != INDEX_MAGIC:
+         raise ValueError('The block index of the archive is missing')
+      count = int.from_bytes(trailer[:4], byteorder='big')
+      index_offset = file_size - 8 - 16 * count
+      in_file.seek(index_offset)
+      data = in_file.read(16 * count)
+      index = [(int.from_bytes(data[i:i + 8], byteorder='big'), int.from_bytes(data[i + 8:i + 16], byteorder='big'))
+               for i in range(0, len(data), 16)]
+      return index, index_offset
+
+   # A method that reads and decompresses the segment at the given offset.
+   # ---------------------------------------------------------------------------
+   def read_segment(self, in_file, offset):
+      in_file.seek(offset)
+      length = int.from_bytes(in_file.read(4), byteorder='big')
+      return self.decompress_data(in_file.read(length))
+
+   # A method that decompresses a single block of a segmented archive (given by
+   # filepath) without decompressing the blocks before it.
+   # ---------------------------------------------------------------------------
+   def decompress_block(self, block_number):
+      with open(self.filepath, 'rb') as in_file:
+         self.extract_header_info(in_file.read(MAX_HEADER_SIZE))
+         if not self.segmented:
+            raise ValueError('Only segmented archives can be read block by block')
+         index, _ = self.read_block_index(in_file)
+         return self.read_segment(in_file, index[block_number][0])
+
+   # A method that compresses bytes with the LZW compression algorithm and
+   # returns the compressed data (padding info, code length info and codes)
+   # and the average number of bits spent on each code.
+   # ---------------------------------------------------------------------------
+   def compress_data(self, data):
+      # data that would grow (such as noise) skips the LZW stage
+      if self.is_incompressible(data):
+         return self.store_data(data)
+      # encode the bytes by using the LZW compression algorithm
+      encoded_data_as_integers = self.encode_bytes(data)
+      if self.coding_mode == 'speed':
+         # the aligned codes are written without any bit string
+         compressed_data = self.pack_aligned_codes(encoded_data_as_integers)
+         bits_per_code = 8 * (len(compressed_data) - 2) / max(len(encoded_data_as_integers), 1)
+      else:
+         # get the binary string that corresponds to the compressed data
+         encoded_data = self.pack_codes(encoded_data_as_integers)
+         bits_per_code = len(encoded_data) / max(len(encoded_data_as_integers), 1)
+         # add the code length info to the beginning of the encoded data
+         encoded_data = self.add_code_length_info(encoded_data)
+         # perform padding if needed
+         padded_encoded_data = self.pad_encoded_data(encoded_data)
+         # convert the resulting string into bytes
+         compressed_data = bytes(self.get_byte_array(padded_encoded_data))
+      # data that grew in the LZW stage is stored as well
+      if len(compressed_data) > len(data) + 2:
+         return self.store_data(data)
+      return compressed_data, bits_per_code
+
+   # A method that stores the integer codes as little-endian 16-bit or 32-bit
+   # integers (chosen by the code length) after the padding info (always 0)
+   # and the code length info, and returns the resulting bytes.
+   # ---------------------------------------------------------------------------
+   def pack_aligned_codes(self, int_list):
+      codes = array('H' if self.codelength <= 16 else 'I', int_list)
+      if sys.byteorder == 'big':
+         codes.byteswap()
+      return bytes([0, self.codelength]) + codes.tobytes()
+
+   # A method that reverses pack_aligned_codes and returns the integer codes.
+   # (on little-endian hosts a view of the compressed data is returned, so a
+   # memory-mapped file is decoded without copying the codes)
+   # ---------------------------------------------------------------------------
+   def unpack_aligned_codes(self, compressed_data):
+      self.codelength = compressed_data[1]
+      typecode = 'H' if self.codelength <= 16 else 'I'
+      data = memoryview(compressed_data)[2:]
+      if sys.byteorder == 'little':
+         return data.cast(typecode)
+      codes = array(typecode)
+      codes.frombytes(data)
+      codes.byteswap()
+      return codes
+
+   # A method that returns whether the LZW stage would grow the given data.
+   # (only large inputs are checked, by the entropy and a trial encode of a
+   # slice from their middle, the others are encoded and stored if they grew)
+   # ---------------------------------------------------------------------------
+   def is_incompressible(self, data):
+      if len(data) < PRECHECK_SIZE:
+         return False
+      start = (len(data) - TRIAL_SIZE) // 2
+      sample = memoryview(data).cast('B')[start:start + TRIAL_SIZE]
+      from collections import Counter
+      entropy = -sum(count / TRIAL_SIZE * math.log2(count / TRIAL_SIZE)
+                     for count in Counter(sample).values())
+      if entropy < PRECHECK_ENTROPY:
+         return False
+      codes = self.encode_bytes(sample)
+      return 8 * TRIAL_SIZE < TRIAL_RATIO * len(codes) * self.codelength
+
+   # A method that returns the stored form of the given data (the padding
+   # info, the code length STORED_CODELENGTH and the raw bytes) and its bits
+   # per byte.
+   # ---------------------------------------------------------------------------
+   def store_data(self, data):
+      self.codelength = STORED_CODELENGTH
+      return bytes([0, STORED_CODELENGTH]) + bytes(data), 8.0
+
+   # A method that reverses compress_data and returns the decompressed bytes.
+   # ---------------------------------------------------------------------------
+   def decompress_data(self, compressed_data):
+      # stored data holds the raw bytes after the padding and code length info
+      if compressed_data[1:2] == bytes([STORED_CODELENGTH]):
+         self.codelength = STORED_CODELENGTH
+         return bytes(compressed_data[2:])
+      if self.coding_mode == 'speed':
+         # the aligned codes are decoded where they are
+         return self.decode_bytes(self.unpack_aligned_codes(compressed_data))
+      # create a binary string from the compressed bytes
+      from io import StringIO   # using StringIO for efficiency
+      bit_string = StringIO()
+      for byte in compressed_data:
+         bits = bin(byte)[2:].rjust(8, '0')
+         bit_string.write(bits)
+      bit_string = bit_string.getvalue()
+
+      # remove padding
+      bit_string = self.remove_padding(bit_string)
+      # remove the code length info and set the instance variable codelength
+      bit_string = self.extract_code_length_info(bit_string)
+      # convert the compressed binary string to a list of integer values
+      encoded_data = self.unpack_codes(bit_string)
+      # decode the encoded data by using the LZW decompression algorithm
+      return self.decode_bytes(encoded_data)
    
 
 
@@ -102,6 +551,8 @@ class LZWCoding:
       output_file = self.filename + '.bin'
       output_path = current_directory + '/' + output_file
 
+      from PIL import Image   # imported here, text compression does not need it
+      import numpy as np
       # read the contents of the input file
       image = Image.open(input_path).convert('L')
       image_data = np.array(image, dtype=np.uint8).flatten().tolist()
@@ -140,6 +591,8 @@ class LZWCoding:
 
 
    def calculate_entropy(self, image_path):
+      from PIL import Image
+      import numpy as np
       # Load the grayscale image
       img = Image.open(image_path).convert("L")  # Convert to grayscale if not already
     
@@ -201,6 +654,42 @@ class LZWCoding:
 
 
 
+   # A method that encodes bytes (or any bytes-like object such as a bytearray
+   # or a memoryview) into a list of integer values by using the LZW
+   # compression algorithm and returns the resulting list.
+   # (the output is the same code stream that encode produces for Latin-1 text)
+   # ---------------------------------------------------------------------------
+   def encode_bytes(self, uncompressed_data):
+      # iterate over the byte values without copying the input
+      data = memoryview(uncompressed_data).cast('B')
+      # the single bytes are the codes 0-255 and a longer sequence is stored
+      # by the code of its prefix w and its last byte k as the key (w << 8) | k
+      # (the entries of a trained dictionary come right after the single bytes)
+      dictionary = self.initial_codes.copy()
+      dict_size = 256 + len(dictionary)
+
+      result = []   # initialize a list to store the encoded values to output
+      if len(data) > 0:
+         w = data[0]   # the code of the current sequence
+         for k in data[1:]:
+            code = dictionary.get((w << 8) | k)
+            if code is not None:   # if wk exists in the dictionary
+               w = code
+            else:   # otherwise
+               # output the code for w and add wk to the dictionary
+               result.append(w)
+               dictionary[(w << 8) | k] = dict_size
+               dict_size += 1
+               w = k
+         # add the code for the remaining sequence
+         result.append(w)
+
+      # set the code length based on the size of the resulting dictionary
+      self.codelength = math.ceil(math.log2(dict_size))
+
+      # return the encoded values (a list of integer dictionary values)
+      return result
+
    # A method that encodes the grayscale image data into a list of integer values
    # by using the LZW compression algorithm and returns the resulting list.
    # ---------------------------------------------------------------------------
@@ -234,9 +723,69 @@ class LZWCoding:
       # Son karakter dizisini ekle
       result.append(dictionary[w])
       
-      self.codelength = np.ceil(np.log2(len(dictionary))).astype(int)
+      self.codelength = math.ceil(math.log2(len(dictionary)))
       return result
 
+   # A method that converts the integer codes into a binary string by using the
+   # bit packer of the selected coding mode.
+   # ---------------------------------------------------------------------------
+   def pack_codes(self, int_list):
+      if self.coding_mode == 'max_ratio':
+         return huffman_encode_codes(int_list, self.codelength)
+      return self.int_list_to_binary_string(int_list)
+
+   # A method that converts a binary string created by pack_codes back into
+   # the list of integer codes.
+   # ---------------------------------------------------------------------------
+   def unpack_codes(self, bitstring):
+      if self.coding_mode == 'max_ratio':
+         return huffman_decode_codes(bitstring, self.codelength)
+      return self.binary_string_to_int_list(bitstring)
+
+   # A method that returns the header written in front of the compressed data.
+   # (nothing is added when no optional feature is used)
+   # ---------------------------------------------------------------------------
+   def add_header_info(self):
+      flags = 0
+      fields = b''
+      if self.coding_mode == 'max_ratio':
+         flags |= FLAG_MAX_RATIO
+      if self.coding_mode == 'speed':
+         flags |= FLAG_SPEED
+      if self.dictionary_id is not None:
+         flags |= FLAG_DICTIONARY
+         fields += self.dictionary_id.to_bytes(4, byteorder='big')
+      if self.segmented:
+         flags |= FLAG_SEGMENTED
+      if not flags:
+         return b''
+      return HEADER_MAGIC + flags.to_bytes(2, byteorder='big') + fields
+
+   # A method that removes the header from the compressed data, sets the
+   # instance variables for the recorded features and returns the rest.
+   # ---------------------------------------------------------------------------
+   def extract_header_info(self, data):
+      flags = 0
+      if data[:len(HEADER_MAGIC)] == HEADER_MAGIC:
+         flags = int.from_bytes(data[len(HEADER_MAGIC):len(HEADER_MAGIC) + 2], byteorder='big')
+         data = data[len(HEADER_MAGIC) + 2:]
+      self.coding_mode = 'fast'
+      if flags & FLAG_MAX_RATIO:
+         self.coding_mode = 'max_ratio'
+      elif flags & FLAG_SPEED:
+         self.coding_mode = 'speed'
+      self.segmented = bool(flags & FLAG_SEGMENTED)
+      # the data must be decompressed with the dictionary it was compressed with
+      dictionary_id = None
+      if flags & FLAG_DICTIONARY:
+         dictionary_id = int.from_bytes(data[:4], byteorder='big')
+         data = data[4:]
+      if dictionary_id != self.dictionary_id:
+         if dictionary_id is None:
+            raise ValueError('The data was compressed without a dictionary')
+         raise ValueError('The data was compressed with the dictionary %08x' % dictionary_id)
+      return data
+
    # A method that converts the integer list returned by the compress method
    # into a binary string and returns the resulting string.
    # ---------------------------------------------------------------------------
@@ -306,8 +855,10 @@ class LZWCoding:
 
    # A method that reads the contents of a compressed binary file, performs
    # decompression and writes the decompressed output to a text file.
+   # (the blocks of a segmented archive are decompressed by a pool of worker
+   # processes, starting with first_block)
    # ---------------------------------------------------------------------------
-   def decompress_text_file(self):
+   def decompress_text_file(self, workers=None, first_block=0):
       #assume filepath given by gui
       input_path = self.filepath
       input_file = os.path.basename(input_path)
@@ -316,31 +867,41 @@ class LZWCoding:
       output_path = self.outputpath
       output_file = os.path.basename(output_path)
 
-      # read the contents of the input file
       in_file = open(input_path, 'rb')   # binary mode
-      bytes = in_file.read()
-      in_file.close()
-
-      # create a binary string from the bytes read from the file
-      from io import StringIO   # using StringIO for efficiency
-      bit_string = StringIO()
-      for byte in bytes:
-         bits = bin(byte)[2:].rjust(8, '0')
-         bit_string.write(bits)
-      bit_string = bit_string.getvalue()
+      out_file = open(output_path, 'wb')   # binary mode
+      # remove the header and set the coding mode
+      head = in_file.read(MAX_HEADER_SIZE)
+      rest = self.extract_header_info(head)
+      in_file.seek(len(head) - len(rest))
 
-      # remove padding
-      bit_string = self.remove_padding(bit_string)
-      # remove the code length info and set the instance variable codelength
-      bit_string = self.extract_code_length_info(bit_string)
-      # convert the compressed binary string to a list of integer values
-      encoded_text = self.binary_string_to_int_list(bit_string)
-      # decode the encoded text by using the LZW decompression algorithm
-      decompressed_text = self.decode(encoded_text)
+      if self.segmented:
+         # decompress the segments in order
+         index, _ = self.read_block_index(in_file)
+         offsets = [offset for offset, _ in index[first_block:]]
+         if workers is None:
+            workers = min(os.cpu_count(), len(offsets))
+         if workers <= 1:
+            for offset in offsets:
+               out_file.write(self.read_segment(in_file, offset))
+         else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(workers, initializer=init_block_worker, initargs=(self,)) as executor:
+               # every worker reads its segment from the archive itself
+               for start in range(0, len(offsets), 2 * workers):
+                  batch = offsets[start:start + 2 * workers]
+                  for data in executor.map(decompress_block_at, [input_path] * len(batch), batch):
+                     out_file.write(data)
+      elif self.coding_mode == 'speed':
+         # the aligned codes are read from a mapping of the file (a slice of
+         # a mapping is a copy, so no view of it outlives the decode)
+         import mmap
+         with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            out_file.write(self.decompress_data(mapped[in_file.tell():]))
+      else:
+         # decompress the contents of the input file
+         out_file.write(self.decompress_data(in_file.read()))
 
-      # write the decompression output to the output file
-      out_file = open(output_path, 'w')
-      out_file.write(decompressed_text)
+      in_file.close()
       out_file.close()
 
       # notify the user that the decompression process is finished
@@ -382,6 +943,8 @@ class LZWCoding:
       decompressed_image = self.decodeImage(encoded_image)
 
       # Write the decompressed image data to a new image file
+      from PIL import Image
+      import numpy as np
       img = Image.fromarray(np.array(decompressed_image, dtype=np.uint8).reshape(512, 768))
       img.save(output_path)
 
@@ -469,6 +1032,34 @@ class LZWCoding:
       # return the resulting output (the decompressed string/text)
       return result.getvalue()
    
+   # A method that decodes a list of encoded integer values into bytes by using
+   # the LZW decompression algorithm and returns the resulting output.
+   # ---------------------------------------------------------------------------
+   def decode_bytes(self, encoded_values):
+      # start with the 256 single bytes and the entries of the trained
+      # dictionary (if any)
+      dictionary = self.initial_sequences.copy()
+
+      result = bytearray()
+      if not encoded_values:
+         return bytes(result)
+      w = dictionary[encoded_values[0]]
+      result += w
+      for k in encoded_values[1:]:
+         if k < len(dictionary):
+            entry = dictionary[k]
+         elif k == len(dictionary):
+            entry = w + w[:1]   # a special case where the entry is formed
+         else:
+            raise ValueError('Bad compressed k: %s' % k)
+         result += entry
+         # w + the first byte of the entry is added to the dictionary
+         dictionary.append(w + entry[:1])
+         w = entry
+
+      # return the resulting output (the decompressed bytes)
+      return bytes(result)
+
    def decodeImage(self, encoded_values):
       # Build initial dictionary for grayscale images (0-255 values)
       dict_size = 256
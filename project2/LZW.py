@@ -1,14 +1,51 @@
 import os  # the os module is used for file and directory operations
 import math  # the math module provides access to mathematical functions
+import mmap  # compressed files are memory-mapped for decompression
+from contextlib import nullcontext  # stages are only measured on request
 from PIL import Image  # the Image class is used for image operations
 import numpy as np  # the numpy library is used for numerical
+from huffman_coding import huffman_encode_codes, huffman_decode_codes  # the max_ratio stage
+from pixel_scan import SCAN_ORDERS, scan_permutation  # the pixel scan orders
+from run_length import run_length_encode, run_length_decode, pack_runs, unpack_runs  # the run-length pre-pass
+from stored_blocks import STORED_CODELENGTH, is_incompressible, stored_block, is_stored, stored_values  # incompressible pixels
+
+# Compressed files that use optional features start with this magic and a
+# flags field, files without it start directly with the width and height
+HEADER_MAGIC = b'LZW\x01'
+FLAG_MAX_RATIO = 0x0001
+FLAG_RUN_LENGTH = 0x0002
+FLAG_SCAN_ORDER = 0x0004
+FLAG_STRIPS = 0x0008
+FLAG_SPEED = 0x0010
+FLAG_PROGRESSIVE = 0x0020
+
+# 'fast' stores every code with codelength bits, 'max_ratio' adds a canonical
+# Huffman stage over the code-width buckets of the LZW code stream and 'speed'
+# stores the codes as a little-endian uint16 (codelength up to 16) or uint32
+# array, so no bit packing or unpacking is needed
+CODING_MODES = ('fast', 'max_ratio', 'speed')
+
+# Progressive images are stored in passes of interlaced pixel grids, coarsest
+# first: every 2**PROGRESSIVE_LEVELS-th pixel of every 2**PROGRESSIVE_LEVELS-th
+# row, then per level the three grids that halve the spacing. The first pass
+# is a thumbnail of 1/8 of the width and height.
+PROGRESSIVE_LEVELS = 3
+
+# TIFF LZW (compression tag 5): Clear and EOI codes, the first free code and
+# the widest code (the table is reset before it would need 13 bits)
+TIFF_CLEAR_CODE = 256
+TIFF_EOI_CODE = 257
+TIFF_FIRST_CODE = 258
+TIFF_MAX_CODE = 4095
 
 # A class that implements the LZW compression and decompression algorithms as
 # well as the necessary utility methods for text files.
 # ------------------------------------------------------------------------------
 class LZWCoding:
     # Constructor with input parameters
-    def __init__(self, filename, data_type, filepath, outputpath):
+    def __init__(self, filename, data_type, filepath, outputpath, coding_mode='fast',
+                 run_length=False, scan_order='raster', memory_budget=None, memory_stats=None,
+                 progressive=False):
         # Use the input parameters to set the instance variables
         self.filename = filename
         self.data_type = data_type   # e.g., 'text' or 'image'
@@ -17,43 +54,86 @@ class LZWCoding:
         self.codelength = None
         self.filepath = filepath
         self.outputpath = outputpath
+        if coding_mode not in CODING_MODES:
+            raise ValueError(f"Unknown coding mode: {coding_mode}")
+        self.coding_mode = coding_mode
+        # Collapse long runs of equal pixels before the LZW stage
+        self.run_length = run_length
+        self.runs = b''
+        # Order in which the pixels are fed to the LZW stage
+        if scan_order not in SCAN_ORDERS:
+            raise ValueError(f"Unknown scan order: {scan_order}")
+        self.scan_order = scan_order
+        # Working memory limit in bytes (or a size such as '256M'); images
+        # that would need more are coded in independent strips of rows
+        self.memory_budget = None
+        if memory_budget is not None:
+            from memory_meter import parse_size
+            self.memory_budget = parse_size(memory_budget)
+        # Per-stage peak memory in the statistics: 'rss' or 'tracemalloc'
+        # (RSS is measured by default when a budget is set)
+        self.memory_stats = memory_stats or ('rss' if self.memory_budget else None)
+        if self.memory_stats is not None:
+            from memory_meter import MEMORY_STATS
+            if self.memory_stats not in MEMORY_STATS:
+                raise ValueError(f"Unknown memory statistics method: {memory_stats}")
+        self.memory_meter = None
+        self.strip_rows = None
+        # Store the image in passes, so readers can decode a preview from the
+        # first ones (the passes are coded on their own, not in strips)
+        if progressive and memory_budget is not None:
+            raise ValueError("Progressive mode cannot be combined with a memory budget")
+        self.progressive = progressive
+        self.progressive_levels = None
 
     # Method that compresses the contents of an image file to a binary output file
     def compress_image_file(self):
-        # Get paths
-        input_path = self.filepath
-        input_file = os.path.basename(input_path)
         output_path = self.outputpath
-        output_file = os.path.basename(output_path)
+        outputs, info = self.compress_image(Image.open(self.filepath))
 
-        # Read the contents of the input file
-        image = Image.open(input_path).convert('L')
-        width, height = image.size  # Get width and height
-        image_data = np.array(image, dtype=np.uint8).flatten().tolist()
+        # Write the header and the compressed data to the output file
+        with open(output_path, 'wb') as out_file:
+            out_file.write(outputs[''])
 
-        # Encode the image data by using the LZW compression algorithm
-        encoded_image_as_integers = self.encodeGrayScaledImage(image_data)
-        encoded_image = self.int_list_to_binary_string(encoded_image_as_integers)
-        encoded_image = self.add_code_length_info(encoded_image)
-        padded_encoded_image = self.pad_encoded_data(encoded_image)
-        byte_array = self.get_byte_array(padded_encoded_image)
+        return output_path, info
 
-        # Width and Height information in binary format (2 bytes width, 2 bytes height)
-        width_bytes = width.to_bytes(2, byteorder='big')  
-        height_bytes = height.to_bytes(2, byteorder='big')
+    # Method that compresses an opened image in memory and returns the bytes of
+    # every output file (by suffix, '' for the single file of this codec) and
+    # the statistics. The input path is only used for its name and size and
+    # may be None for images that do not come from a file.
+    def compress_image(self, image):
+        # Get paths
+        input_path = self.filepath
+        input_file = os.path.basename(input_path) if input_path else 'image'
+        output_path = self.outputpath
+        output_file = os.path.basename(output_path) if output_path else 'bytes'
 
-        # Write width and height to the compressed file
-        with open(output_path, 'wb') as out_file:
-            out_file.write(width_bytes + height_bytes + bytes(byte_array))
+        image = image.convert('L')
+        width, height = image.size  # Get width and height
+        self.new_memory_meter()
+        self.code_bits = 0
+        self.collapsed_pixels = 0
+        self.stored_blocks = 0
+        from memory_meter import budget_strip_rows
+        self.strip_rows = budget_strip_rows(self.memory_budget, width, height)
+        if self.progressive:
+            data = self.encode_passes(np.array(image, dtype=np.uint8), PROGRESSIVE_LEVELS)
+        elif self.strip_rows < height:
+            # Over the memory budget: every strip is coded on its own
+            data = self.encode_strips(np.array(image, dtype=np.uint8), self.strip_rows)
+        else:
+            data = self.encode_pixels(np.array(image, dtype=np.uint8))
+        bits_per_pixel = self.code_bits / max(width * height, 1)
 
         # Calculate entropy
-        entropy_value = self.calculate_entropy(input_path)
+        with self.memory_stage('stats'):
+            entropy_value = self.calculate_entropy(image)
 
-        # Get original file size (in bytes)
-        original_file_size = os.path.getsize(input_path)
+        # Get original file size (in bytes), the raw pixels for in-memory images
+        original_file_size = os.path.getsize(input_path) if input_path else width * height
 
         # Compression statistics
-        compressed_size = len(byte_array) + 4  # 4 bytes = width + height
+        compressed_size = len(data)
         compression_ratio = original_file_size / compressed_size
 
         info = [
@@ -62,21 +142,296 @@ class LZWCoding:
             f"Original File Size: {original_file_size:,} bytes",
             f"Entropy of the image: {entropy_value:.4f}",
             f"Code Length: {self.codelength} bits",
+            f"Coding Mode: {self.coding_mode} ({bits_per_pixel:.4f} bits per pixel)",
             f"Compressed File Size: {compressed_size:,} bytes",
             f"Compression Ratio: {compression_ratio:.2f}"
         ]
+        if self.run_length:
+            info.append(f"Run-Length Pre-Pass: {self.collapsed_pixels:,} pixels collapsed")
+        if self.scan_order != 'raster':
+            info.append(f"Scan Order: {self.scan_order}")
+        if self.progressive:
+            step = 2 ** PROGRESSIVE_LEVELS
+            info.append(f"Progressive: {PROGRESSIVE_LEVELS + 1} passes, "
+                        f"first pass {-(-width // step)}x{-(-height // step)}")
+        if self.stored_blocks:
+            if self.progressive:
+                blocks = self.progressive_parts
+            else:
+                blocks = -(-height // self.strip_rows) if self.strip_rows < height else 1
+            info.append(f"Stored Raw: {self.stored_blocks} of {blocks} blocks (incompressible)")
+        info += self.memory_info(width, height)
+
+        return {'': data}, info
+
+    # Method that encodes a (height, width) pixel array and returns the header
+    # and the compressed data. The code length becomes the largest one used
+    # and the number of code bits and collapsed pixels are accumulated, so the
+    # strips of an image can be encoded one after the other.
+    def encode_pixels(self, pixels):
+        height, width = pixels.shape
+        with self.memory_stage('prepare'):
+            image_data = pixels.ravel()[scan_permutation(self.scan_order, width, height)]
+            pixel_count = image_data.size
+            if self.run_length:
+                # Long runs are stored in the header instead of the LZW stream
+                image_data, positions, lengths = run_length_encode(image_data)
+                self.runs = pack_runs(positions, lengths)
+        self.collapsed_pixels += pixel_count - image_data.size
 
+        if self.is_incompressible(image_data):
+            # Noise-like pixels skip the LZW stage
+            byte_array, code_bits = self.stored_block(image_data)
+        else:
+            byte_array, code_bits = self.lzw_block(image_data)
+            # A block that grew in the LZW stage is stored as well
+            if len(byte_array) > image_data.size + 2:
+                byte_array, code_bits = self.stored_block(image_data)
+        self.code_bits += code_bits
+
+        # Header with the width and height information (and the feature flags)
+        header = self.add_header_info(width, height)
+        return header + bytes(byte_array)
+
+    # Method that encodes the pixel values with the LZW compression algorithm
+    # and returns the compressed data and the number of code bits
+    def lzw_block(self, image_data):
+        with self.memory_stage('lzw'):
+            encoded_image_as_integers = self.encodeGrayScaledImage(image_data.tolist())
+        with self.memory_stage('pack'):
+            if self.coding_mode == 'speed':
+                # The aligned codes are written without any bit string
+                codes = np.array(encoded_image_as_integers, dtype=self.aligned_code_type())
+                return bytes([0, self.codelength]) + codes.tobytes(), 8 * codes.nbytes
+            encoded_image = self.pack_codes(encoded_image_as_integers)
+            del encoded_image_as_integers
+            code_bits = len(encoded_image)
+            encoded_image = self.add_code_length_info(encoded_image)
+            padded_encoded_image = self.pad_encoded_data(encoded_image)
+            return self.get_byte_array(padded_encoded_image), code_bits
+
+    # Method that returns the array type of the codes in the speed mode
+    def aligned_code_type(self):
+        return '<u2' if self.codelength <= 16 else '<u4'
+
+    # Method that returns the stored form of the pixel values (no padding,
+    # the code length STORED_CODELENGTH and the raw values) and its bits
+    def stored_block(self, image_data):
+        self.codelength = STORED_CODELENGTH
+        self.stored_blocks += 1
+        return stored_block(image_data), 8 * image_data.size
+
+    # Method that returns whether the LZW stage would grow the pixel values:
+    # large images with a high entropy get a trial encode of a slice from
+    # their middle, the others are encoded and stored if they grew
+    def is_incompressible(self, image_data):
+        return is_incompressible(image_data, self.trial_bits)
+
+    # Method that returns the size in bits of the LZW codes of the values
+    def trial_bits(self, values):
+        codes = self.encodeGrayScaledImage(values.tolist())
+        return len(codes) * int(self.codelength)
+
+    # Method that encodes the image in strips of rows: a header with the image
+    # size and the strip height, then every strip (a complete compressed image
+    # of its own) with a 4-byte length
+    def encode_strips(self, pixels, rows):
+        height, width = pixels.shape
+        codelength = 0
+        parts = [HEADER_MAGIC, FLAG_STRIPS.to_bytes(2, byteorder='big'),
+                 width.to_bytes(2, byteorder='big'), height.to_bytes(2, byteorder='big'),
+                 rows.to_bytes(2, byteorder='big')]
+        for top in range(0, height, rows):
+            strip = self.encode_pixels(pixels[top:top + rows])
+            codelength = max(codelength, self.codelength)
+            parts += [len(strip).to_bytes(4, byteorder='big'), strip]
+        self.codelength = codelength
+        return b''.join(parts)
+
+    # Method that returns the pixel grids of every pass of a progressive image
+    # as (first row, first column, spacing) triplets, coarsest pass first
+    def pass_grids(self, levels):
+        passes = [[(0, 0, 2 ** levels)]]
+        for level in range(levels - 1, -1, -1):
+            step = 2 ** level
+            passes.append([(0, step, 2 * step), (step, 0, 2 * step), (step, step, 2 * step)])
+        return passes
+
+    # Method that encodes the image in passes: a header with the image size
+    # and the number of levels, then every grid of every pass (a complete
+    # compressed image of its own, nothing for an empty grid) with a 4-byte
+    # length
+    def encode_passes(self, pixels, levels):
+        height, width = pixels.shape
+        codelength = 0
+        self.progressive_parts = 0
+        parts = [HEADER_MAGIC, FLAG_PROGRESSIVE.to_bytes(2, byteorder='big'),
+                 width.to_bytes(2, byteorder='big'), height.to_bytes(2, byteorder='big'),
+                 bytes([levels])]
+        for grids in self.pass_grids(levels):
+            for row, col, spacing in grids:
+                grid = pixels[row::spacing, col::spacing]
+                part = b''
+                if grid.size:
+                    part = self.encode_pixels(grid)
+                    codelength = max(codelength, self.codelength)
+                    self.progressive_parts += 1
+                parts += [len(part).to_bytes(4, byteorder='big'), part]
+        self.codelength = codelength
+        return b''.join(parts)
+
+    # Method that starts the memory accounting of a compression or
+    # decompression (when the memory statistics are enabled)
+    def new_memory_meter(self):
+        self.memory_meter = None
+        if self.memory_stats is not None:
+            from memory_meter import MemoryMeter
+            self.memory_meter = MemoryMeter(self.memory_stats)
+
+    # Context manager that measures the peak memory of a stage
+    def memory_stage(self, name):
+        if self.memory_meter is None:
+            return nullcontext()
+        return self.memory_meter.stage(name)
+
+    # Method that returns the statistics lines about the memory use
+    def memory_info(self, width, height):
+        info = []
+        if self.memory_budget is not None:
+            from memory_meter import budget_info
+            info.append(budget_info(self.memory_budget, self.strip_rows, width, height))
+        if self.memory_meter is not None:
+            info += self.memory_meter.info()
+        return info
+
+    # Method that writes the image as a grayscale TIFF file with standard LZW
+    # compression, which libtiff/Pillow decode natively. With predictor set the
+    # rows are stored as horizontal differences (TIFF predictor 2, like the
+    # difference image of project3 but modulo 256 and without the vertical
+    # first column).
+    def compress_tiff_file(self, predictor=False):
+        input_path = self.filepath
+        output_path = self.outputpath
+
+        image = Image.open(input_path).convert('L')
+        width, height = image.size
+        pixels = np.array(image, dtype=np.uint8)
+        if predictor:
+            pixels = pixels.copy()
+            pixels[:, 1:] = np.diff(pixels, axis=1)  # wraps modulo 256 in uint8
+
+        # A single strip that holds all rows
+        strip = self.tiff_lzw_encode(pixels.tobytes())
+        with open(output_path, 'wb') as out_file:
+            out_file.write(self.tiff_file_layout(width, height, strip, predictor))
+
+        original_file_size = os.path.getsize(input_path)
+        compressed_size = os.path.getsize(output_path)
+        info = [
+            f"{os.path.basename(input_path)} is compressed into {os.path.basename(output_path)}.",
+            f"Original Image Size: {width}x{height} ({width * height:,} pixels)",
+            f"Original File Size: {original_file_size:,} bytes",
+            f"Compressed File Size: {compressed_size:,} bytes",
+            f"Compression Ratio: {original_file_size / compressed_size:.2f}",
+            f"Format: TIFF LZW{' with horizontal predictor' if predictor else ''}"
+        ]
         return output_path, info
 
+    # Method that codes bytes as a TIFF LZW strip: codes are packed MSB first,
+    # start with 9 bits and grow one code early ("early change", as libtiff
+    # does), the strip starts with a Clear code, the table is cleared when it
+    # is full and the strip ends with EOI
+    def tiff_lzw_encode(self, data):
+        output = bytearray()
+        buffer = 0
+        buffered_bits = 0
+        width = 9
+
+        def put(code):
+            nonlocal buffer, buffered_bits
+            buffer = (buffer << width) | code
+            buffered_bits += width
+            while buffered_bits >= 8:
+                buffered_bits -= 8
+                output.append((buffer >> buffered_bits) & 0xFF)
+            buffer &= (1 << buffered_bits) - 1
+
+        put(TIFF_CLEAR_CODE)
+        table = {}
+        next_code = TIFF_FIRST_CODE
+        w = None
+        for k in memoryview(data):
+            if w is None:
+                w = k
+                continue
+            key = (w << 8) | k
+            code = table.get(key)
+            if code is not None:
+                w = code
+                continue
+            put(w)
+            table[key] = next_code
+            next_code += 1
+            if next_code > TIFF_MAX_CODE - 1:
+                # Table full: start over with 9-bit codes
+                put(TIFF_CLEAR_CODE)
+                table = {}
+                next_code = TIFF_FIRST_CODE
+                width = 9
+            elif next_code > (1 << width) - 1:
+                width += 1
+            w = k
+
+        if w is not None:
+            put(w)
+            # The decoder adds one more entry before it reads EOI
+            next_code += 1
+            if next_code == TIFF_MAX_CODE - 1:
+                put(TIFF_CLEAR_CODE)
+                width = 9
+            elif next_code > (1 << width) - 1:
+                width += 1
+        put(TIFF_EOI_CODE)
+        if buffered_bits:
+            output.append((buffer << (8 - buffered_bits)) & 0xFF)
+        return bytes(output)
+
+    # Method that builds a little-endian TIFF file with one 8-bit grayscale
+    # strip: the header, the strip data and the image file directory
+    def tiff_file_layout(self, width, height, strip, predictor):
+        strip_offset = 8
+        ifd_offset = strip_offset + len(strip) + len(strip) % 2  # word aligned
+        # (tag, type, value) with type 3 = SHORT and 4 = LONG, sorted by tag
+        entries = [
+            (256, 4, width),             # ImageWidth
+            (257, 4, height),            # ImageLength
+            (258, 3, 8),                 # BitsPerSample
+            (259, 3, 5),                 # Compression: LZW
+            (262, 3, 1),                 # PhotometricInterpretation: BlackIsZero
+            (273, 4, strip_offset),      # StripOffsets
+            (277, 3, 1),                 # SamplesPerPixel
+            (278, 4, height),            # RowsPerStrip
+            (279, 4, len(strip)),        # StripByteCounts
+            (317, 3, 2 if predictor else 1),  # Predictor
+        ]
+        ifd = len(entries).to_bytes(2, 'little')
+        for tag, field_type, value in entries:
+            ifd += tag.to_bytes(2, 'little') + field_type.to_bytes(2, 'little') + (1).to_bytes(4, 'little')
+            ifd += value.to_bytes(2 if field_type == 3 else 4, 'little').ljust(4, b'\0')
+        ifd += (0).to_bytes(4, 'little')  # No further IFD
+
+        header = b'II' + (42).to_bytes(2, 'little') + ifd_offset.to_bytes(4, 'little')
+        return header + strip + b'\0' * (len(strip) % 2) + ifd
+
     def calculate_entropy(self, image_path):
-        # Load the grayscale image
-        img = Image.open(image_path).convert("L")  # Convert to grayscale if not already
-        
-        # Convert image to a NumPy array
-        img_array = np.array(img)
+        # Load the grayscale image (an already opened image can be passed too)
+        img = image_path if isinstance(image_path, Image.Image) else Image.open(image_path)
+        img = img.convert("L")  # Convert to grayscale if not already
         
-        # Compute histogram (256 bins for grayscale images)
-        hist, _ = np.histogram(img_array, bins=256, range=(0, 256), density=True)
+        # Compute histogram (256 bins for grayscale images); Pillow counts
+        # the pixels without a widened copy of the image
+        hist = np.array(img.histogram(), dtype=np.float64)
+        hist /= max(hist.sum(), 1)
         
         # Remove zero probabilities to avoid log(0) errors
         hist = hist[hist > 0]
@@ -120,6 +475,82 @@ class LZWCoding:
         self.codelength = np.ceil(np.log2(len(dictionary))).astype(int)
         return result
 
+    # Method that converts the codes to a binary string with the bit packer
+    # of the selected coding mode
+    def pack_codes(self, int_list):
+        if self.coding_mode == 'max_ratio':
+            return huffman_encode_codes(int_list, self.codelength)
+        return self.int_list_to_binary_string(int_list)
+
+    # Method that converts a binary string created by pack_codes back to codes
+    def unpack_codes(self, bitstring):
+        if self.coding_mode == 'max_ratio':
+            return huffman_decode_codes(bitstring, self.codelength)
+        return self.binary_string_to_int_list(bitstring)
+
+    # Method that builds the file header: the width and height as before when
+    # no optional feature is used, otherwise the magic, the flags and the size
+    def add_header_info(self, width, height):
+        flags = 0
+        fields = b''
+        if self.coding_mode == 'max_ratio':
+            flags |= FLAG_MAX_RATIO
+        if self.coding_mode == 'speed':
+            flags |= FLAG_SPEED
+        if self.run_length:
+            flags |= FLAG_RUN_LENGTH
+            fields += self.runs
+        if self.scan_order != 'raster':
+            flags |= FLAG_SCAN_ORDER
+            fields += bytes([SCAN_ORDERS[self.scan_order]])
+
+        size = width.to_bytes(2, byteorder='big') + height.to_bytes(2, byteorder='big')
+        if not flags:
+            return size
+        return HEADER_MAGIC + flags.to_bytes(2, byteorder='big') + size + fields
+
+    # Method that parses the file header, sets the recorded features and
+    # returns the width, the height and the remaining (compressed) bytes
+    def extract_header_info(self, bytes_data):
+        flags = 0
+        if bytes_data[:len(HEADER_MAGIC)] == HEADER_MAGIC:
+            bytes_data = bytes_data[len(HEADER_MAGIC):]
+            flags = int.from_bytes(bytes_data[:2], byteorder='big')
+            bytes_data = bytes_data[2:]
+
+        width = int.from_bytes(bytes_data[:2], byteorder='big')
+        height = int.from_bytes(bytes_data[2:4], byteorder='big')
+        bytes_data = bytes_data[4:]
+        self.coding_mode = 'fast'
+        if flags & FLAG_MAX_RATIO:
+            self.coding_mode = 'max_ratio'
+        elif flags & FLAG_SPEED:
+            self.coding_mode = 'speed'
+
+        # Images coded in strips only have the strip height here, every strip
+        # has a header of its own
+        self.strip_rows = None
+        if flags & FLAG_STRIPS:
+            self.strip_rows = int.from_bytes(bytes_data[:2], byteorder='big')
+            bytes_data = bytes_data[2:]
+        # The same for the passes of progressive images
+        self.progressive_levels = None
+        if flags & FLAG_PROGRESSIVE:
+            self.progressive_levels = bytes_data[0]
+            bytes_data = bytes_data[1:]
+
+        self.run_length = bool(flags & FLAG_RUN_LENGTH)
+        self.run_positions = self.run_lengths = None
+        if self.run_length:
+            self.run_positions, self.run_lengths, bytes_data = unpack_runs(bytes_data)
+
+        self.scan_order = 'raster'
+        if flags & FLAG_SCAN_ORDER:
+            scan_ids = {value: name for name, value in SCAN_ORDERS.items()}
+            self.scan_order = scan_ids[bytes_data[0]]
+            bytes_data = bytes_data[1:]
+        return width, height, bytes_data
+
     # Method to convert integer list to binary string
     def int_list_to_binary_string(self, int_list):
         # Initialize the binary string as an empty string
@@ -215,25 +646,20 @@ class LZWCoding:
         output_file = os.path.basename(output_path)
 
         with open(input_path, 'rb') as in_file:
-            bytes_data = in_file.read()
-
-        # First 4 bytes contain width and height info
-        width = int.from_bytes(bytes_data[:2], byteorder='big')
-        height = int.from_bytes(bytes_data[2:4], byteorder='big')
-
-        # Compressed data (after width and height)
-        bytes_data = bytes_data[4:]
-
-        # Convert to binary string
-        bit_string = ''.join(bin(byte)[2:].rjust(8, '0') for byte in bytes_data)
-
-        bit_string = self.remove_padding(bit_string)
-        bit_string = self.extract_code_length_info(bit_string)
-        encoded_image = self.binary_string_to_int_list(bit_string)
-        decompressed_image = self.decodeImage(encoded_image)
-
+            header = in_file.read(len(HEADER_MAGIC) + 2)
+            in_file.seek(0)
+            flags = int.from_bytes(header[len(HEADER_MAGIC):], byteorder='big')
+            if header[:len(HEADER_MAGIC)] == HEADER_MAGIC and flags & FLAG_SPEED:
+                # The aligned codes of the speed mode are read from a mapping
+                # of the file. Slices of a mapping are copies, so the decoder
+                # keeps no view of it and it is closed however the decode ends.
+                with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    pixels = self.decompress_image(mapped)
+            else:
+                pixels = self.decompress_image(in_file.read())
         # Recreate the image with correct dimensions
-        img = Image.fromarray(np.array(decompressed_image, dtype=np.uint8).reshape(height, width))
+        img = Image.fromarray(pixels)
+        width, height = img.size
         img.save(output_path)
 
         # Get decompressed file size
@@ -243,8 +669,130 @@ class LZWCoding:
         print(f"{input_file} is decompressed into {output_file}.")
         print(f"Restored Image Dimensions: {width}x{height}")
         print(f"Decompressed File Size: {decompressed_file_size:,} bytes")
+        if self.memory_meter is not None:
+            for line in self.memory_meter.info():
+                print(line)
 
         return output_path
+
+    # Method that decompresses the contents of a compressed file in memory and
+    # returns the pixels as a (height, width) array
+    def decompress_image(self, bytes_data):
+        self.new_memory_meter()
+        if len(bytes_data) < 4:
+            raise ValueError(f"Compressed image of {len(bytes_data)} bytes has no header")
+        # The header contains the width and height info (and the feature flags)
+        width, height, bytes_data = self.extract_header_info(bytes_data)
+        if self.strip_rows:
+            return self.decode_strips(width, height, self.strip_rows, bytes_data)
+        if self.progressive_levels is not None:
+            levels = self.progressive_levels
+            return self.decode_passes(width, height, levels, levels + 1, bytes_data)
+        return self.decode_pixels(width, height, bytes_data)
+
+    # Method that decodes a preview of the contents of a compressed file: for
+    # a progressive image only the first passes, until the longer side of the
+    # preview reaches size pixels (size 0 decodes only the first pass, the
+    # result is 1/8 of the width and height), other images are decoded whole
+    def decode_preview(self, bytes_data, size=0):
+        self.new_memory_meter()
+        width, height, pass_data = self.extract_header_info(bytes_data)
+        if self.progressive_levels is None:
+            return self.decompress_image(bytes_data)
+        levels = self.progressive_levels
+        passes = 1
+        while passes <= levels and -(-max(width, height) // 2 ** (levels + 1 - passes)) < size:
+            passes += 1
+        return self.decode_passes(width, height, levels, passes, pass_data)
+
+    # Method that decodes the compressed data that follows a header
+    def decode_pixels(self, width, height, bytes_data):
+        if len(bytes_data) < 2:
+            raise ValueError(f"Compressed data of a {width}x{height} image is truncated")
+        if is_stored(bytes_data):
+            # Stored pixels follow the padding and code length info
+            self.codelength = STORED_CODELENGTH
+            decompressed_image = stored_values(bytes_data)
+        else:
+            decompressed_image = self.lzw_decode_block(bytes_data)
+        with self.memory_stage('restore'):
+            if self.run_length:
+                # Expand the runs collapsed before compression
+                decompressed_image = run_length_decode(decompressed_image, self.run_positions,
+                                                            self.run_lengths)
+            if decompressed_image.size != width * height:
+                raise ValueError(f"Compressed data holds {decompressed_image.size:,} pixels, "
+                                 f"the image is {width}x{height}")
+            # Put the pixels back in raster order
+            raster_image = np.empty_like(decompressed_image)
+            raster_image[scan_permutation(self.scan_order, width, height)] = decompressed_image
+        return raster_image.reshape(height, width)
+
+    # Method that decodes the LZW compressed pixel values of a block
+    def lzw_decode_block(self, bytes_data):
+        if self.coding_mode == 'speed':
+            # The aligned codes are read where they are and only converted
+            # for the dictionary lookups
+            self.codelength = bytes_data[1]
+            code_type = np.dtype(self.aligned_code_type())
+            if (len(bytes_data) - 2) % code_type.itemsize:
+                raise ValueError(f"Compressed data of {len(bytes_data) - 2:,} bytes is not made of "
+                                 f"{code_type.itemsize}-byte codes (truncated)")
+            codes = np.frombuffer(bytes_data, dtype=code_type, offset=2)
+            with self.memory_stage('lzw'):
+                return np.array(self.decodeImage(codes.tolist()), dtype=np.uint8)
+        with self.memory_stage('unpack'):
+            # Convert to binary string
+            bit_string = ''.join(bin(byte)[2:].rjust(8, '0') for byte in bytes_data)
+
+            bit_string = self.remove_padding(bit_string)
+            bit_string = self.extract_code_length_info(bit_string)
+            encoded_image = self.unpack_codes(bit_string)
+            del bit_string
+        with self.memory_stage('lzw'):
+            return np.array(self.decodeImage(encoded_image), dtype=np.uint8)
+
+    # Method that decodes an image coded in strips into a preallocated array,
+    # so only one strip is being decoded at a time
+    def decode_strips(self, width, height, rows, bytes_data):
+        image = np.empty((height, width), dtype=np.uint8)
+        data = memoryview(bytes_data)
+        offset = 0
+        for top in range(0, height, rows):
+            length = int.from_bytes(data[offset:offset + 4], byteorder='big')
+            strip = bytes(data[offset + 4:offset + 4 + length])
+            offset += 4 + length
+            strip_width, strip_height, strip = self.extract_header_info(strip)
+            if (strip_width, strip_height) != (width, min(rows, height - top)):
+                raise ValueError(f"Strip at row {top} is {strip_width}x{strip_height}")
+            image[top:top + strip_height] = self.decode_pixels(strip_width, strip_height, strip)
+        self.strip_rows = rows
+        return image
+
+    # Method that decodes the first passes of a progressive image into an
+    # array of the resolution they complete (every step-th pixel of every
+    # step-th row)
+    def decode_passes(self, width, height, levels, passes, bytes_data):
+        step = 2 ** (levels + 1 - passes)
+        image = np.empty((-(-height // step), -(-width // step)), dtype=np.uint8)
+        data = memoryview(bytes_data)
+        offset = 0
+        for grids in self.pass_grids(levels)[:passes]:
+            for row, col, spacing in grids:
+                length = int.from_bytes(data[offset:offset + 4], byteorder='big')
+                part = bytes(data[offset + 4:offset + 4 + length])
+                offset += 4 + length
+                target = image[row // step::spacing // step, col // step::spacing // step]
+                if not length:
+                    if target.size:
+                        raise ValueError(f"Pass grid at ({row}, {col}) is missing")
+                    continue
+                part_width, part_height, part = self.extract_header_info(part)
+                if (part_height, part_width) != target.shape:
+                    raise ValueError(f"Pass grid at ({row}, {col}) is {part_width}x{part_height}")
+                target[:] = self.decode_pixels(part_width, part_height, part)
+        self.progressive_levels = levels
+        return image
    
     # Method that decodes a list of encoded integer values using LZW decompression
     def decodeImage(self, encoded_values):
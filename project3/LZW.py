@@ -1,56 +1,113 @@
 import os  # File operations
 import math  # Math functions
+import time  # Encode time per frame of a sequence
+from contextlib import nullcontext  # Stages are only measured on request
 from PIL import Image  # Image processing
 import numpy as np  # Numerical operations
+from pixel_scan import SCAN_ORDERS, scan_permutation  # Pixel scan orders
+from run_length import run_length_encode, run_length_decode, pack_runs, unpack_runs  # Run-length pre-pass
+from near_lossless import quantize_residuals, quantize_difference_image, dequantize_difference_image, psnr  # Near-lossless mode
+from stored_blocks import STORED_CODELENGTH, is_incompressible, stored_block, is_stored, stored_values  # Incompressible differences
+
+# Compressed files that use optional features start with this magic and a
+# flags field, files without it start directly with the width and height
+HEADER_MAGIC = b'LZW\x01'
+FLAG_RUN_LENGTH = 0x0001
+FLAG_SCAN_ORDER = 0x0002
+FLAG_NEAR_LOSSLESS = 0x0004
+FLAG_STRIPS = 0x0008
+FLAG_TEMPORAL = 0x0010
+
+# Image sequences (video frames, bursts) are stored in one container: this
+# magic, the frame size, the number of frames, the keyframe interval, a frame
+# index (offset, length and type of every frame) and the frames. Key frames
+# are coded on their own, delta frames against the previous reconstructed
+# frame and repeat frames (no data) are a copy of it.
+SEQUENCE_MAGIC = b'LZWS'
+FRAME_TYPES = {'key': 0, 'delta': 1, 'repeat': 2}
+KEYFRAME_INTERVAL = 30
 
 
 class LZWCoding:
-    def __init__(self, filename, data_type, filepath, outputpath):
+    def __init__(self, filename, data_type, filepath, outputpath, run_length=False,
+                 scan_order='raster', near_lossless=0, memory_budget=None, memory_stats=None):
         self.filename = filename
         self.data_type = data_type
         self.codelength = None
         self.filepath = filepath
         self.outputpath = outputpath
+        # Collapse long runs of equal differences before the LZW stage
+        self.run_length = run_length
+        self.runs = b''
+        # Order in which the differences are fed to the LZW stage
+        if scan_order not in SCAN_ORDERS:
+            raise ValueError(f"Unknown scan order: {scan_order}")
+        self.scan_order = scan_order
+        # Maximum absolute pixel error, 0 for lossless compression
+        if not 0 <= near_lossless <= 255:
+            raise ValueError(f"Near-lossless error bound must be 0..255: {near_lossless}")
+        self.near_lossless = near_lossless
+        # Working memory limit in bytes (or a size such as '256M'); images
+        # that would need more are coded in independent strips of rows
+        self.memory_budget = None
+        if memory_budget is not None:
+            from memory_meter import parse_size
+            self.memory_budget = parse_size(memory_budget)
+        # Per-stage peak memory in the statistics: 'rss' or 'tracemalloc'
+        # (RSS is measured by default when a budget is set)
+        self.memory_stats = memory_stats or ('rss' if self.memory_budget else None)
+        if self.memory_stats is not None:
+            from memory_meter import MEMORY_STATS
+            if self.memory_stats not in MEMORY_STATS:
+                raise ValueError(f"Unknown memory statistics method: {memory_stats}")
+        self.memory_meter = None
+        self.strip_rows = None
 
     def compress_image_file(self):
-        # Get paths
-        input_path = self.filepath
-        input_file = os.path.basename(input_path)
         output_path = self.outputpath
-        output_file = os.path.basename(output_path)
-
-        # Read image and compute difference image
-        image = Image.open(input_path).convert('L')
-        width, height = image.size
-        difference_image = self.compute_difference_image(image)
-
-        # Flatten difference image into 1D array
-        diff_data = difference_image.flatten().tolist()
+        outputs, info = self.compress_image(Image.open(self.filepath))
 
-        # Shift values to 0-510 range (since original is -255 to 255)
-        diff_data = [x + 255 for x in diff_data]
+        with open(output_path, 'wb') as out_file:
+            out_file.write(outputs[''])
 
-        # Apply LZW compression
-        encoded_data = self.encodeGrayScaledImage(diff_data)
-        encoded_string = self.int_list_to_binary_string(encoded_data)
-        encoded_string = self.add_code_length_info(encoded_string)
-        padded_encoded_string = self.pad_encoded_data(encoded_string)
-        byte_array = self.get_byte_array(padded_encoded_string)
+        return output_path, info
 
-        # Save width, height, and compressed data
-        width_bytes = width.to_bytes(2, byteorder='big')
-        height_bytes = height.to_bytes(2, byteorder='big')
+    # Compresses an opened image in memory. Returns the bytes of every output
+    # file (by suffix, '' for the single file of this codec) and the statistics.
+    # The input path may be None for images that do not come from a file.
+    def compress_image(self, image):
+        # Get paths
+        input_path = self.filepath
+        input_file = os.path.basename(input_path) if input_path else 'image'
+        output_path = self.outputpath
+        output_file = os.path.basename(output_path) if output_path else 'bytes'
 
-        with open(output_path, 'wb') as out_file:
-            out_file.write(width_bytes + height_bytes + bytes(byte_array))
+        image = image.convert('L')
+        width, height = image.size
+        pixels = np.array(image)
+        self.new_memory_meter()
+        self.collapsed_pixels = 0
+        self.difference_counts = np.zeros(511, dtype=np.int64)
+        self.max_error = 0
+        self.squared_error = 0.0
+        self.stored_blocks = 0
+        from memory_meter import budget_strip_rows
+        self.strip_rows = budget_strip_rows(self.memory_budget, width, height)
+        if self.strip_rows < height:
+            # Over the memory budget: every strip is coded on its own
+            data = self.encode_strips(pixels, self.strip_rows)
+        else:
+            data = self.encode_pixels(pixels)
+        del pixels
 
         # Calculate entropy
-        entropy_value = self.calculate_entropy(input_path)
-        original_size = os.path.getsize(input_path)
-        compressed_size = len(byte_array) + 4  # 4 bytes for width, height
+        with self.memory_stage('stats'):
+            entropy_value = self.calculate_entropy(image)
+        original_size = os.path.getsize(input_path) if input_path else width * height
+        compressed_size = len(data)
 
         #Calculate entropy of difference image
-        hist, _ = np.histogram(difference_image.flatten(), bins=511, range=(-255, 256), density=True)
+        hist = self.difference_counts / max(self.difference_counts.sum(), 1)
         hist = hist[hist > 0]  # Filter out zero probabilities
         entropy_value_difference_img = -np.sum(hist * np.log2(hist))
         
@@ -72,9 +129,254 @@ class LZWCoding:
             f"Compression Ratio: {original_size / compressed_size:.2f}",
             f"Entropy of Difference Image: {entropy_value_difference_img:.4f}"
         ]
+        if self.run_length:
+            info.append(f"Run-Length Pre-Pass: {self.collapsed_pixels:,} pixels collapsed")
+        if self.scan_order != 'raster':
+            info.append(f"Scan Order: {self.scan_order}")
+        if self.near_lossless:
+            info.append(f"Near-Lossless: max error {self.max_error} (bound {self.near_lossless}), "
+                        f"PSNR {psnr(self.squared_error, width * height):.2f} dB")
+        if self.stored_blocks:
+            blocks = -(-height // self.strip_rows) if self.strip_rows < height else 1
+            info.append(f"Stored Raw: {self.stored_blocks} of {blocks} blocks (incompressible)")
+        info += self.memory_info(width, height)
+
+        return {'': data}, info
+
+    # Encodes a (height, width) pixel array and returns the header and the
+    # compressed data. The code length becomes the largest one used and the
+    # statistics (collapsed pixels, difference histogram, near-lossless
+    # error) are accumulated, so the strips of an image can be encoded one
+    # after the other. A frame of a sequence is predicted from the reference
+    # (the previous reconstructed frame) when one is given.
+    def encode_pixels(self, pixels, reference=None):
+        height, width = pixels.shape
+        with self.memory_stage('prepare'):
+            # Compute difference image
+            if reference is not None:
+                difference_image, reconstruction = self.temporal_residual(pixels, reference)
+            elif self.near_lossless:
+                difference_image, reconstruction = quantize_difference_image(pixels, self.near_lossless)
+            else:
+                difference_image, reconstruction = self.compute_difference_image(pixels), pixels
+            if self.near_lossless:
+                error = pixels.astype(np.int16) - reconstruction
+                max_error = int(np.max(np.abs(error), initial=0))
+                if max_error > self.near_lossless:
+                    raise RuntimeError(f"Near-lossless error bound exceeded: {max_error} > {self.near_lossless}")
+                self.max_error = max(self.max_error, max_error)
+                self.squared_error += float(np.sum(error.astype(np.float64) ** 2))
+                del error
+            # The pixels as the decoder will see them, the next frame of a
+            # sequence is predicted from them
+            self.reconstruction = reconstruction
+            del reconstruction
+            self.difference_counts += np.bincount((difference_image + 255).ravel(), minlength=511)
+
+            # Flatten difference image into 1D array
+            diff_data = difference_image.ravel()[scan_permutation(self.scan_order, width, height)]
+            del difference_image
+            # The residuals of the still parts of a delta frame are long runs
+            # of zeros, so delta frames always collapse runs
+            if self.run_length or reference is not None:
+                # Long runs (flat regions) are stored in the header instead
+                diff_data, positions, lengths = run_length_encode(diff_data)
+                self.runs = pack_runs(positions, lengths)
+        self.collapsed_pixels += width * height - diff_data.size
+
+        if is_incompressible(diff_data, self.trial_bits):
+            # Noise-like differences skip the LZW stage
+            byte_array = self.stored_block(diff_data)
+        else:
+            byte_array = self.lzw_block(diff_data)
+            # A block that grew in the LZW stage is stored as well
+            if len(byte_array) > diff_data.size + 2:
+                byte_array = self.stored_block(diff_data)
+
+        # The header (width, height and features) goes before the compressed data
+        header = self.add_header_info(width, height, temporal=reference is not None)
+        return header + bytes(byte_array)
+
+    # Applies the LZW compression to the differences and returns the
+    # compressed data
+    def lzw_block(self, diff_data):
+        with self.memory_stage('lzw'):
+            # Shift values to 0-510 range (since original is -255 to 255)
+            encoded_data = self.encodeGrayScaledImage((diff_data + 255).tolist())
+        with self.memory_stage('pack'):
+            encoded_string = self.int_list_to_binary_string(encoded_data)
+            del encoded_data
+            encoded_string = self.add_code_length_info(encoded_string)
+            padded_encoded_string = self.pad_encoded_data(encoded_string)
+            return self.get_byte_array(padded_encoded_string)
+
+    # Returns the stored form of the differences (modulo 256, the decoder
+    # adds them up modulo 256 as well)
+    def stored_block(self, diff_data):
+        self.codelength = STORED_CODELENGTH
+        self.stored_blocks += 1
+        return stored_block(diff_data)
+
+    # Returns the size in bits of the LZW codes of a slice of differences
+    def trial_bits(self, diff_data):
+        return len(self.encodeGrayScaledImage((diff_data + 255).tolist())) * self.codelength
+
+    # Encodes the image in strips of rows: a header with the image size and
+    # the strip height, then every strip (a complete compressed image of its
+    # own, so the differences start over in every strip) with a 4-byte length
+    def encode_strips(self, pixels, rows):
+        height, width = pixels.shape
+        codelength = 0
+        parts = [HEADER_MAGIC, FLAG_STRIPS.to_bytes(2, byteorder='big'),
+                 width.to_bytes(2, byteorder='big'), height.to_bytes(2, byteorder='big'),
+                 rows.to_bytes(2, byteorder='big')]
+        for top in range(0, height, rows):
+            strip = self.encode_pixels(pixels[top:top + rows])
+            codelength = max(codelength, self.codelength)
+            parts += [len(strip).to_bytes(4, byteorder='big'), strip]
+        self.codelength = codelength
+        return b''.join(parts)
+
+    # Starts the memory accounting of a compression or decompression (when
+    # the memory statistics are enabled)
+    def new_memory_meter(self):
+        self.memory_meter = None
+        if self.memory_stats is not None:
+            from memory_meter import MemoryMeter
+            self.memory_meter = MemoryMeter(self.memory_stats)
+
+    # Context manager that measures the peak memory of a stage
+    def memory_stage(self, name):
+        if self.memory_meter is None:
+            return nullcontext()
+        return self.memory_meter.stage(name)
+
+    # Returns the statistics lines about the memory use
+    def memory_info(self, width, height):
+        info = []
+        if self.memory_budget is not None:
+            from memory_meter import budget_info
+            info.append(budget_info(self.memory_budget, self.strip_rows, width, height))
+        if self.memory_meter is not None:
+            info += self.memory_meter.info()
+        return info
+
+    # Compresses the images of the given paths (in order) into one sequence
+    # container at the output path
+    def compress_sequence_files(self, input_paths, keyframe_interval=KEYFRAME_INTERVAL):
+        data, info = self.compress_sequence((Image.open(path) for path in input_paths), keyframe_interval)
+
+        with open(self.outputpath, 'wb') as out_file:
+            out_file.write(data)
+
+        return self.outputpath, info
+
+    # Compresses a sequence of images of the same size (the frames of a video
+    # or a burst) into one container and returns its bytes and the statistics.
+    # There is a key frame, coded on its own, at least every keyframe_interval
+    # frames so a reader can seek. The frames in between are predicted from
+    # the previous reconstructed frame: by the temporal difference (delta
+    # frame), by the spatial difference of a single image (key frame) when
+    # that has the lower entropy, or not at all when nothing changed beyond
+    # the near-lossless bound (repeat frame).
+    def compress_sequence(self, images, keyframe_interval=KEYFRAME_INTERVAL):
+        if not 1 <= keyframe_interval <= 65535:
+            raise ValueError(f"Keyframe interval must be 1..65535: {keyframe_interval}")
+        output_path = self.outputpath
+        output_file = os.path.basename(output_path) if output_path else 'bytes'
+
+        self.new_memory_meter()
+        self.collapsed_pixels = 0
+        self.difference_counts = np.zeros(511, dtype=np.int64)
+        self.max_error = 0
+        self.squared_error = 0.0
+        self.stored_blocks = 0
+        frames = []
+        width = height = None
+        reference = None
+        since_key = 0
+        encode_time = 0.0
+        for image in images:
+            pixels = np.array(image.convert('L'))
+            if width is None:
+                height, width = pixels.shape
+            elif pixels.shape != (height, width):
+                raise ValueError(f"Frame {len(frames)} is {pixels.shape[1]}x{pixels.shape[0]}, "
+                                 f"the sequence is {width}x{height}")
+
+            start = time.perf_counter()
+            if reference is None or since_key >= keyframe_interval:
+                frame_type = 'key'
+            else:
+                frame_type = self.choose_frame_type(pixels, reference)
+            if frame_type == 'repeat':
+                error = pixels.astype(np.int16) - reference
+                self.max_error = max(self.max_error, int(np.max(np.abs(error), initial=0)))
+                self.squared_error += float(np.sum(error.astype(np.float64) ** 2))
+                data = b''
+            else:
+                data = self.encode_pixels(pixels, reference if frame_type == 'delta' else None)
+                reference = self.reconstruction
+            since_key = 1 if frame_type == 'key' else since_key + 1
+            encode_time += time.perf_counter() - start
+            frames.append((FRAME_TYPES[frame_type], data))
+        if not frames:
+            raise ValueError('The sequence has no frames')
+
+        data = self.pack_sequence(width, height, keyframe_interval, frames)
+        original_size = width * height * len(frames)
+        compressed_size = len(data)
+        counts = {name: sum(1 for value, _ in frames if value == number) for name, number in FRAME_TYPES.items()}
 
-
-        return output_path, info
+        info = [
+            f"{len(frames)} frames of {width}x{height} are compressed into {output_file}.",
+            f"Original Size: {original_size:,} bytes",
+            f"Compressed Size: {compressed_size:,} bytes",
+            f"Compression Ratio: {original_size / compressed_size:.2f}",
+            f"Frames: {counts['key']} key, {counts['delta']} delta, {counts['repeat']} repeat "
+            f"(keyframe interval {keyframe_interval})",
+            f"Encode Time: {encode_time * 1000 / len(frames):.1f} ms per frame",
+        ]
+        if self.near_lossless:
+            info.append(f"Near-Lossless: max error {self.max_error} (bound {self.near_lossless}), "
+                        f"PSNR {psnr(self.squared_error, original_size):.2f} dB")
+        if self.memory_meter is not None:
+            info += self.memory_meter.info()
+        for line in info:
+            print(line)
+
+        return data, info
+
+    # Chooses how a frame that is not due to be a key frame is coded: repeat
+    # when no pixel is further than the near-lossless bound from the
+    # reference, otherwise delta or key, whichever residual (temporal or left
+    # neighbour difference) has the lower zero-order entropy
+    def choose_frame_type(self, pixels, reference):
+        temporal = pixels.astype(np.int16) - reference
+        if np.max(np.abs(temporal), initial=0) <= self.near_lossless:
+            return 'repeat'
+        spatial = np.diff(pixels.astype(np.int16), axis=1)
+        if self.residual_entropy(temporal) <= self.residual_entropy(spatial):
+            return 'delta'
+        return 'key'
+
+    # Zero-order entropy (bits per value) of differences in -255..255
+    def residual_entropy(self, residuals):
+        hist = np.bincount((residuals + 255).ravel(), minlength=511) / max(residuals.size, 1)
+        hist = hist[hist > 0]
+        return float(-np.sum(hist * np.log2(hist)))
+
+    # Builds the sequence container from the (type, data) pair of every frame
+    def pack_sequence(self, width, height, keyframe_interval, frames):
+        header = (SEQUENCE_MAGIC + width.to_bytes(2, byteorder='big') + height.to_bytes(2, byteorder='big') +
+                  len(frames).to_bytes(4, byteorder='big') + keyframe_interval.to_bytes(2, byteorder='big'))
+        index = bytearray()
+        offset = len(header) + 13 * len(frames)
+        for frame_type, data in frames:
+            index += offset.to_bytes(8, byteorder='big') + len(data).to_bytes(4, byteorder='big')
+            index.append(frame_type)
+            offset += len(data)
+        return b''.join([header, bytes(index)] + [data for _, data in frames])
 
     def compute_difference_image(self, image):
         # Convert image to numpy array
@@ -100,10 +402,86 @@ class LZWCoding:
                 
         return diff_img
 
+    # Builds the file header: the width and height as before when no optional
+    # feature is used, otherwise the magic, the flags, the size and the fields
+    # (delta frames of a sequence always have runs)
+    def add_header_info(self, width, height, temporal=False):
+        flags = 0
+        fields = b''
+        if temporal:
+            flags |= FLAG_TEMPORAL
+        if self.run_length or temporal:
+            flags |= FLAG_RUN_LENGTH
+            fields += self.runs
+        if self.scan_order != 'raster':
+            flags |= FLAG_SCAN_ORDER
+            fields += bytes([SCAN_ORDERS[self.scan_order]])
+        if self.near_lossless:
+            flags |= FLAG_NEAR_LOSSLESS
+            fields += bytes([self.near_lossless])
+
+        size = width.to_bytes(2, byteorder='big') + height.to_bytes(2, byteorder='big')
+        if not flags:
+            return size
+        return HEADER_MAGIC + flags.to_bytes(2, byteorder='big') + size + fields
+
+    # Parses the file header, sets the recorded features and returns the
+    # width, the height and the remaining (compressed) bytes
+    def extract_header_info(self, bytes_data):
+        flags = 0
+        if bytes_data[:len(HEADER_MAGIC)] == HEADER_MAGIC:
+            bytes_data = bytes_data[len(HEADER_MAGIC):]
+            flags = int.from_bytes(bytes_data[:2], byteorder='big')
+            bytes_data = bytes_data[2:]
+
+        width = int.from_bytes(bytes_data[:2], byteorder='big')
+        height = int.from_bytes(bytes_data[2:4], byteorder='big')
+        bytes_data = bytes_data[4:]
+
+        # Images coded in strips only have the strip height here, every strip
+        # has a header of its own
+        self.strip_rows = None
+        if flags & FLAG_STRIPS:
+            self.strip_rows = int.from_bytes(bytes_data[:2], byteorder='big')
+            bytes_data = bytes_data[2:]
+
+        self.temporal = bool(flags & FLAG_TEMPORAL)
+        self.run_length = bool(flags & FLAG_RUN_LENGTH)
+        self.run_positions = self.run_lengths = None
+        if self.run_length:
+            self.run_positions, self.run_lengths, bytes_data = unpack_runs(bytes_data)
+
+        self.scan_order = 'raster'
+        if flags & FLAG_SCAN_ORDER:
+            scan_ids = {value: name for name, value in SCAN_ORDERS.items()}
+            self.scan_order = scan_ids[bytes_data[0]]
+            bytes_data = bytes_data[1:]
+
+        self.near_lossless = 0
+        if flags & FLAG_NEAR_LOSSLESS:
+            self.near_lossless = bytes_data[0]
+            bytes_data = bytes_data[1:]
+        return width, height, bytes_data
+
+    # Temporal residual of a frame against the reference (the previous
+    # reconstructed frame), quantized with step 2k+1 in the near-lossless mode.
+    # Every pixel has its own predictor, so the whole frame is one vector.
+    # Returns the residuals and the reconstructed frame.
+    def temporal_residual(self, pixels, reference):
+        k = self.near_lossless
+        error = pixels.astype(np.int16) - reference
+        if not k:
+            return error, pixels
+        residuals = quantize_residuals(error, k)
+        reconstruction = np.clip(reference.astype(np.int16) + residuals * (2 * k + 1), 0, 255)
+        return residuals, reconstruction.astype(np.uint8)
+
     def calculate_entropy(self, image_path):
-        img = Image.open(image_path).convert("L")
-        img_array = np.array(img)
-        hist, _ = np.histogram(img_array, bins=256, range=(0, 256), density=True)
+        img = image_path if isinstance(image_path, Image.Image) else Image.open(image_path)
+        img = img.convert("L")
+        # Pillow counts the pixels without a widened copy of the image
+        hist = np.array(img.histogram(), dtype=np.float64)
+        hist /= max(hist.sum(), 1)
         hist = hist[hist > 0]
         entropy = -np.sum(hist * np.log2(hist))
         return entropy
@@ -168,44 +546,175 @@ class LZWCoding:
         with open(input_path, 'rb') as in_file:
             bytes_data = in_file.read()
 
-        # Extract width and height
-        width = int.from_bytes(bytes_data[:2], byteorder='big')
-        height = int.from_bytes(bytes_data[2:4], byteorder='big')
-        bytes_data = bytes_data[4:]
-
-        # Convert bytes to binary string
-        bit_string = ''.join(format(byte, '08b') for byte in bytes_data)
-        
-        # Remove padding and extract code length
-        bit_string = self.remove_padding(bit_string)
-        bit_string = self.extract_code_length_info(bit_string)
-        
-        # Convert binary string to integer codes
-        encoded_data = self.binary_string_to_int_list(bit_string)
-        
-        # Decode the LZW compression
-        diff_data = self.decodeImage(encoded_data)
-        
-        # Restore original values from 0-510 range
-        diff_data = [x - 255 for x in diff_data]
-        
-        # Reshape to 2D array
-        diff_image = np.array(diff_data, dtype=np.int16).reshape(height, width)
-        
-        # Reconstruct the original image from differences
-        original_image = self.reconstruct_from_difference(diff_image)
-        
-        # Ensure pixel values are in valid range
-        restored_image = np.clip(original_image, 0, 255).astype(np.uint8)
-        
         # Save as BMP
-        img = Image.fromarray(restored_image)
+        img = Image.fromarray(self.decompress_image(bytes_data))
         img.save(output_path)
 
         print(f"{input_file} is decompressed into {output_file}.")
-        print(f"Restored Image Dimensions: {width}x{height}")
+        print(f"Restored Image Dimensions: {img.width}x{img.height}")
+        if self.memory_meter is not None:
+            for line in self.memory_meter.info():
+                print(line)
         return output_path
 
+    # Decompresses the contents of a compressed file in memory and returns the
+    # pixels as a (height, width) array
+    def decompress_image(self, bytes_data):
+        if bytes_data[:len(SEQUENCE_MAGIC)] == SEQUENCE_MAGIC:
+            raise ValueError('Image sequences are read with decompress_sequence')
+        self.new_memory_meter()
+        # Extract width, height and the features from the header
+        width, height, bytes_data = self.extract_header_info(bytes_data)
+        if self.strip_rows:
+            return self.decode_strips(width, height, self.strip_rows, bytes_data)
+        return self.decode_pixels(width, height, bytes_data)
+
+    # Decodes the compressed data that follows a header (a delta frame of a
+    # sequence is added to the reference, the previous decoded frame)
+    def decode_pixels(self, width, height, bytes_data, reference=None):
+        stored = is_stored(bytes_data)
+        if stored:
+            # Stored differences (modulo 256) follow the padding and code length info
+            self.codelength = STORED_CODELENGTH
+            diff_data = stored_values(bytes_data, signed=True)
+        else:
+            diff_data = self.lzw_decode_block(bytes_data)
+        with self.memory_stage('restore'):
+            if self.run_length:
+                # Expand the runs collapsed before compression
+                diff_data = run_length_decode(diff_data, self.run_positions, self.run_lengths)
+            # Put the differences back in raster order
+            raster_data = np.empty_like(diff_data)
+            raster_data[scan_permutation(self.scan_order, width, height)] = diff_data
+            diff_data = raster_data
+
+            # Reshape to 2D array
+            diff_image = diff_data.reshape(height, width)
+
+            # Reconstruct the original image from differences
+            if self.temporal:
+                if reference is None:
+                    raise ValueError('A delta frame can only be decoded after the frame before it')
+                step = 2 * self.near_lossless + 1
+                original_image = reference.astype(np.int16) + diff_image * step
+            elif self.near_lossless:
+                original_image = dequantize_difference_image(diff_image, self.near_lossless)
+            else:
+                # Stored differences add up to the pixels modulo 256
+                original_image = self.reconstruct_from_difference(diff_image.astype(np.int32) if stored else diff_image)
+
+            if stored and not self.near_lossless:
+                return (original_image & 0xFF).astype(np.uint8)
+            # Ensure pixel values are in valid range
+            return np.clip(original_image, 0, 255).astype(np.uint8)
+
+    # Decodes the LZW compressed differences of a block
+    def lzw_decode_block(self, bytes_data):
+        with self.memory_stage('unpack'):
+            # Convert bytes to binary string
+            bit_string = ''.join(format(byte, '08b') for byte in bytes_data)
+
+            # Remove padding and extract code length
+            bit_string = self.remove_padding(bit_string)
+            bit_string = self.extract_code_length_info(bit_string)
+
+            # Convert binary string to integer codes
+            encoded_data = self.binary_string_to_int_list(bit_string)
+            del bit_string
+
+        # Decode the LZW compression
+        with self.memory_stage('lzw'):
+            diff_data = self.decodeImage(encoded_data)
+            del encoded_data
+
+            # Restore original values from 0-510 range
+            return np.array(diff_data, dtype=np.int16) - 255
+
+    # Decodes an image coded in strips into a preallocated array, so only one
+    # strip is being decoded at a time
+    def decode_strips(self, width, height, rows, bytes_data):
+        image = np.empty((height, width), dtype=np.uint8)
+        data = memoryview(bytes_data)
+        offset = 0
+        for top in range(0, height, rows):
+            length = int.from_bytes(data[offset:offset + 4], byteorder='big')
+            strip = bytes(data[offset + 4:offset + 4 + length])
+            offset += 4 + length
+            strip_width, strip_height, strip = self.extract_header_info(strip)
+            if (strip_width, strip_height) != (width, min(rows, height - top)):
+                raise ValueError(f"Strip at row {top} is {strip_width}x{strip_height}")
+            image[top:top + strip_height] = self.decode_pixels(strip_width, strip_height, strip)
+        self.strip_rows = rows
+        return image
+
+    # Decompresses a sequence container (given by filepath) and saves every
+    # frame as <output path>_<frame number>.bmp. Returns the saved paths.
+    def decompress_sequence_file(self):
+        with open(self.filepath, 'rb') as in_file:
+            bytes_data = in_file.read()
+
+        root, extension = os.path.splitext(self.outputpath)
+        paths = []
+        for number, frame in enumerate(self.decompress_sequence(bytes_data)):
+            paths.append(f"{root}_{number:04d}{extension or '.bmp'}")
+            Image.fromarray(frame).save(paths[-1])
+
+        print(f"{os.path.basename(self.filepath)} is decompressed into {len(paths)} frames.")
+        return paths
+
+    # Decompresses a sequence container in memory and returns the frames as
+    # (height, width) arrays
+    def decompress_sequence(self, bytes_data):
+        width, height, index = self.read_sequence_index(bytes_data)
+        return self.decode_frames(width, height, index, bytes_data, 0, len(index))
+
+    # Decompresses a single frame of a sequence container, starting at the
+    # last key frame before it instead of the first frame
+    def decompress_frame(self, bytes_data, number):
+        width, height, index = self.read_sequence_index(bytes_data)
+        if not 0 <= number < len(index):
+            raise IndexError(f"The sequence has {len(index)} frames, no frame {number}")
+        first = number
+        while index[first][2] != FRAME_TYPES['key']:
+            first -= 1
+        return self.decode_frames(width, height, index, bytes_data, first, number + 1)[-1]
+
+    # Parses the header and the frame index of a sequence container. Returns
+    # the frame size and the (offset, length, type) of every frame.
+    def read_sequence_index(self, bytes_data):
+        if bytes_data[:len(SEQUENCE_MAGIC)] != SEQUENCE_MAGIC:
+            raise ValueError('Not an image sequence')
+        header = bytes_data[len(SEQUENCE_MAGIC):len(SEQUENCE_MAGIC) + 10]
+        width = int.from_bytes(header[0:2], byteorder='big')
+        height = int.from_bytes(header[2:4], byteorder='big')
+        count = int.from_bytes(header[4:8], byteorder='big')
+        self.keyframe_interval = int.from_bytes(header[8:10], byteorder='big')
+        start = len(SEQUENCE_MAGIC) + 10
+        data = bytes_data[start:start + 13 * count]
+        index = [(int.from_bytes(data[i:i + 8], byteorder='big'), int.from_bytes(data[i + 8:i + 12], byteorder='big'),
+                  data[i + 12]) for i in range(0, len(data), 13)]
+        if len(index) != count or (index and index[0][2] != FRAME_TYPES['key']):
+            raise ValueError('The frame index of the sequence is damaged')
+        return width, height, index
+
+    # Decodes the frames first..last-1 of a sequence, the first one must be a
+    # key frame
+    def decode_frames(self, width, height, index, bytes_data, first, last):
+        self.new_memory_meter()
+        data = memoryview(bytes_data)
+        frames = []
+        reference = None
+        for offset, length, frame_type in index[first:last]:
+            if frame_type != FRAME_TYPES['repeat']:
+                frame_width, frame_height, frame = self.extract_header_info(bytes(data[offset:offset + length]))
+                if (frame_width, frame_height) != (width, height):
+                    raise ValueError(f"Frame at offset {offset} is {frame_width}x{frame_height}")
+                reference = self.decode_pixels(width, height, frame, reference)
+            else:
+                reference = reference.copy()
+            frames.append(reference)
+        return frames
+
     def reconstruct_from_difference(self, diff_image):
         height, width = diff_image.shape
         original_image = np.zeros_like(diff_image)
@@ -1,69 +1,196 @@
 import os
 import numpy as np
 from PIL import Image
+from color_planes import extract_palette, compress_planes, decode_planes
+from color_transform import COLOR_TRANSFORMS, forward_color_transform, inverse_color_transform
+from stored_blocks import STORED_CODELENGTH, is_incompressible, stored_block, is_stored, stored_values
+
+# Channel files that use optional features start with this magic and a flags
+# field, files without it are read with the original width/height header
+HEADER_MAGIC = b'LZW\x01'
+FLAG_COLOR_TRANSFORM = 0x0001
+FLAG_PALETTE = 0x0002
+FLAG_CHAINED_DICTIONARY = 0x0004
+
+# Output files of the three channels and of the index plane (palette mode)
+CHANNEL_SUFFIXES = ['_R.bin', '_G.bin', '_B.bin']
+PALETTE_SUFFIX = '_P.bin'
+
 
 class LZWCoding:
-    def __init__(self, filename, data_type, filepath, outputpath):
+    def __init__(self, filename, data_type, filepath, outputpath, color_transform='none',
+                 palette_mode=False, chained_dictionary=False):
         self.filename = filename
         self.codelength = None
         self.data_type = data_type
         self.filepath = filepath
         self.outputpath = outputpath
-
-    def compress_image_file(self):
-        # Get paths
-        input_path = self.filepath
-        input_file = os.path.basename(input_path)
-        output_path = self.outputpath
-        output_file = os.path.basename(output_path)
-
-        image = Image.open(input_path).convert('RGB')
+        if color_transform not in COLOR_TRANSFORMS:
+            raise ValueError(f"Unknown color transform: {color_transform}")
+        self.color_transform = color_transform
+        # Images with at most 256 colors are stored as a palette and a single
+        # index plane when palette_mode is set
+        self.palette_mode = palette_mode
+        self.palette = None
+        # The second and third channels continue with the dictionary the
+        # channel before them left, so phrases shared between the channels
+        # are only learned once (the channels are then coded one by one)
+        self.chained_dictionary = chained_dictionary
+
+    def compress_image_file(self, workers=1):
+        output_file = os.path.basename(self.outputpath)
+        outputs, info = self.compress_image(Image.open(self.filepath), workers)
+
+        for suffix, data in outputs.items():
+            with open(self.outputpath + suffix, 'wb') as out_file:
+                out_file.write(data)
+            print(f"Saved compressed channel: {self.outputpath + suffix}")
+        self.remove_stale_outputs(outputs)
+
+        return [output_file + suffix for suffix in outputs], info
+
+    # Compresses an opened image in memory and returns the bytes of every
+    # output file (by suffix) and the statistics
+    def compress_image(self, image, workers=1):
+        input_file = os.path.basename(self.filepath) if self.filepath else 'image'
         width, height = image.size
-        r, g, b = image.split()
-
-        # Her kanal için sıkıştırma işlemi uygula
-        self.compress_channel(np.array(r), width, height, '_R.bin')
-        self.compress_channel(np.array(g), width, height, '_G.bin')
-        self.compress_channel(np.array(b), width, height, '_B.bin')
-
-        original_size = os.path.getsize(input_path)
-        compressed_size = sum(os.path.getsize(output_path + suffix) for suffix in ['_R.bin', '_G.bin', '_B.bin'])
+        palette_data = extract_palette(image) if self.palette_mode else None
+
+        if palette_data is not None:
+            # A single index plane instead of three channels
+            indices, self.palette = palette_data
+            outputs = compress_planes(self, [indices], width, height, [PALETTE_SUFFIX], workers)
+        else:
+            self.palette = None
+            # With a color transform the three files hold Y and the two chroma planes
+            c0, c1, c2 = forward_color_transform(np.array(image.convert('RGB')), self.color_transform)
+
+            # Her kanal için sıkıştırma işlemi uygula
+            outputs = compress_planes(self, [c0, c1, c2], width, height, CHANNEL_SUFFIXES, workers)
+
+        original_size = os.path.getsize(self.filepath) if self.filepath else width * height * 3
+        compressed_size = sum(len(data) for data in outputs.values())
         compression_ratio = original_size / compressed_size
 
         print(f"Compression completed for {input_file}")
         info = [f"Width: {width}, Height: {height}",
                 f"Original size: {original_size} bytes",
                 f"Compressed size: {compressed_size} bytes",
-                f"Compression ratio: {compression_ratio
-                }"
+                f"Compression ratio: {compression_ratio}",
+                f"Color transform: {self.color_transform}" if self.palette is None else
+                f"Palette: {len(self.palette) // 3} colors"
                 ]
-
-        return [output_file + '_R.bin', output_file + '_G.bin', output_file + '_B.bin'], info
-
-    def compress_channel(self, channel_data, width, height, suffix):
-        channel_data = channel_data.flatten().tolist()
-
-        encoded_data = self.encodeGrayScaledImage(channel_data)
+        stored = self.stored_planes(outputs, width, height)
+        if stored:
+            info.append(f"Stored raw: {stored} of {len(outputs)} planes (incompressible)")
+        if self.chained_dictionary and self.palette is None:
+            info.append("Dictionary: chained across the channels")
+        elif workers > 1:
+            info.append(f"Workers: {workers} (shared memory)")
+
+        return outputs, info
+
+    # Removes the files of the other layout (channels or index plane) that an
+    # earlier compression to the same output path left behind
+    def remove_stale_outputs(self, suffixes):
+        for suffix in CHANNEL_SUFFIXES + [PALETTE_SUFFIX]:
+            if suffix not in suffixes and os.path.exists(self.outputpath + suffix):
+                os.remove(self.outputpath + suffix)
+
+    # Returns the contents of a channel file: the header and the payload
+    def compress_channel(self, channel_data, width, height, dictionary=None):
+        return self.add_header_info(width, height) + self.encode_channel(channel_data, dictionary)
+
+    # Returns the compressed bytes of a plane (without the file header)
+    # Planes the LZW stage would grow (noise) are stored as they are, unless
+    # the dictionary is chained: the next plane continues with it.
+    def encode_channel(self, channel_data, dictionary=None):
+        channel_data = channel_data.ravel()
+        if dictionary is None and is_incompressible(channel_data, self.trial_bits):
+            return stored_block(channel_data)
+
+        encoded_data = self.encodeGrayScaledImage(channel_data.tolist(), dictionary)
         encoded_string = self.int_list_to_binary_string(encoded_data)
         encoded_string = self.add_code_length_info(encoded_string)
         padded_encoded_string = self.pad_encoded_data(encoded_string)
-        byte_array = self.get_byte_array(padded_encoded_string)
+        payload = bytes(self.get_byte_array(padded_encoded_string))
+        if dictionary is None and len(payload) > channel_data.size + 2:
+            return stored_block(channel_data)
+        return payload
+
+    # Returns the size in bits of the LZW codes of a slice of a plane
+    def trial_bits(self, values):
+        return len(self.encodeGrayScaledImage(values.tolist())) * int(self.codelength)
+
+    # Returns the number of stored planes in the channel files
+    def stored_planes(self, outputs, width, height):
+        header_size = len(self.add_header_info(width, height))
+        return sum(is_stored(data[header_size:]) for data in outputs.values())
+
+    # Upper bound of the payload size of a plane with the given number of
+    # pixels: one code per pixel with the widest possible code length
+    def max_payload_size(self, pixel_count):
+        return (pixel_count * (256 + pixel_count).bit_length() + 7) // 8 + 2
+
+    # Builds the channel file header: the original width/height header when no
+    # optional feature is used, otherwise the magic, the flags and the fields
+    def add_header_info(self, width, height):
+        flags = 0
+        fields = b''
+        if self.palette is not None:
+            # The colors are stored once, the transform does not apply
+            flags |= FLAG_PALETTE
+            fields += bytes([len(self.palette) // 3 - 1]) + self.palette
+        elif self.color_transform != 'none':
+            flags |= FLAG_COLOR_TRANSFORM
+            fields += bytes([COLOR_TRANSFORMS[self.color_transform]])
+        if self.palette is None and self.chained_dictionary:
+            flags |= FLAG_CHAINED_DICTIONARY
+
+        size = width.to_bytes(2, byteorder='big') + height.to_bytes(2, byteorder='big')
+        if not flags:
+            return size
+        return HEADER_MAGIC + flags.to_bytes(2, byteorder='big') + size + fields
+
+    # Parses the channel file header, sets the feature attributes and returns
+    # the width, the height and the remaining (compressed) bytes
+    def extract_header_info(self, bytes_data):
+        flags = 0
+        if bytes_data[:len(HEADER_MAGIC)] == HEADER_MAGIC:
+            bytes_data = bytes_data[len(HEADER_MAGIC):]
+            flags = int.from_bytes(bytes_data[:2], byteorder='big')
+            bytes_data = bytes_data[2:]
 
-       # output_path = f"{self.filename}{suffix}"
-        output_path = self.outputpath + suffix
-        with open(output_path, 'wb') as out_file:
-            out_file.write(width.to_bytes(2, byteorder='big'))
-            out_file.write(height.to_bytes(2, byteorder='big'))
-            out_file.write(bytes(byte_array))
+        width = int.from_bytes(bytes_data[:2], byteorder='big')
+        height = int.from_bytes(bytes_data[2:4], byteorder='big')
+        bytes_data = bytes_data[4:]
+
+        self.color_transform = 'none'
+        if flags & FLAG_COLOR_TRANSFORM:
+            names = {v: k for k, v in COLOR_TRANSFORMS.items()}
+            self.color_transform = names[bytes_data[0]]
+            bytes_data = bytes_data[1:]
+
+        self.palette = None
+        if flags & FLAG_PALETTE:
+            palette_size = 3 * (bytes_data[0] + 1)
+            self.palette = bytes(bytes_data[1:1 + palette_size])
+            bytes_data = bytes_data[1 + palette_size:]
 
-        print(f"Saved compressed channel: {output_path}")
+        self.chained_dictionary = bool(flags & FLAG_CHAINED_DICTIONARY)
+        return width, height, bytes_data
 
-    def encodeGrayScaledImage(self, image_data):
+    # A chained channel passes the dictionary of the channel before it, which
+    # is updated in place (an empty one starts with the single values)
+    def encodeGrayScaledImage(self, image_data, dictionary=None):
         if not image_data:
             return []
 
-        dict_size = 256
-        dictionary = {bytes([i]): i for i in range(dict_size)}
+        if dictionary is None:
+            dictionary = {}
+        if not dictionary:
+            dictionary.update({bytes([i]): i for i in range(256)})
+        dict_size = len(dictionary)
         w = bytes([image_data[0]])
         result = []
 
@@ -97,35 +224,49 @@ class LZWCoding:
         return bytearray(int(padded_encoded_data[i:i+8], 2) for i in range(0, len(padded_encoded_data), 8))
 
     def decompress_image_file(self):
-        r_channel = self.decompress_channel('_R.bin')
-        g_channel = self.decompress_channel('_G.bin')
-        b_channel = self.decompress_channel('_B.bin')
-
-        img = Image.merge("RGB", (r_channel, g_channel, b_channel))
+        # The index plane of palette mode or the three channel files
+        suffixes = [PALETTE_SUFFIX] if os.path.exists(self.filepath + PALETTE_SUFFIX) else CHANNEL_SUFFIXES
+        outputs = {}
+        for suffix in suffixes:
+            with open(self.filepath + suffix, 'rb') as in_file:
+                outputs[suffix] = in_file.read()
+
+        img = Image.fromarray(self.decompress_image(outputs))
         output_path = self.outputpath + "_decompressed.bmp"
         img.save(output_path)
         print(f"Decompressed image saved as {output_path}")
 
         return output_path
 
-    def decompress_channel(self, suffix):
-        #input_path = self.filename + suffix
-        input_path = self.filepath + suffix
-        with open(input_path, 'rb') as in_file:
-            bytes_data = in_file.read()
-
-        width = int.from_bytes(bytes_data[:2], byteorder='big')
-        height = int.from_bytes(bytes_data[2:4], byteorder='big')
-        bytes_data = bytes_data[4:]
+    # Decompresses the file contents returned by compress_image (by suffix) and
+    # returns the (height, width, 3) RGB array
+    def decompress_image(self, outputs):
+        if PALETTE_SUFFIX in outputs:
+            # Palette mode: look the colors of the index plane up in the palette
+            indices = self.decode_channel(outputs[PALETTE_SUFFIX])
+            palette = np.frombuffer(self.palette, dtype=np.uint8).reshape(-1, 3)
+            return palette[indices]
+
+        # the transform is read from the channel headers
+        r_channel, g_channel, b_channel = decode_planes(self, outputs, CHANNEL_SUFFIXES)
+        return inverse_color_transform(r_channel, g_channel, b_channel, self.color_transform)
+
+    # Returns the plane stored in the contents of a channel file
+    # (a chained channel is decoded with the dictionary of the channel
+    # before it)
+    def decode_channel(self, bytes_data, dictionary=None):
+        width, height, bytes_data = self.extract_header_info(bytes_data)
+        if is_stored(bytes_data):
+            self.codelength = STORED_CODELENGTH
+            return stored_values(bytes_data).reshape(height, width)
 
         bit_string = "".join(bin(byte)[2:].rjust(8, '0') for byte in bytes_data)
         bit_string = self.remove_padding(bit_string)
         bit_string = self.extract_code_length_info(bit_string)
         encoded_data = self.binary_string_to_int_list(bit_string)
-        decoded_data = self.decodeImage(encoded_data)
+        decoded_data = self.decodeImage(encoded_data, dictionary)
 
-        image_array = np.array(decoded_data, dtype=np.uint8).reshape(height, width)
-        return Image.fromarray(image_array)
+        return np.array(decoded_data, dtype=np.uint8).reshape(height, width)
 
     def remove_padding(self, padded_encoded_data):
         extra_bits = int(padded_encoded_data[:8], 2)
@@ -138,8 +279,12 @@ class LZWCoding:
     def binary_string_to_int_list(self, bitstring):
         return [int(bitstring[i:i+self.codelength], 2) for i in range(0, len(bitstring), self.codelength)]
 
-    def decodeImage(self, encoded_values):
-        dictionary = {i: bytes([i]) for i in range(256)}
+    # The dictionary is updated in place like the one of encodeGrayScaledImage
+    def decodeImage(self, encoded_values, dictionary=None):
+        if dictionary is None:
+            dictionary = {}
+        if not dictionary:
+            dictionary.update({i: bytes([i]) for i in range(256)})
         w = dictionary[encoded_values.pop(0)]
         result = bytearray(w)
 
@@ -0,0 +1,229 @@
+import os
+import ast
+import json
+import time
+import shutil
+import hashlib
+import inspect
+from contextlib import contextmanager
+
+# Bump when the layout of the cache directory changes
+CACHE_VERSION = 1
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+# Returns the path of a source file together with the paths of every module
+# of the repository it imports, directly or through other such modules
+# (imports inside functions included)
+def local_dependencies(source_path):
+    paths = set()
+    pending = [os.path.abspath(source_path)]
+    while pending:
+        path = pending.pop()
+        if path in paths:
+            continue
+        paths.add(path)
+        with open(path, 'rb') as source_file:
+            tree = ast.parse(source_file.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                base = os.path.join(ROOT, *name.split('.'))
+                for candidate in (base + '.py', os.path.join(base, '__init__.py')):
+                    if os.path.isfile(candidate):
+                        pending.append(candidate)
+    return paths
+
+
+# An on-disk cache of compression results. Entries are keyed by a hash of the
+# input content, the codec (including its source code), the predictor and the
+# parameters, so an unchanged input is never compressed twice. The total size
+# is bounded with LRU eviction and several processes can share one directory:
+# entries are published with an atomic rename and the bookkeeping runs under a
+# file lock.
+class ResultCache:
+    def __init__(self, cache_dir, max_size=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.entries_dir = os.path.join(cache_dir, 'entries')
+        self.stats_path = os.path.join(cache_dir, 'stats.json')
+        self.lock_path = os.path.join(cache_dir, 'lock')
+        os.makedirs(self.entries_dir, exist_ok=True)
+        # Counters of this process (stats() returns the shared ones)
+        self.hits = 0
+        self.misses = 0
+        self._source_hashes = {}
+
+    # Exclusive lock shared by all processes using the cache directory
+    @contextmanager
+    def locked(self):
+        with open(self.lock_path, 'a+b') as lock_file:
+            if os.name == 'nt':
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    # Hash of the source file of a codec class and of the repository modules it
+    # imports (such as shared_pool or color_transform), so results produced by
+    # an older version of any of them are not reused
+    def codec_hash(self, codec_class):
+        source_path = inspect.getsourcefile(codec_class)
+        if source_path not in self._source_hashes:
+            digest = hashlib.sha256()
+            for path in sorted(local_dependencies(source_path)):
+                digest.update(os.path.relpath(path, ROOT).encode())
+                with open(path, 'rb') as source_file:
+                    digest.update(hashlib.sha256(source_file.read()).digest())
+            self._source_hashes[source_path] = digest.hexdigest()
+        return self._source_hashes[source_path]
+
+    def make_key(self, input_path, codec, predictor, params):
+        digest = hashlib.sha256()
+        with open(input_path, 'rb') as in_file:
+            for block in iter(lambda: in_file.read(1 << 20), b''):
+                digest.update(block)
+        description = {'version': CACHE_VERSION, 'codec': codec, 'predictor': predictor, 'params': params}
+        digest.update(json.dumps(description, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    # Returns (outputs, info) for a cached key, where outputs maps the output
+    # suffixes to the compressed bytes, or None on a miss
+    def get(self, key):
+        entry_dir = os.path.join(self.entries_dir, key)
+        try:
+            with open(os.path.join(entry_dir, 'info.json')) as info_file:
+                entry = json.load(info_file)
+            outputs = {}
+            for suffix, file_name in entry['outputs'].items():
+                with open(os.path.join(entry_dir, file_name), 'rb') as data_file:
+                    outputs[suffix] = data_file.read()
+            # Mark the entry as recently used
+            os.utime(os.path.join(entry_dir, 'info.json'))
+        except (FileNotFoundError, ValueError, KeyError):
+            # Not cached, or evicted by another process while reading
+            self.record('misses')
+            return None
+        self.record('hits')
+        return outputs, entry['info']
+
+    def put(self, key, outputs, info):
+        entry_dir = os.path.join(self.entries_dir, key)
+        temp_dir = f"{entry_dir}.tmp-{os.getpid()}-{time.monotonic_ns()}"
+        os.makedirs(temp_dir)
+        names = {}
+        for n, (suffix, data) in enumerate(outputs.items()):
+            names[suffix] = f"output{n}.bin"
+            with open(os.path.join(temp_dir, names[suffix]), 'wb') as data_file:
+                data_file.write(data)
+        with open(os.path.join(temp_dir, 'info.json'), 'w') as info_file:
+            json.dump({'outputs': names, 'info': info}, info_file)
+
+        try:
+            # Publish the complete entry at once
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same result first
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self.evict()
+
+    # Removes the least recently used entries until the cache fits max_size
+    def evict(self):
+        with self.locked():
+            entries = []
+            total_size = 0
+            for name in os.listdir(self.entries_dir):
+                entry_dir = os.path.join(self.entries_dir, name)
+                if '.' in name:
+                    continue  # Entries that are being written or removed
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+                    last_used = os.path.getmtime(os.path.join(entry_dir, 'info.json'))
+                except FileNotFoundError:
+                    continue
+                entries.append((last_used, size, entry_dir))
+                total_size += size
+
+            evicted = 0
+            for last_used, size, entry_dir in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                # Readers see the entry either complete or missing
+                trash_dir = f"{entry_dir}.evict-{os.getpid()}"
+                os.rename(entry_dir, trash_dir)
+                shutil.rmtree(trash_dir, ignore_errors=True)
+                total_size -= size
+                evicted += 1
+            if evicted:
+                self.update_stats('evictions', evicted)
+
+    def record(self, counter):
+        setattr(self, counter, getattr(self, counter) + 1)
+        with self.locked():
+            self.update_stats(counter, 1)
+
+    # Must be called with the lock held
+    def update_stats(self, counter, amount):
+        stats = self.read_stats()
+        stats[counter] = stats.get(counter, 0) + amount
+        temp_path = f"{self.stats_path}.tmp-{os.getpid()}"
+        with open(temp_path, 'w') as stats_file:
+            json.dump(stats, stats_file)
+        os.replace(temp_path, self.stats_path)
+
+    def read_stats(self):
+        try:
+            with open(self.stats_path) as stats_file:
+                return json.load(stats_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    # Hit/miss/eviction counters of all processes using the cache directory
+    def stats(self):
+        stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        stats.update(self.read_stats())
+        return stats
+
+    # Compresses the input of an LZWCoding object through the cache. On a hit
+    # the stored outputs are written to lzw.outputpath + suffix and the stored
+    # statistics are returned, on a miss the image is compressed and stored.
+    def compress_image(self, lzw, codec, predictor, params, suffixes):
+        key = self.make_key(lzw.filepath, {'name': codec, 'source': self.codec_hash(type(lzw))}, predictor, params)
+        entry = self.get(key)
+        if entry is not None:
+            outputs, info = entry
+            for suffix, data in outputs.items():
+                with open(lzw.outputpath + suffix, 'wb') as out_file:
+                    out_file.write(data)
+            # Files of another layout left by an earlier run would be read
+            # instead of the restored ones
+            for suffix in suffixes:
+                if suffix not in outputs and os.path.exists(lzw.outputpath + suffix):
+                    os.remove(lzw.outputpath + suffix)
+            return info + ["Cache: hit"]
+
+        _, info = lzw.compress_image_file()
+        outputs = {}
+        for suffix in suffixes:
+            if os.path.exists(lzw.outputpath + suffix):
+                with open(lzw.outputpath + suffix, 'rb') as data_file:
+                    outputs[suffix] = data_file.read()
+        self.put(key, outputs, info)
+        return info + ["Cache: miss"]
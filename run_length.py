@@ -0,0 +1,73 @@
+# Run-length pre-pass shared by the gray codecs (project2 and project3): long
+# runs of equal values are collapsed before the LZW stage and their positions
+# and lengths are stored in the header.
+#   values, positions, lengths = run_length_encode(data)
+#   header_field = pack_runs(positions, lengths)
+import numpy as np
+
+# Runs of at least this many equal values are collapsed
+RLE_MIN_RUN = 16
+
+
+# Collapses the runs of at least RLE_MIN_RUN equal values into
+# a single value (vectorized). Returns the remaining values, the positions
+# of the collapsed runs among the remaining values and the run lengths.
+def run_length_encode(data):
+    if data.size == 0:
+        return data, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(data)) + 1))
+    lengths = np.diff(np.append(starts, data.size))
+    long_runs = lengths >= RLE_MIN_RUN
+    # Every long run is kept once, every short run as it is
+    kept = np.where(long_runs, 1, lengths)
+    values = np.repeat(data[starts], kept)
+    positions = (np.cumsum(kept) - kept)[long_runs]
+    return values, positions, lengths[long_runs]
+
+
+# Reverses run_length_encode (vectorized)
+def run_length_decode(values, positions, lengths):
+    repeats = np.ones(values.size, dtype=np.int64)
+    repeats[positions] = lengths
+    return np.repeat(values, repeats)
+
+
+# Stores the runs as varints: the number of runs, then the
+# gap between consecutive run positions and the length of each run
+def pack_runs(positions, lengths):
+    numbers = [len(positions)]
+    previous = 0
+    for position, length in zip(positions.tolist(), lengths.tolist()):
+        numbers += [position - previous, length]
+        previous = position
+    packed = bytearray()
+    for number in numbers:
+        while number >= 0x80:
+            packed.append((number & 0x7F) | 0x80)
+            number >>= 7
+        packed.append(number)
+    return bytes(packed)
+
+
+# Reads the runs stored by pack_runs and returns the positions,
+# the lengths and the remaining bytes
+def unpack_runs(bytes_data):
+    numbers = []
+    index = 0
+    count = None
+    while count is None or len(numbers) < 2 * count:
+        number = shift = 0
+        while True:
+            byte = bytes_data[index]
+            index += 1
+            number |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        if count is None:
+            count = number
+        else:
+            numbers.append(number)
+    positions = np.cumsum(numbers[0::2], dtype=np.int64)
+    lengths = np.array(numbers[1::2], dtype=np.int64)
+    return positions, lengths, bytes_data[index:]
@@ -0,0 +1,118 @@
+# A process pool whose inputs and outputs travel through shared memory. The
+# parent copies every input array into a shared segment once and allocates the
+# output buffers the same way; the tasks only carry segment descriptors (name,
+# shape and dtype), so no pixel or code data is pickled.
+#
+#   with SharedWorkerPool(3) as pool:
+#       plane = pool.share(array)
+#       output = pool.allocate(max_size, np.uint8)
+#       length = pool.submit(worker, plane, output).result()
+#       data = pool.view(output)[:length]
+#
+# Every segment is created by the parent and unlinked when the pool is closed,
+# also when a task raises or a worker dies. If the parent itself is killed,
+# the resource tracker of multiprocessing removes the segments it created.
+import sys
+import weakref
+from contextlib import contextmanager
+from multiprocessing import shared_memory, resource_tracker
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+
+# Opens an existing segment without registering it with the resource tracker:
+# only the process that created a segment may remove it. Before Python 3.13
+# opening always registers, and the workers share the parent's tracker, so a
+# registration from a worker would cancel the parent's one when it ends.
+def open_segment(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+# Maps a segment descriptor as a numpy array inside a worker. The array is
+# only valid inside the with block; delete it before leaving the block so the
+# mapping can be closed right away.
+@contextmanager
+def attach(descriptor):
+    name, shape, dtype = descriptor
+    segment = open_segment(name)
+    try:
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+        yield array
+        del array
+    finally:
+        try:
+            segment.close()
+        except BufferError:
+            pass  # A view is still alive, the mapping goes away with it
+
+
+def release_segments(segments):
+    while segments:
+        segment = segments.pop()
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+        try:
+            segment.close()
+        except BufferError:
+            pass  # A view is still alive, the mapping goes away with it
+
+
+class SharedWorkerPool:
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = None
+        self.segments = []
+        self.descriptors = {}
+        # Pools that are not closed explicitly still free their segments
+        self._finalizer = weakref.finalize(self, release_segments, self.segments)
+
+    def __enter__(self):
+        self.executor = ProcessPoolExecutor(self.workers)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        try:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+                self.executor = None
+        finally:
+            self.descriptors.clear()
+            release_segments(self.segments)
+
+    # Creates a segment for an array of the given shape and dtype and returns
+    # its descriptor
+    def allocate(self, shape, dtype):
+        shape = tuple(shape) if isinstance(shape, (tuple, list)) else (shape,)
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        segment = shared_memory.SharedMemory(create=True, size=size)
+        self.segments.append(segment)
+        descriptor = (segment.name, shape, dtype.str)
+        self.descriptors[segment.name] = segment
+        return descriptor
+
+    # Copies an array into a new segment and returns its descriptor
+    def share(self, array):
+        descriptor = self.allocate(array.shape, array.dtype)
+        self.view(descriptor)[...] = array
+        return descriptor
+
+    # The parent's numpy view of a segment, valid until the pool is closed
+    def view(self, descriptor):
+        name, shape, dtype = descriptor
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.descriptors[name].buf)
+
+    def submit(self, function, *args):
+        return self.executor.submit(function, *args)
@@ -0,0 +1,50 @@
+# Stored blocks of the image codecs (project2 to project5). Values the LZW
+# stage would grow (noise) are stored with one byte each instead: the padding
+# byte 0, the code length byte STORED_CODELENGTH and the values modulo 256
+# (pixels as they are, differences in two's complement). Blocks of at least
+# PRECHECK_SIZE values with an entropy of at least PRECHECK_ENTROPY bits per
+# value get a trial encode of TRIAL_SIZE values from their middle and skip
+# the LZW stage when its compression ratio is below TRIAL_RATIO (a slice
+# compresses worse than the whole block, noise gets about 0.63 and
+# photographs about 1).
+#   if is_incompressible(values, trial_bits): payload = stored_block(values)
+#   if is_stored(payload): values = stored_values(payload, signed=True)
+import numpy as np
+from color_transform import to_signed
+
+STORED_CODELENGTH = 0
+PRECHECK_SIZE = 65536
+PRECHECK_ENTROPY = 7.0
+TRIAL_SIZE = 16384
+TRIAL_RATIO = 0.8
+
+
+# Returns whether the LZW stage would grow the values (an integer array).
+# trial_bits(values) returns the size in bits of the LZW codes of a slice.
+def is_incompressible(values, trial_bits):
+    values = np.asarray(values).ravel()
+    if values.size < PRECHECK_SIZE:
+        return False
+    hist = np.bincount(values & 0xFF, minlength=256) / values.size
+    hist = hist[hist > 0]
+    if -np.sum(hist * np.log2(hist)) < PRECHECK_ENTROPY:
+        return False
+    start = (values.size - TRIAL_SIZE) // 2
+    return 8 * TRIAL_SIZE < TRIAL_RATIO * trial_bits(values[start:start + TRIAL_SIZE])
+
+
+# Returns the stored form of the values (after the padding and code length
+# bytes every value modulo 256)
+def stored_block(values):
+    return bytes([0, STORED_CODELENGTH]) + (np.asarray(values).ravel() & 0xFF).astype(np.uint8).tobytes()
+
+
+# Whether compressed data (padding and code length bytes first) is stored
+def is_stored(bytes_data):
+    return bytes(bytes_data[1:2]) == bytes([STORED_CODELENGTH])
+
+
+# Returns the values of a stored block, as uint8 or as int16 differences
+def stored_values(bytes_data, signed=False):
+    values = np.frombuffer(bytes_data, dtype=np.uint8, offset=2)
+    return to_signed(values.astype(np.int16)) if signed else values
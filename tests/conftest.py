@@ -0,0 +1,153 @@
+# Shared fixtures of the test suite: the fixed corpus, the golden values and
+# the throughput calibration.
+#
+# tests/golden.json holds the exact compressed size of every case and the
+# normalized throughput of every hot loop. After an intended change of the
+# format or the speed, regenerate it and commit it with the change (-m ""
+# includes the throughput tests, which the default run leaves out):
+#   python -m pytest -m "" --update-golden
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import pytest
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden.json')
+
+# A hot loop fails when its normalized throughput drops below this fraction
+# of the golden value (timings on shared machines are noisy)
+PERF_TOLERANCE = float(os.environ.get('LZW_PERF_TOLERANCE', '0.7'))
+
+
+def pytest_addoption(parser):
+    parser.addoption('--update-golden', action='store_true',
+                     help='record the compressed sizes and throughputs in tests/golden.json')
+
+
+# Pseudo-random bytes from a fixed linear congruential generator, so the
+# corpus does not depend on the random generators of numpy
+def lcg_bytes(count, seed=1):
+    state = (np.arange(count, dtype=np.uint64) + np.uint64(seed)) * np.uint64(6364136223846793005)
+    state += np.uint64(1442695040888963407)
+    return (state >> np.uint64(56)).astype(np.uint8)
+
+
+# Incompressible bytes (chained SHA-256 digests)
+def noise_bytes(count):
+    return b''.join(hashlib.sha256(i.to_bytes(4, 'big')).digest() for i in range(count // 32 + 1))[:count]
+
+
+def build_corpus():
+    photo = Image.open(os.path.join(ROOT, 'project2', 'sample_gray_scaled.bmp')).convert('L')
+    color = Image.open(os.path.join(ROOT, 'project4', 'sample_img.bmp')).convert('RGB')
+    rows, cols = np.mgrid[0:96, 0:128]
+
+    flat = np.full((96, 128), 200, dtype=np.uint8)
+    flat[10:50, 20:70] = 35
+    flat[60:, 90:] = 120
+    texture = ((rows + cols) // 2 + lcg_bytes(96 * 128).reshape(96, 128) % 8).astype(np.uint8)
+    # Few colors, as in diagrams and screenshots
+    palette = np.array([[255, 255, 255], [20, 40, 200], [220, 30, 30], [0, 0, 0]], dtype=np.uint8)
+    diagram = palette[(rows // 24 + cols // 32) % 4]
+
+    with open(os.path.join(ROOT, 'project', 'sample.txt'), 'rb') as text_file:
+        text = text_file.read(20000)
+    binary = lcg_bytes(6000).tobytes() + text[:2000] * 3
+
+    return {
+        'photo': np.array(photo.crop((200, 150, 328, 246))),
+        'flat': flat,
+        'texture': texture,
+        'color': np.array(color.crop((100, 100, 196, 164))),
+        'diagram': diagram,
+        'text': text,
+        'binary': binary,
+    }
+
+
+@pytest.fixture(scope='session')
+def corpus():
+    return build_corpus()
+
+
+class Golden:
+    def __init__(self, path, update):
+        self.path = path
+        self.update = update
+        self.values = {}
+        if os.path.exists(path):
+            with open(path) as golden_file:
+                self.values = json.load(golden_file)
+
+    def check_size(self, case, size):
+        key = f'size/{case}'
+        if self.update:
+            self.values[key] = size
+            return
+        assert key in self.values, f"No golden size for {case}, run pytest --update-golden"
+        assert size == self.values[key], (f"{case}: compressed size changed from {self.values[key]:,} "
+                                          f"to {size:,} bytes")
+
+    def check_throughput(self, case, normalized):
+        key = f'throughput/{case}'
+        if self.update:
+            self.values[key] = round(normalized, 4)
+            return
+        assert key in self.values, f"No golden throughput for {case}, run pytest --update-golden"
+        floor = self.values[key] * PERF_TOLERANCE
+        assert normalized >= floor, (f"{case}: normalized throughput {normalized:.4f} is below the floor "
+                                     f"{floor:.4f} ({normalized / self.values[key]:.0%} of the golden "
+                                     f"{self.values[key]:.4f})")
+
+    def save(self):
+        with open(self.path, 'w') as golden_file:
+            json.dump(dict(sorted(self.values.items())), golden_file, indent=1)
+            golden_file.write('\n')
+
+
+@pytest.fixture(scope='session')
+def golden(request):
+    golden = Golden(GOLDEN_PATH, request.config.getoption('--update-golden'))
+    yield golden
+    if golden.update:
+        golden.save()
+
+
+# The inner loop of the LZW encoders (string keys in a dict) on fixed
+# data; the codec throughputs are expressed in units of this loop, so the
+# floors hold on slower and faster hosts alike
+REFERENCE_SYMBOLS = [str(value) for value in (lcg_bytes(30000) // 16 + 96)]
+
+
+def reference_loop(symbols=REFERENCE_SYMBOLS):
+    table = {str(i): i for i in range(256)}
+    w = symbols[0]
+    for k in symbols[1:]:
+        wk = w + ',' + k
+        if wk in table:
+            w = wk
+        else:
+            table[wk] = len(table)
+            w = k
+    return len(table)
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+# Throughput of function (units per second) divided by the rate of the
+# reference loop. The two are timed alternately and the best time of each is
+# used, so a slower or busier host changes both alike.
+def normalized_throughput(function, units, repeat=7):
+    function()  # warm up caches such as the scan order permutations
+    reference_best = function_best = float('inf')
+    for _ in range(repeat):
+        reference_best = min(reference_best, timed(reference_loop))
+        function_best = min(function_best, timed(function))
+    return (units / function_best) / (len(REFERENCE_SYMBOLS) / reference_best)
@@ -0,0 +1,82 @@
+# The read -> encode -> write pipeline of the batch tool: output names, the
+# --param types, cache hits and errors of single inputs
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from batch_compress import BatchPipeline, OUTPUT_SUFFIXES, compress_images, parse_params
+from result_cache import ResultCache
+from project3.LZW import LZWCoding as GrayDiffCoding
+from project5.LZW import LZWCoding as ColorDiffCoding
+
+
+def save_images(directory, corpus, names):
+    directory.mkdir()
+    for name in names:
+        Image.fromarray(corpus[name]).save(directory / f'{name}.png')
+    return str(directory)
+
+
+def test_colored_pipeline(tmp_path, corpus):
+    input_dir = save_images(tmp_path / 'inputs', corpus, ['color', 'diagram'])
+    output_dir = str(tmp_path / 'outputs')
+    params = parse_params(['color_transform=rct'])
+    results, report = compress_images([input_dir], output_dir, 'colored', 'diff', params, workers=2)
+
+    # In input order, the colored codecs add the channel suffixes
+    assert [os.path.basename(image_path) for image_path, _ in results] == ['color.png', 'diagram.png']
+    assert sorted(os.listdir(output_dir)) == sorted(f'{name}{suffix}' for name in ('color', 'diagram')
+                                                    for suffix in OUTPUT_SUFFIXES['colored'][:3])
+    assert report[0].startswith('Pipeline: 2 images')
+    for name in ('color', 'diagram'):
+        restored_path = ColorDiffCoding(name, 'image', os.path.join(output_dir, name),
+                                        str(tmp_path / name)).decompress_image_file()
+        assert np.array_equal(np.array(Image.open(restored_path)), corpus[name])
+
+
+# The --param values reach the codec with their types: near_lossless as a
+# number and run_length=false switched off
+def test_gray_pipeline_params(tmp_path, corpus):
+    input_dir = save_images(tmp_path / 'inputs', corpus, ['photo', 'texture', 'flat'])
+    output_dir = str(tmp_path / 'outputs')
+    params = parse_params(['near_lossless=2', 'run_length=false'])
+    results, _ = compress_images([input_dir], output_dir, 'gray', 'diff', params, workers=2)
+
+    assert len(results) == 3
+    for name in ('flat', 'photo', 'texture'):
+        with open(os.path.join(output_dir, name + '.bin'), 'rb') as out_file:
+            compressed = out_file.read()
+        outputs, _ = GrayDiffCoding(name, 'image', None, None, near_lossless=2).compress_image(
+            Image.fromarray(corpus[name]))
+        assert compressed == outputs['']
+
+
+def test_cache_hits(tmp_path, corpus):
+    input_dir = save_images(tmp_path / 'inputs', corpus, ['texture', 'flat'])
+    output_dir = str(tmp_path / 'outputs')
+    cache = ResultCache(str(tmp_path / 'cache'))
+    first, _ = compress_images([input_dir], output_dir, 'gray', 'gray_level', cache=cache, workers=1)
+    with open(os.path.join(output_dir, 'texture.bin'), 'rb') as out_file:
+        compressed = out_file.read()
+    os.remove(os.path.join(output_dir, 'texture.bin'))
+
+    second, _ = compress_images([input_dir], output_dir, 'gray', 'gray_level', cache=cache, workers=1)
+    assert [info[-1] for _, info in first] == ["Cache: miss"] * 2
+    assert [info[-1] for _, info in second] == ["Cache: hit"] * 2
+    with open(os.path.join(output_dir, 'texture.bin'), 'rb') as out_file:
+        assert out_file.read() == compressed
+
+
+# An input that cannot be read and a parameter a codec rejects both stop the
+# batch with their error
+@pytest.mark.parametrize('bad_input, params, error', [
+    pytest.param('broken.png', {}, OSError, id='unreadable-input'),
+    pytest.param(None, {'scan_order': 'spiral'}, ValueError, id='encoder-error'),
+])
+def test_errors_propagate(tmp_path, corpus, bad_input, params, error):
+    input_dir = save_images(tmp_path / 'inputs', corpus, ['texture'])
+    if bad_input is not None:
+        (tmp_path / 'inputs' / bad_input).write_bytes(b'not an image')
+    pipeline = BatchPipeline(str(tmp_path / 'outputs'), 'gray', 'gray_level', params, workers=1)
+    with pytest.raises(error):
+        pipeline.run([input_dir])
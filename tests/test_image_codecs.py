@@ -0,0 +1,290 @@
+# Round trips of every image codec variant on the fixed corpus, with the
+# exact compressed sizes checked against tests/golden.json
+import numpy as np
+import pytest
+from PIL import Image
+from project2.LZW import LZWCoding as GrayCoding
+from project3.LZW import LZWCoding as GrayDiffCoding
+from project4.LZW import LZWCoding as ColorCoding
+from project5.LZW import LZWCoding as ColorDiffCoding
+from batch_compress import parse_params
+from conftest import noise_bytes
+
+GRAY_IMAGES = ['photo', 'flat', 'texture']
+COLOR_IMAGES = ['color', 'diagram']
+
+GRAY_VARIANTS = {
+    'default': {},
+    'max_ratio': {'coding_mode': 'max_ratio'},
+    'speed': {'coding_mode': 'speed'},
+    'run_length': {'run_length': True},
+    'serpentine': {'scan_order': 'serpentine'},
+    'column': {'scan_order': 'column'},
+    'hilbert': {'scan_order': 'hilbert', 'run_length': True},
+    'strips': {'memory_budget': 200_000},
+    'progressive': {'progressive': True},
+}
+GRAY_DIFF_VARIANTS = {
+    'default': {},
+    'run_length': {'run_length': True},
+    'column': {'scan_order': 'column'},
+    'hilbert': {'scan_order': 'hilbert'},
+    'near_lossless': {'near_lossless': 2},
+    'strips': {'memory_budget': 200_000},
+}
+COLOR_VARIANTS = {
+    'default': {},
+    'rct': {'color_transform': 'rct'},
+    'ycocg': {'color_transform': 'ycocg'},
+    'palette': {'palette_mode': True},
+    'chained': {'chained_dictionary': True},
+}
+COLOR_DIFF_VARIANTS = dict(COLOR_VARIANTS, near_lossless={'near_lossless': 1})
+
+
+def cases(codec_name, images, variants):
+    return [pytest.param(codec_name, image, params, id=f'{codec_name}-{image}-{variant}')
+            for image in images for variant, params in variants.items()]
+
+
+CODECS = {'gray': GrayCoding, 'gray_diff': GrayDiffCoding, 'colored': ColorCoding, 'colored_diff': ColorDiffCoding}
+
+
+@pytest.mark.parametrize('codec_name, image_name, params',
+                         cases('gray', GRAY_IMAGES, GRAY_VARIANTS)
+                         + cases('gray_diff', GRAY_IMAGES, GRAY_DIFF_VARIANTS)
+                         + cases('colored', COLOR_IMAGES, COLOR_VARIANTS)
+                         + cases('colored_diff', COLOR_IMAGES, COLOR_DIFF_VARIANTS))
+def test_round_trip(request, corpus, golden, codec_name, image_name, params):
+    original = corpus[image_name]
+    codec = CODECS[codec_name]
+    outputs, info = codec(image_name, 'image', None, None, **params).compress_image(Image.fromarray(original))
+    assert info
+
+    # The gray codecs write one file, the colored ones a file per plane
+    data = outputs[''] if codec_name.startswith('gray') else outputs
+    restored = codec(image_name, 'image', None, None).decompress_image(data)
+    assert restored.shape == original.shape
+    assert restored.dtype == np.uint8
+    error_bound = params.get('near_lossless', 0)
+    max_error = int(np.max(np.abs(restored.astype(np.int16) - original)))
+    assert max_error <= error_bound, f"pixel error {max_error} exceeds {error_bound}"
+
+    golden.check_size(request.node.callspec.id, sum(len(part) for part in outputs.values()))
+
+
+@pytest.mark.parametrize('predictor', [False, True], ids=['plain', 'predictor'])
+@pytest.mark.parametrize('image_name', GRAY_IMAGES)
+def test_tiff_round_trip(tmp_path, corpus, golden, image_name, predictor):
+    input_path = tmp_path / f'{image_name}.bmp'
+    output_path = tmp_path / f'{image_name}.tif'
+    Image.fromarray(corpus[image_name]).save(input_path)
+    GrayCoding(image_name, 'image', str(input_path), str(output_path)).compress_tiff_file(predictor=predictor)
+
+    # Decoded by libtiff through Pillow
+    with Image.open(output_path) as image:
+        assert np.array_equal(np.array(image), corpus[image_name])
+    golden.check_size(f'tiff-{image_name}-{"predictor" if predictor else "plain"}', output_path.stat().st_size)
+
+
+@pytest.mark.parametrize('codec_name', ['gray', 'gray_diff'])
+def test_strips_are_used_under_budget(corpus, codec_name):
+    outputs, info = CODECS[codec_name]('photo', 'image', None, None,
+                                       memory_budget=100_000).compress_image(Image.fromarray(corpus['photo']))
+    assert any('strips of' in line for line in info)
+    restored = CODECS[codec_name]('photo', 'image', None, None).decompress_image(outputs[''])
+    assert np.array_equal(restored, corpus['photo'])
+
+
+@pytest.mark.parametrize('params', [{}, {'run_length': True}, {'memory_budget': 5_000_000}],
+                         ids=['default', 'run_length', 'strips'])
+def test_noise_is_stored(params):
+    noise = np.frombuffer(noise_bytes(320 * 320), dtype=np.uint8).reshape(320, 320)
+    outputs, info = GrayCoding('noise', 'image', None, None, **params).compress_image(Image.fromarray(noise))
+    assert any(line.startswith('Stored Raw') for line in info)
+    assert len(outputs['']) < noise.size + 64
+    assert np.array_equal(GrayCoding('noise', 'image', None, None).decompress_image(outputs['']), noise)
+
+
+# The differences of noise are stored modulo 256
+@pytest.mark.parametrize('params', [{}, {'run_length': True}, {'near_lossless': 2}, {'memory_budget': 5_000_000}],
+                         ids=['default', 'run_length', 'near_lossless', 'strips'])
+def test_noise_differences_are_stored(params):
+    noise = np.frombuffer(noise_bytes(320 * 320), dtype=np.uint8).reshape(320, 320)
+    outputs, info = GrayDiffCoding('noise', 'image', None, None, **params).compress_image(Image.fromarray(noise))
+    assert any(line.startswith('Stored Raw') for line in info)
+    assert len(outputs['']) < noise.size * 1.01
+    restored = GrayDiffCoding('noise', 'image', None, None).decompress_image(outputs[''])
+    assert np.max(np.abs(restored.astype(np.int16) - noise)) == params.get('near_lossless', 0)
+
+
+# Colored noise planes are stored unless the dictionary is chained
+@pytest.mark.parametrize('codec_name, params', [
+    pytest.param(codec_name, params, id=f'{codec_name}-{variant}')
+    for codec_name in ('colored', 'colored_diff')
+    for variant, params in [('default', {}), ('rct', {'color_transform': 'rct'}),
+                            ('near_lossless', {'near_lossless': 2}), ('chained', {'chained_dictionary': True})]
+    # project4 has no near-lossless mode
+    if codec_name == 'colored_diff' or 'near_lossless' not in params])
+def test_colored_noise_is_stored(codec_name, params):
+    noise = np.frombuffer(noise_bytes(300 * 300 * 3), dtype=np.uint8).reshape(300, 300, 3)
+    outputs, info = CODECS[codec_name]('noise', 'image', None, None, **params).compress_image(Image.fromarray(noise))
+    chained = params.get('chained_dictionary', False)
+    assert ("Stored raw: 3 of 3 planes (incompressible)" in info) != chained
+    if not chained:
+        assert sum(len(data) for data in outputs.values()) < noise.size + 64
+    restored = CODECS[codec_name]('noise', 'image', None, None).decompress_image(outputs)
+    assert np.max(np.abs(restored.astype(np.int16) - noise)) <= params.get('near_lossless', 0)
+
+
+# The first pass of a progressive image is every 8th pixel of every 8th row,
+# further passes halve the spacing until the preview reaches the size
+def test_progressive_preview(corpus):
+    photo = corpus['photo']
+    data = GrayCoding('photo', 'image', None, None, progressive=True).compress_image(Image.fromarray(photo))[0]['']
+    decoder = GrayCoding('photo', 'image', None, None)
+    assert np.array_equal(decoder.decode_preview(data), photo[::8, ::8])
+    assert np.array_equal(decoder.decode_preview(data, 40), photo[::2, ::2])
+    assert np.array_equal(decoder.decode_preview(data, 1000), photo)
+
+    # Other files only have the full image
+    plain = GrayCoding('photo', 'image', None, None).compress_image(Image.fromarray(photo))[0]['']
+    assert np.array_equal(decoder.decode_preview(plain), photo)
+
+
+# Speed mode files are memory-mapped for decompression
+def test_speed_mode_file_round_trip(tmp_path, corpus):
+    input_path = tmp_path / 'texture.bmp'
+    Image.fromarray(corpus['texture']).save(input_path)
+    output_path = str(tmp_path / 'texture.bin')
+    GrayCoding('texture', 'image', str(input_path), output_path, coding_mode='speed').compress_image_file()
+
+    restored_path = str(tmp_path / 'restored.bmp')
+    GrayCoding('texture', 'image', output_path, restored_path).decompress_image_file()
+    assert np.array_equal(np.array(Image.open(restored_path)), corpus['texture'])
+
+
+# Damaged files fail with a ValueError that says what is wrong (only speed
+# mode files are memory-mapped)
+@pytest.mark.parametrize('coding_mode', ['fast', 'max_ratio', 'speed'])
+@pytest.mark.parametrize('damage, message', [
+    (lambda data: b'', 'has no header'),
+    (lambda data: data[:len(data) // 2], 'holds .* pixels|not made of 2-byte codes'),
+    (lambda data: data[:len(data) // 2] + b'\xff' * (len(data) - len(data) // 2), 'Bad compressed k|holds .* pixels'),
+], ids=['empty', 'truncated', 'overwritten'])
+def test_corrupt_file(tmp_path, corpus, coding_mode, damage, message):
+    input_path = tmp_path / 'texture.bmp'
+    Image.fromarray(corpus['texture']).save(input_path)
+    output_path = tmp_path / 'texture.bin'
+    GrayCoding('texture', 'image', str(input_path), str(output_path), coding_mode=coding_mode).compress_image_file()
+    output_path.write_bytes(damage(output_path.read_bytes()))
+
+    with pytest.raises(ValueError, match=message):
+        GrayCoding('texture', 'image', str(output_path), str(tmp_path / 'restored.bmp')).decompress_image_file()
+
+
+def test_files_round_trip(tmp_path, corpus):
+    input_path = tmp_path / 'color.bmp'
+    Image.fromarray(corpus['color']).save(input_path)
+    output_path = str(tmp_path / 'color')
+    ColorCoding('color', 'image', str(input_path), output_path).compress_image_file()
+
+    decompressed_path = ColorCoding('color', 'image', output_path, str(tmp_path / 'restored')).decompress_image_file()
+    assert np.array_equal(np.array(Image.open(decompressed_path)), corpus['color'])
+
+
+# --param values of the batch tool reach the codecs with their types
+def test_batch_params(corpus):
+    params = parse_params(['near_lossless=2', 'palette_mode=false', 'memory_budget=1.5M', 'color_transform=none'])
+    assert params == {'near_lossless': 2, 'palette_mode': False, 'memory_budget': 1572864, 'color_transform': 'none'}
+    del params['memory_budget']
+    outputs, info = ColorDiffCoding('color', 'image', None, None, **params).compress_image(Image.fromarray(corpus['color']))
+    assert any(line.startswith('Near-lossless') for line in info)
+
+
+# Planes encoded in worker processes give the same files as sequential coding
+@pytest.mark.parametrize('codec_name', ['colored', 'colored_diff'])
+def test_workers_match_sequential(corpus, codec_name):
+    image = Image.fromarray(corpus['color'])
+    sequential, _ = CODECS[codec_name]('color', 'image', None, None).compress_image(image)
+    parallel, info = CODECS[codec_name]('color', 'image', None, None).compress_image(image, workers=2)
+    assert 'Workers: 2 (shared memory)' in info
+    assert parallel == sequential
+
+
+# 'P' images whose palette is shorter than their largest index (or missing)
+# decode to the colors Pillow shows, black for the missing entries
+@pytest.mark.parametrize('codec_name', ['colored', 'colored_diff'])
+@pytest.mark.parametrize('palette', [[10, 20, 30, 40, 50, 60], None], ids=['short', 'missing'])
+def test_short_palette(codec_name, palette):
+    image = Image.fromarray(np.array([[0, 1, 2], [5, 1, 0]], dtype=np.uint8), 'P')
+    if palette is not None:
+        image.putpalette(palette)
+    outputs, _ = CODECS[codec_name]('short', 'image', None, None, palette_mode=True).compress_image(image)
+    restored = CODECS[codec_name]('short', 'image', None, None).decompress_image(outputs)
+    assert np.array_equal(restored, np.array(image.convert('RGB')))
+
+
+# G and B learn from the dictionary of the channel before them, so the
+# channels share their phrases
+@pytest.mark.parametrize('codec_name', ['colored', 'colored_diff'])
+def test_chained_dictionary_is_smaller(corpus, codec_name):
+    image = Image.fromarray(corpus['color'])
+    separate, _ = CODECS[codec_name]('color', 'image', None, None).compress_image(image)
+    chained, info = CODECS[codec_name]('color', 'image', None, None, chained_dictionary=True).compress_image(image)
+    assert 'Dictionary: chained across the channels' in info
+    assert sum(map(len, chained.values())) < sum(map(len, separate.values()))
+
+
+# Frames of a still scene and of a scene with a small moving object
+def sequence_frames(corpus, scene, count=8):
+    frames = []
+    for t in range(count):
+        frame = corpus['photo'].copy()
+        if scene == 'moving':
+            frame[40:60, 10 + 4 * t:30 + 4 * t] = 250
+        frames.append(frame)
+    return frames
+
+
+@pytest.mark.parametrize('near_lossless', [0, 2], ids=['lossless', 'near_lossless'])
+@pytest.mark.parametrize('scene', ['static', 'moving'])
+def test_sequence_round_trip(corpus, golden, scene, near_lossless):
+    frames = sequence_frames(corpus, scene)
+    coder = GrayDiffCoding('sequence', 'image', None, None, near_lossless=near_lossless)
+    data, info = coder.compress_sequence([Image.fromarray(frame) for frame in frames], keyframe_interval=3)
+    assert any(line.startswith('Frames: 3 key') for line in info)
+
+    restored = GrayDiffCoding('sequence', 'image', None, None).decompress_sequence(data)
+    assert len(restored) == len(frames)
+    for number, (frame, original) in enumerate(zip(restored, frames)):
+        assert int(np.max(np.abs(frame.astype(np.int16) - original))) <= near_lossless
+        # Seeking decodes from the last key frame and gives the same pixels
+        assert np.array_equal(GrayDiffCoding('sequence', 'image', None, None).decompress_frame(data, number), frame)
+
+    golden.check_size(f'sequence-{scene}-{"near_lossless" if near_lossless else "lossless"}', len(data))
+
+
+def test_sequence_beats_single_images(corpus):
+    frames = sequence_frames(corpus, 'moving')
+    data, _ = GrayDiffCoding('sequence', 'image', None, None).compress_sequence(
+        [Image.fromarray(frame) for frame in frames])
+    single = sum(len(GrayDiffCoding('frame', 'image', None, None).compress_image(Image.fromarray(frame))[0][''])
+                 for frame in frames)
+    assert len(data) * 3 < single
+
+
+def test_sequence_files_round_trip(tmp_path, corpus):
+    frames = sequence_frames(corpus, 'moving', count=3)
+    input_paths = []
+    for number, frame in enumerate(frames):
+        input_paths.append(str(tmp_path / f'frame{number}.bmp'))
+        Image.fromarray(frame).save(input_paths[-1])
+    output_path = str(tmp_path / 'frames.bin')
+    GrayDiffCoding('frames', 'image', None, output_path).compress_sequence_files(input_paths)
+
+    paths = GrayDiffCoding('frames', 'image', output_path, str(tmp_path / 'restored.bmp')).decompress_sequence_file()
+    assert [np.array(Image.open(path)).tolist() for path in paths] == [frame.tolist() for frame in frames]
+    # A sequence is not a single image
+    with pytest.raises(ValueError):
+        GrayDiffCoding('frames', 'image', None, None).decompress_image(open(output_path, 'rb').read())
@@ -0,0 +1,188 @@
+# The compression service on an ephemeral port: round trips (chunked for
+# HTTP/1.1, Content-Length for HTTP/1.0), the 400 answers to bad requests,
+# backpressure, /metrics and the replacement of a dead worker pool
+import io
+import os
+import json
+import socket
+import signal
+import asyncio
+import threading
+import http.client
+import contextlib
+import numpy as np
+import pytest
+from PIL import Image
+from lzw_server import CompressionServer, CHUNK_SIZE
+
+
+# Runs a CompressionServer in an event loop of its own thread and yields the
+# server, its loop and its port
+@contextlib.contextmanager
+def running_server(**kwargs):
+    loop = asyncio.new_event_loop()
+    service = CompressionServer(**kwargs)
+    listener = loop.run_until_complete(service.start(port=0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield service, loop, listener.sockets[0].getsockname()[1]
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        listener.close()
+        service.close()
+        loop.run_until_complete(listener.wait_closed())
+        loop.close()
+
+
+@pytest.fixture(scope='module')
+def server():
+    with running_server(workers=1) as running:
+        yield running
+
+
+def request(port, method, target, body=b''):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request(method, target, body)
+        response = connection.getresponse()
+        return response.status, response.headers, response.read()
+    finally:
+        connection.close()
+
+
+# Sends raw request bytes and returns the status line, the header lines and
+# the body the server sent before closing the connection
+def raw_request(port, data):
+    with socket.create_connection(('127.0.0.1', port), timeout=60) as sock:
+        sock.sendall(data)
+        received = b''.join(iter(lambda: sock.recv(65536), b''))
+    head, _, body = received.partition(b'\r\n\r\n')
+    status_line, *headers = head.decode('latin-1').split('\r\n')
+    return status_line, headers, body
+
+
+def metrics(port):
+    status, _, body = request(port, 'GET', '/metrics')
+    assert status == 200
+    return json.loads(body)
+
+
+def test_bytes_round_trip(server, corpus):
+    _, _, port = server
+    data = corpus['text'] * 4
+    status, headers, compressed = request(port, 'POST', '/compress/bytes?coding_mode=max_ratio', data)
+    assert status == 200
+    assert headers['Transfer-Encoding'] == 'chunked'
+
+    # The result of the decode is larger than one chunk
+    status, _, restored = request(port, 'POST', '/decompress/bytes', compressed)
+    assert status == 200
+    assert len(restored) > CHUNK_SIZE
+    assert restored == data
+
+
+def test_image_round_trip(server, corpus):
+    _, _, port = server
+    png = io.BytesIO()
+    Image.fromarray(corpus['texture']).save(png, format='PNG')
+    status, _, compressed = request(port, 'POST', '/compress/image?mode=gray_diff&run_length=true', png.getvalue())
+    assert status == 200
+
+    status, headers, restored = request(port, 'POST', '/decompress/image', compressed)
+    assert status == 200
+    assert headers['Content-Type'] == 'image/png'
+    assert np.array_equal(np.array(Image.open(io.BytesIO(restored))), corpus['texture'])
+
+
+# HTTP/1.0 has no chunked transfer encoding
+def test_http10_gets_content_length(server, corpus):
+    _, _, port = server
+    data = corpus['binary']
+    status, _, compressed = request(port, 'POST', '/compress/bytes', data)
+    assert status == 200
+
+    status_line, headers, body = raw_request(
+        port, b'POST /decompress/bytes HTTP/1.0\r\nContent-Length: %d\r\n\r\n' % len(compressed) + compressed)
+    assert status_line == 'HTTP/1.1 200 OK'
+    assert f'Content-Length: {len(data)}' in headers
+    assert not any(header.startswith('Transfer-Encoding') for header in headers)
+    assert body == data
+
+
+@pytest.mark.parametrize('length', ['-5', 'abc', '+3', '1_0'])
+def test_bad_content_length(server, length):
+    _, _, port = server
+    data = f'POST /compress/bytes HTTP/1.1\r\nContent-Length: {length}\r\n\r\nabc'.encode()
+    status_line, _, body = raw_request(port, data)
+    assert status_line == 'HTTP/1.1 400 Bad Request'
+    assert 'Content-Length' in json.loads(body)['error']
+
+
+@pytest.mark.parametrize('target', [
+    '/compress/bytes?coding_mode=infK',
+    '/compress/bytes?coding_mode=1e400M',
+    '/compress/bytes?coding_mode',
+    # Only the parameters of the operation are accepted
+    '/compress/bytes?dictionary_path=/etc/passwd',
+    '/decompress/bytes?dictionary_path=/etc/passwd',
+    '/compress/image?mode=gray&memory_stats=rss',
+])
+def test_bad_parameters(server, target):
+    _, _, port = server
+    before = metrics(port)
+    status, _, body = request(port, 'POST', target, b'abc')
+    assert status == 400
+    assert 'error' in json.loads(body)
+    after = metrics(port)
+    assert after['requests'] == before['requests'] + 1
+    assert after['failed'] == before['failed'] + 1
+
+
+def test_metrics(server, corpus):
+    _, _, port = server
+    before = metrics(port)
+    assert request(port, 'POST', '/compress/bytes', corpus['text'])[0] == 200
+    # Not compressed data, a client error
+    assert request(port, 'POST', '/decompress/bytes', b'not compressed')[0] == 400
+
+    after = metrics(port)
+    assert after['requests'] == before['requests'] + 2
+    assert after['completed'] == before['completed'] + 1
+    assert after['failed'] == before['failed'] + 1
+    assert after['workers'] == 1
+    assert after['queue_depth'] == 0
+    assert after['latency']['max_ms'] >= after['latency']['p50_ms'] > 0
+
+
+# Without dispatchers nothing leaves the queue, as when every worker is busy
+async def stall(service):
+    for dispatcher in service.dispatchers:
+        dispatcher.cancel()
+    while not service.queue.full():
+        service.queue.put_nowait(None)
+
+
+def test_backpressure():
+    with running_server(workers=1, queue_size=2) as (service, loop, port):
+        asyncio.run_coroutine_threadsafe(stall(service), loop).result()
+        status, headers, body = request(port, 'POST', '/compress/bytes', b'abc')
+        assert status == 503
+        assert headers['Retry-After'] == '1'
+        assert json.loads(body) == {'error': 'job queue is full'}
+        assert service.metrics.rejected == 1
+
+
+# A dead worker fails the jobs of its pool, the next ones go to a new pool
+@pytest.mark.skipif(not hasattr(signal, 'SIGKILL'), reason='needs SIGKILL')
+def test_dead_worker_pool_is_replaced(server):
+    service, _, port = server
+    assert request(port, 'POST', '/compress/bytes', b'abc')[0] == 200
+    restarts = service.metrics.pool_restarts
+    for pid in list(service.executor._processes):
+        os.kill(pid, signal.SIGKILL)
+
+    assert request(port, 'POST', '/compress/bytes', b'abc')[0] == 500
+    assert request(port, 'POST', '/compress/bytes', b'abc')[0] == 200
+    assert service.metrics.pool_restarts == restarts + 1
@@ -0,0 +1,110 @@
+# The on-disk result cache: hits and misses, the codec hash over the imported
+# modules, LRU eviction and the files of another layout on a hit
+import os
+import sys
+import importlib
+import numpy as np
+from PIL import Image
+import result_cache
+from result_cache import ResultCache, local_dependencies
+from batch_compress import OUTPUT_SUFFIXES
+from project2.LZW import LZWCoding as GrayCoding
+from project4.LZW import LZWCoding as ColorCoding
+
+
+def save_image(path, array):
+    Image.fromarray(array).save(path)
+    return str(path)
+
+
+def test_hit_and_miss(tmp_path, corpus):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    input_path = save_image(tmp_path / 'texture.bmp', corpus['texture'])
+    output_path = str(tmp_path / 'texture.bin')
+
+    info = cache.compress_image(GrayCoding('texture', 'image', input_path, output_path),
+                                'project2', 'gray_level', {}, OUTPUT_SUFFIXES['gray'])
+    assert info[-1] == "Cache: miss"
+    with open(output_path, 'rb') as out_file:
+        compressed = out_file.read()
+
+    # The output is restored from the cache
+    os.remove(output_path)
+    info = cache.compress_image(GrayCoding('texture', 'image', input_path, output_path),
+                                'project2', 'gray_level', {}, OUTPUT_SUFFIXES['gray'])
+    assert info[-1] == "Cache: hit"
+    with open(output_path, 'rb') as out_file:
+        assert out_file.read() == compressed
+
+    # Other parameters are another entry
+    info = cache.compress_image(GrayCoding('texture', 'image', input_path, output_path, run_length=True),
+                                'project2', 'gray_level', {'run_length': True}, OUTPUT_SUFFIXES['gray'])
+    assert info[-1] == "Cache: miss"
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'evictions': 0}
+
+
+def test_codec_hash_covers_imported_modules(tmp_path, monkeypatch):
+    # A codec whose helper module is only imported inside a method
+    (tmp_path / 'helper.py').write_text("STEP = 1\n")
+    (tmp_path / 'codec.py').write_text("class Codec:\n"
+                                       "    def step(self):\n"
+                                       "        from helper import STEP\n"
+                                       "        return STEP\n")
+    monkeypatch.setattr(result_cache, 'ROOT', str(tmp_path))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    codec = importlib.import_module('codec').Codec
+    try:
+        assert local_dependencies(tmp_path / 'codec.py') == {str(tmp_path / 'codec.py'), str(tmp_path / 'helper.py')}
+        before = ResultCache(str(tmp_path / 'cache')).codec_hash(codec)
+        (tmp_path / 'helper.py').write_text("STEP = 2\n")
+        assert ResultCache(str(tmp_path / 'cache')).codec_hash(codec) != before
+    finally:
+        sys.modules.pop('codec', None)
+
+
+def test_codec_dependencies():
+    paths = {os.path.relpath(path, result_cache.ROOT) for path in local_dependencies(
+        os.path.join(result_cache.ROOT, 'project4', 'LZW.py'))}
+    # shared_pool is imported inside a function of color_planes
+    assert {'color_planes.py', 'color_transform.py', 'shared_pool.py'} <= paths
+
+
+def test_lru_eviction(tmp_path):
+    entry_size = 1000
+    cache = ResultCache(str(tmp_path / 'cache'), max_size=int(2.5 * entry_size))
+    info_path = lambda key: os.path.join(cache.entries_dir, key, 'info.json')
+
+    cache.put('a', {'': bytes(entry_size)}, [])
+    cache.put('b', {'': bytes(entry_size)}, [])
+    os.utime(info_path('a'), (100, 100))
+    os.utime(info_path('b'), (200, 200))
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get('a') is not None
+    cache.put('c', {'': bytes(entry_size)}, [])
+
+    assert sorted(os.listdir(cache.entries_dir)) == ['a', 'c']
+    assert cache.get('b') is None
+    assert cache.stats()['evictions'] == 1
+
+
+# A hit restores the files of the cached layout and removes those of the
+# other one, which the decoder would read instead
+def test_hit_removes_other_layout(tmp_path, corpus):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    input_path = save_image(tmp_path / 'diagram.png', corpus['diagram'])
+    output_path = str(tmp_path / 'diagram')
+    params = {'palette_mode': True}
+
+    cache.compress_image(ColorCoding('diagram', 'image', input_path, output_path, **params),
+                         'project4', 'gray_level', params, OUTPUT_SUFFIXES['colored'])
+    assert os.path.exists(output_path + '_P.bin')
+    for suffix in ('_R.bin', '_G.bin', '_B.bin'):
+        (tmp_path / ('diagram' + suffix)).write_bytes(b'stale')
+
+    info = cache.compress_image(ColorCoding('diagram', 'image', input_path, output_path, **params),
+                                'project4', 'gray_level', params, OUTPUT_SUFFIXES['colored'])
+    assert info[-1] == "Cache: hit"
+    assert sorted(os.listdir(tmp_path)) == ['cache', 'diagram.png', 'diagram_P.bin']
+
+    restored_path = ColorCoding('diagram', 'image', output_path, str(tmp_path / 'restored')).decompress_image_file()
+    assert np.array_equal(np.array(Image.open(restored_path).convert('RGB')), corpus['diagram'])
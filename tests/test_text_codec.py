@@ -0,0 +1,159 @@
+# Round trips of the byte/text codec (in memory, files, segmented archives
+# and trained dictionaries) with the exact compressed sizes checked against
+# tests/golden.json
+import pytest
+import lzw_api
+from project.LZW import LZWCoding, train_dictionary
+from conftest import noise_bytes
+
+
+@pytest.mark.parametrize('coding_mode', ['fast', 'max_ratio', 'speed'])
+@pytest.mark.parametrize('sample', ['text', 'binary'])
+def test_bytes_round_trip(corpus, golden, sample, coding_mode):
+    data = corpus[sample]
+    compressed = lzw_api.compress_bytes(data, coding_mode=coding_mode)
+    assert lzw_api.decompress_bytes(compressed) == data
+    golden.check_size(f'bytes-{sample}-{coding_mode}', len(compressed))
+
+
+def test_empty_bytes():
+    assert lzw_api.decompress_bytes(lzw_api.compress_bytes(b'')) == b''
+
+
+# Noise skips the LZW stage (large inputs) or is stored after growing in it
+@pytest.mark.parametrize('size', [1000, 100_000])
+def test_incompressible_bytes_are_stored(size):
+    data = noise_bytes(size)
+    compressed = lzw_api.compress_bytes(data)
+    assert lzw_api.decompress_bytes(compressed) == data
+    assert len(compressed) == size + 2
+
+
+def test_dictionary_round_trip(tmp_path, corpus, golden):
+    text = corpus['text']
+    dictionary_path = str(tmp_path / 'text.lzwd')
+    train_dictionary([text[:10000]], dictionary_path, max_entries=2048)
+
+    sample = text[10000:]
+    compressed = lzw_api.compress_bytes(sample, dictionary_path=dictionary_path)
+    assert lzw_api.decompress_bytes(compressed, dictionary_path=dictionary_path) == sample
+    # A dictionary trained on similar data must pay off
+    assert len(compressed) < len(lzw_api.compress_bytes(sample))
+    golden.check_size('bytes-text-dictionary', len(compressed))
+
+
+@pytest.mark.parametrize('coding_mode', ['fast', 'speed'])
+@pytest.mark.parametrize('block_size', [None, 4096], ids=['single', 'segmented'])
+def test_file_round_trip(tmp_path, corpus, golden, block_size, coding_mode):
+    input_path = tmp_path / 'sample.txt'
+    input_path.write_bytes(corpus['text'])
+    compressed_path = str(tmp_path / 'sample.bin')
+    restored_path = tmp_path / 'restored.txt'
+
+    LZWCoding('sample', 'text', str(input_path), compressed_path,
+              coding_mode=coding_mode).compress_text_file(block_size=block_size)
+    # The coding mode is read from the header (speed mode files are mapped)
+    LZWCoding('sample', 'text', compressed_path, str(restored_path)).decompress_text_file()
+    assert restored_path.read_bytes() == corpus['text']
+    suffix = '' if coding_mode == 'fast' else f'-{coding_mode}'
+    golden.check_size(f'file-text-{"segmented" if block_size else "single"}{suffix}',
+                      (tmp_path / 'sample.bin').stat().st_size)
+
+
+def test_append_round_trip(tmp_path, corpus):
+    text = corpus['text']
+    first_path, second_path = tmp_path / 'first.txt', tmp_path / 'second.txt'
+    first_path.write_bytes(text[:7000])
+    second_path.write_bytes(text[7000:])
+    compressed_path = str(tmp_path / 'sample.bin')
+    restored_path = tmp_path / 'restored.txt'
+
+    # Appending to a missing archive creates a segmented one
+    LZWCoding('sample', 'text', str(first_path), compressed_path).compress_text_file(append=True)
+    _, info = LZWCoding('sample', 'text', str(second_path), compressed_path).compress_text_file(append=True,
+                                                                                                block_size=4096)
+    assert "Appended as new segments to sample.bin" in info
+    LZWCoding('sample', 'text', compressed_path, str(restored_path)).decompress_text_file()
+    assert restored_path.read_bytes() == text
+
+
+def test_append_needs_segmented_archive(tmp_path, corpus):
+    input_path = tmp_path / 'sample.txt'
+    input_path.write_bytes(corpus['text'])
+    compressed_path = str(tmp_path / 'sample.bin')
+    LZWCoding('sample', 'text', str(input_path), compressed_path).compress_text_file()
+    with pytest.raises(ValueError, match='not an appendable'):
+        LZWCoding('sample', 'text', str(input_path), compressed_path).compress_text_file(append=True)
+
+
+class Interrupted(Exception):
+    pass
+
+
+# A compression interrupted after two blocks and resumed writes the same
+# archive as an uninterrupted one, and the checkpoint is removed at the end
+@pytest.mark.parametrize('coding_mode', ['fast', 'max_ratio', 'speed'])
+def test_resume_after_interruption(tmp_path, corpus, monkeypatch, coding_mode):
+    input_path = tmp_path / 'sample.txt'
+    input_path.write_bytes(corpus['text'])
+    complete_path = tmp_path / 'complete.bin'
+    resumed_path = tmp_path / 'resumed.bin'
+    checkpoint_path = tmp_path / 'resumed.bin.checkpoint'
+    LZWCoding('sample', 'text', str(input_path), str(complete_path),
+              coding_mode=coding_mode).compress_text_file(block_size=4096, workers=1)
+
+    save_checkpoint = LZWCoding.save_checkpoint
+    saved = []
+
+    def interrupt_after_two(self, *args):
+        save_checkpoint(self, *args)
+        saved.append(args)
+        if len(saved) == 2:
+            raise Interrupted()
+
+    monkeypatch.setattr(LZWCoding, 'save_checkpoint', interrupt_after_two)
+    with pytest.raises(Interrupted):
+        LZWCoding('sample', 'text', str(input_path), str(resumed_path),
+                  coding_mode=coding_mode).compress_text_file(block_size=4096, workers=1, checkpoint=True)
+    assert checkpoint_path.exists()
+    monkeypatch.undo()
+
+    _, info = LZWCoding('sample', 'text', str(input_path), str(resumed_path),
+                        coding_mode=coding_mode).compress_text_file(block_size=4096, workers=1, resume=True)
+    assert "Resumed after 2 blocks (8,192 bytes)" in info
+    assert not checkpoint_path.exists()
+    assert resumed_path.read_bytes() == complete_path.read_bytes()
+
+
+def test_segmented_first_block(tmp_path, corpus):
+    input_path = tmp_path / 'sample.txt'
+    input_path.write_bytes(corpus['text'])
+    compressed_path = str(tmp_path / 'sample.bin')
+    restored_path = tmp_path / 'restored.txt'
+
+    LZWCoding('sample', 'text', str(input_path), compressed_path).compress_text_file(block_size=4096)
+    LZWCoding('sample', 'text', compressed_path, str(restored_path)).decompress_text_file(first_block=2)
+    assert restored_path.read_bytes() == corpus['text'][2 * 4096:]
+
+
+# A decoding error of a memory-mapped file must surface as it is, not as a
+# failure to close the mapping
+def test_speed_mode_corrupt_file(tmp_path, corpus):
+    input_path = tmp_path / 'sample.txt'
+    input_path.write_bytes(corpus['text'])
+    compressed_path = tmp_path / 'sample.bin'
+    LZWCoding('sample', 'text', str(input_path), str(compressed_path), coding_mode='speed').compress_text_file()
+    data = compressed_path.read_bytes()
+    compressed_path.write_bytes(data[:len(data) // 2] + b'\xff' * (len(data) - len(data) // 2))
+
+    with pytest.raises(ValueError):
+        LZWCoding('sample', 'text', str(compressed_path), str(tmp_path / 'restored.txt')).decompress_text_file()
+
+
+def test_segmented_bytes_are_rejected(tmp_path, corpus):
+    input_path = tmp_path / 'sample.txt'
+    input_path.write_bytes(corpus['text'])
+    compressed_path = tmp_path / 'sample.bin'
+    LZWCoding('sample', 'text', str(input_path), str(compressed_path)).compress_text_file(block_size=4096)
+    with pytest.raises(ValueError):
+        lzw_api.decompress_bytes(compressed_path.read_bytes())
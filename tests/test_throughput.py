@@ -0,0 +1,69 @@
+# Throughput floors of the hot loops. Every throughput (pixels or bytes per
+# second) is divided by the rate of the reference loop of conftest.py, timed
+# alternately on the same host, and must stay above PERF_TOLERANCE times the
+# golden value.
+# Not part of the default run (timings on a busy host are noisy), run them
+# with -m perf.
+import pytest
+import lzw_api
+from PIL import Image
+from project.LZW import LZWCoding as TextCoding
+from project2.LZW import LZWCoding as GrayCoding
+from project3.LZW import LZWCoding as GrayDiffCoding
+from project4.LZW import LZWCoding as ColorCoding
+from conftest import normalized_throughput
+
+pytestmark = pytest.mark.perf
+
+
+def check(golden, case, units, function):
+    golden.check_throughput(case, normalized_throughput(function, units))
+
+
+@pytest.mark.parametrize('coding_mode', ['fast', 'max_ratio', 'speed'])
+def test_text_codec(corpus, golden, coding_mode):
+    data = corpus['text']
+    coder = TextCoding('text', 'text', None, None, coding_mode=coding_mode)
+    compressed, _ = coder.compress_data(data)
+    check(golden, f'text-{coding_mode}-encode', len(data), lambda: coder.compress_data(data))
+    check(golden, f'text-{coding_mode}-decode', len(data), lambda: coder.decompress_data(compressed))
+
+
+@pytest.mark.parametrize('codec_name, codec, params', [
+    pytest.param('gray', GrayCoding, {}, id='gray'),
+    pytest.param('gray-max_ratio', GrayCoding, {'coding_mode': 'max_ratio'}, id='gray-max_ratio'),
+    pytest.param('gray-speed', GrayCoding, {'coding_mode': 'speed'}, id='gray-speed'),
+    pytest.param('gray_diff', GrayDiffCoding, {}, id='gray_diff'),
+])
+def test_gray_codecs(corpus, golden, codec_name, codec, params):
+    # Raw photo pixels do not compress and would be stored, the texture goes
+    # through the LZW stage
+    image = Image.fromarray(corpus['texture'])
+    pixels = image.width * image.height
+    coder = codec('texture', 'image', None, None, **params)
+    outputs, _ = coder.compress_image(image)
+    check(golden, f'{codec_name}-encode', pixels, lambda: coder.compress_image(image))
+    check(golden, f'{codec_name}-decode', pixels, lambda: coder.decompress_image(outputs['']))
+
+
+def test_colored_codec(corpus, golden):
+    image = Image.fromarray(corpus['color'])
+    pixels = image.width * image.height
+    coder = ColorCoding('color', 'image', None, None)
+    outputs, _ = coder.compress_image(image)
+    check(golden, 'colored-encode', pixels, lambda: coder.compress_image(image))
+    check(golden, 'colored-decode', pixels, lambda: coder.decompress_image(outputs))
+
+
+def test_tiff_encoder(corpus, golden):
+    data = corpus['photo'].tobytes()
+    coder = GrayCoding('photo', 'image', None, None)
+    check(golden, 'tiff-encode', len(data), lambda: coder.tiff_lzw_encode(data))
+
+
+def test_array_api(corpus, golden):
+    array = corpus['texture']
+    compressed = lzw_api.compress_array(array, 'gray')
+    check(golden, 'api-gray-round-trip', array.size,
+          lambda: lzw_api.decompress_to_array(lzw_api.compress_array(array, 'gray')))
+    assert (lzw_api.decompress_to_array(compressed) == array).all()